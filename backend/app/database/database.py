@@ -18,4 +18,55 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def add_missing_columns():
+    """
+    Ajoute aux tables existantes les colonnes déclarées dans les modèles mais
+    absentes de la base (create_all ne modifie pas une table existante).
+    Seules les colonnes nullables sont ajoutées, sans valeur par défaut côté serveur.
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}'))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+def create_missing_indexes():
+    """
+    Crée les index déclarés dans les modèles mais absents des tables existantes
+    (create_all ne les ajoute qu'à la création d'une table). Un index unique que les
+    données existantes violent n'est pas créé ; l'erreur est journalisée.
+    """
+    import logging
+    from sqlalchemy import inspect
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            try:
+                index.create(bind=engine)
+            except Exception as e:
+                logging.getLogger(__name__).error(f"Could not create index {index.name}: {e}")
+                continue
+            created.append(index.name)
+    return created
@@ -1,14 +1,26 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
-from contextlib import asynccontextmanager
-from app.database.database import engine, Base
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager, suppress
+from sqlalchemy import text
+from app.database.database import engine, Base, SessionLocal, add_missing_columns, create_missing_indexes
 from app.routers import auth, store, my_teams, integrations
 from app.core.security import get_current_user
+import asyncio
 import logging
 import os
 from dotenv import load_dotenv
-from app.services.unified_discovery import UnifiedDiscoveryService
+from typing import Optional
+from app.services.sync_manager import sync_manager
+from app.services.http_client import http_pool
+from app.services.n8n_executor import N8NUnavailableError, breaker_states
+from app.services.n8n_health import n8n_health
+from app.services.execution_tracker import execution_trackers
+from app.services.workflow_reconciler import workflow_reconcilers
+from app.services.execution_retention import execution_retention
+from app.services.credential_rotation import credential_rotation
+from app.services.n8n_backends import n8n_backends
 from app.database.database import get_db
 from app.routers import workflows, integrations
 
@@ -58,45 +70,84 @@ async def lifespan(app: FastAPI):
     # Create database tables
     try:
         Base.metadata.create_all(bind=engine)
+        added_columns = add_missing_columns()
+        if added_columns:
+            logger.info(f"Added missing columns: {', '.join(added_columns)}")
+        created_indexes = create_missing_indexes()
+        if created_indexes:
+            logger.info(f"Created missing indexes: {', '.join(created_indexes)}")
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Database creation failed: {e}")
         logger.error("Try deleting divert_ai.db and restarting")
         raise
     
-    # Auto-sync crews and workflows on startup
-    await sync_all_automations_on_startup()
+    # Shared HTTP connection pool (N8N API, integration checks)
+    await http_pool.start()
+    await n8n_health.start()
+    for tracker in execution_trackers.values():
+        await tracker.start()
+    for reconciler in workflow_reconcilers.values():
+        await reconciler.start()
+    await execution_retention.start()
+    
+    # Auto-sync crews and workflows in the background: the app starts serving
+    # the last known catalog immediately and picks up changes when the sync ends
+    startup_sync_task = asyncio.create_task(sync_all_automations_on_startup())
     
     yield
     
     logger.info("Shutting down Divert.ai application...")
+    if not startup_sync_task.done():
+        startup_sync_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await startup_sync_task
+    await sync_manager.shutdown()
+    await credential_rotation.shutdown()
+    await execution_retention.stop()
+    for reconciler in workflow_reconcilers.values():
+        await reconciler.stop()
+    for tracker in execution_trackers.values():
+        await tracker.stop()
+    await n8n_health.stop()
+    await http_pool.close()
 
 async def sync_all_automations_on_startup():
-    """Sync CrewAI teams and N8N workflows on startup"""
+    """Sync CrewAI teams and N8N workflows on startup without blocking the event loop"""
     try:
-        logger.info("Syncing automations...")
+        logger.info("Syncing automations in background...")
         
-        unified_discovery = UnifiedDiscoveryService()
-        db = next(get_db())
+        job = await sync_manager.wait(sync_manager.submit("all", trigger="startup"))
+        result = job.result()
         
-        try:
-            result = unified_discovery.auto_sync_all(db)
-            
-            logger.info("Synchronization completed successfully:")
+        logger.info(f"Synchronization {job.status} in {job.duration_seconds}s:")
+        if "crews" in result:
             logger.info(f"   Crews - Added: {result['crews']['added']}, Updated: {result['crews']['updated']}, Total: {result['crews']['total']}")
+        if "workflows" in result:
             logger.info(f"   Workflows - Added: {result['workflows']['added']}, Updated: {result['workflows']['updated']}, Total: {result['workflows']['total']}")
-            
-            if result.get('errors'):
-                for error in result['errors']:
-                    logger.warning(f"Warning: {error}")
-            
-        finally:
-            db.close()
+        
+        if result.get('errors'):
+            for error in result['errors']:
+                logger.warning(f"Warning: {error}")
             
     except Exception as e:
         logger.error(f"Automation sync failed: {e}")
         logger.error("Application continues without sync")
 
+def catalog_sync_summary():
+    """Dernier job de synchronisation, pour les endpoints de santé"""
+    job = sync_manager.last_job
+    if job is None:
+        return {"status": "pending"}
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "progress_percent": job.progress_percent(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "errors": list(job.errors)
+    }
+
 app = FastAPI(
     title="Divert.ai Backend",
     description="Backend for Divert.ai - AI Teams and Workflow Management",
@@ -150,36 +201,212 @@ async def health_check():
             "crews": "enabled",
             "workflows": "enabled", 
             "integrations": "enabled"
-        }
+        },
+        "catalog_sync": catalog_sync_summary(),
+        "n8n": n8n_health.status(),
+        "n8n_backends": n8n_backends.status(),
+        "n8n_circuit_breakers": breaker_states()
+    }
+
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness : le processus répond, sans dépendance externe"""
+    return {"status": "alive", "service": "divert-ai-backend"}
+
+def _check_database() -> bool:
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+        return True
+    except Exception as e:
+        logger.error(f"Readiness database check failed: {e}")
+        return False
+    finally:
+        db.close()
+
+@app.get("/health/ready")
+async def readiness_check():
+    """
+    Readiness : la base est joignable et l'application peut servir le catalogue.
+    La synchronisation de démarrage n'est pas bloquante : tant qu'elle tourne,
+    les endpoints du catalogue servent le dernier état connu en base.
+    Un disjoncteur N8N ouvert ou une sonde N8N en échec est signalé sans rendre l'instance "not_ready" :
+    les crews et le catalogue restent servis.
+    """
+    database_ok = await asyncio.to_thread(_check_database)
+    breakers = breaker_states()
+    n8n_open = any(breaker["state"] != "closed" for breaker in breakers.values())
+    n8n_degraded = n8n_open or not n8n_health.is_available()
+    payload = {
+        "status": "ready" if database_ok else "not_ready",
+        "checks": {
+            "database": "ok" if database_ok else "unavailable",
+            "n8n": "degraded" if n8n_degraded else "ok"
+        },
+        "catalog_sync": catalog_sync_summary(),
+        "n8n": n8n_health.status(),
+        "n8n_circuit_breakers": breakers
     }
+    if not database_ok:
+        return JSONResponse(status_code=503, content=payload)
+    return payload
 
 # Route pour déclencher une synchronisation manuelle complète
 @app.post("/admin/sync-all")
-async def manual_sync_all():
-    """Déclenche une synchronisation manuelle des équipes CrewAI ET workflows N8N"""
+async def manual_sync_all(wait: bool = False):
+    """
+    Déclenche une synchronisation des équipes CrewAI ET workflows N8N.
+    La synchronisation tourne en arrière-plan ; un appel concurrent rejoint le job en cours.
+    Avec `wait=true`, la réponse attend la fin du job et inclut ses résultats.
+    """
+    return await _submit_sync("all", "admin/sync-all", wait)
+
+async def _submit_sync(kind: str, trigger: str, wait: bool):
+    logger.info(f"🔄 Synchronisation '{kind}' demandée ({trigger})...")
+    job = sync_manager.submit(kind, trigger=trigger)
+    if not wait:
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            "message": "Synchronisation planifiée",
+            "job": job.to_dict()
+        })
+    
+    await sync_manager.wait(job)
+    logger.info(f"✅ Synchronisation {job.id} terminée: {job.status}")
+    return {
+        "success": job.status == "completed",
+        "message": {
+            "completed": "Synchronisation terminée",
+            "partial": "Synchronisation partielle (voir errors)",
+        }.get(job.status, "Synchronisation échouée"),
+        "results": job.result(),
+        "job": job.to_dict()
+    }
+
+@app.get("/admin/sync-status")
+async def sync_status():
+    """Jobs de synchronisation en cours, en attente et récents (progression, durée, compteurs par phase)"""
+    return sync_manager.status()
+
+@app.get("/admin/http-pool")
+async def http_pool_stats():
+    """Statistiques du pool de connexions HTTP partagé (N8N, intégrations)"""
+    return http_pool.stats()
+
+@app.get("/admin/n8n-dispatch")
+async def n8n_dispatch_stats():
+    """Files de dispatch des exécutions N8N par backend (débit, concurrence, profondeur, attentes)"""
+    return n8n_backends.dispatch_status()
+
+@app.get("/admin/n8n-status-cache")
+async def n8n_status_cache_stats():
+    """Caches de statut des workflows N8N par backend"""
+    return n8n_backends.status_cache_stats()
+
+@app.get("/admin/credential-cache")
+async def credential_cache_stats():
+    """Cache des credentials déchiffrés (entrées, succès, évictions ; jamais les valeurs)"""
+    from app.services.credential_manager import decrypted_credentials
+    return decrypted_credentials.stats()
+
+@app.get("/admin/credential-rotation")
+async def credential_rotation_status():
+    """Réécriture des credentials avec la clé et le format courants : passage en cours et passages récents"""
+    return credential_rotation.status()
+
+@app.post("/admin/credential-rotation")
+async def credential_rotation_run(batch_size: Optional[int] = None):
+    """
+    Réécrit en arrière-plan, par lots, les credentials encore chiffrés avec une ancienne clé
+    (CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS) ou stockés dans l'ancien format.
+    Un appel concurrent rejoint le passage en cours.
+    """
+    if batch_size is not None and batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size must be positive")
     try:
-        logger.info("🔄 Synchronisation manuelle complète demandée...")
-        
-        unified_discovery = UnifiedDiscoveryService()
-        db = next(get_db())
-        
-        try:
-            result = unified_discovery.auto_sync_all(db)
-            logger.info(f"✅ Synchronisation manuelle terminée: {result}")
-            return {
-                "success": True,
-                "message": "Synchronisation complète terminée avec succès",
-                "results": result
-            }
-        finally:
-            db.close()
-            
-    except Exception as e:
-        logger.error(f"❌ Erreur lors de la synchronisation manuelle: {e}")
+        job = credential_rotation.submit(trigger="admin/credential-rotation", batch_size=batch_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"🔑 Rechiffrement des credentials planifié ({job.id})")
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "message": "Rechiffrement planifié",
+        "job": job.to_dict()
+    })
+
+@app.get("/admin/credential-rotation/{job_id}")
+async def credential_rotation_job_status(job_id: str):
+    """Statut d'un passage de rechiffrement"""
+    job = credential_rotation.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Credential rotation job not found")
+    return job.to_dict()
+
+@app.get("/admin/execution-tracker")
+async def execution_tracker_status():
+    """État du suivi des exécutions N8N par backend (curseur, exécutions en cours, compteurs)"""
+    return {name: tracker.status() for name, tracker in execution_trackers.items()}
+
+@app.post("/admin/execution-tracker/poll")
+async def execution_tracker_poll():
+    """Lance immédiatement un cycle de suivi des exécutions N8N sur chaque backend"""
+    try:
+        summaries = {name: await tracker.poll_once() for name, tracker in execution_trackers.items()}
         return {
-            "success": False,
-            "message": f"Erreur lors de la synchronisation: {str(e)}"
+            "success": True,
+            "summary": summaries,
+            "trackers": {name: tracker.status() for name, tracker in execution_trackers.items()}
         }
+    except N8NUnavailableError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Execution tracking failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/reconciliation")
+async def reconciliation_status():
+    """Dernier rapport de réconciliation N8N / base par backend (orphelins, manquants, écarts)"""
+    return {name: reconciler.status() for name, reconciler in workflow_reconcilers.items()}
+
+@app.post("/admin/reconciliation/run")
+async def reconciliation_run(dry_run: bool = True, current_user: dict = Depends(get_current_user)):
+    """
+    Lance une réconciliation sur chaque backend ; par défaut en mesure seule (`dry_run=true`).
+    Authentification requise : avec `dry_run=false`, les orphelins sont désactivés ou supprimés dans N8N.
+    """
+    if not dry_run:
+        logger.warning(f"🧹 Réconciliation avec corrections demandée par l'utilisateur {current_user['id']}")
+    try:
+        reports = {name: await reconciler.run_once(dry_run=dry_run) for name, reconciler in workflow_reconcilers.items()}
+        return {"success": True, "reports": reports}
+    except N8NUnavailableError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except Exception as e:
+        logger.error(f"❌ Reconciliation failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/execution-retention")
+async def execution_retention_status():
+    """Rétention des exécutions : délais par offre, dernier passage d'archivage, compteurs"""
+    return execution_retention.status()
+
+@app.post("/admin/execution-retention/run")
+async def execution_retention_run(dry_run: bool = True):
+    """Lance un passage d'archivage ; par défaut compte seulement les exécutions à archiver (`dry_run=true`)"""
+    try:
+        report = await execution_retention.run_once(dry_run=dry_run)
+        return {"success": True, "report": report}
+    except Exception as e:
+        logger.error(f"❌ Execution archiving failed: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/admin/sync-jobs/{job_id}")
+async def sync_job_status(job_id: str):
+    """Statut d'un job de synchronisation"""
+    job = sync_manager.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    return job.to_dict()
 
 # Routes pour l'exécution et le contrôle des workflows
 
@@ -190,10 +417,12 @@ async def execute_workflow_direct(
 ):
     """Lance l'exécution manuelle d'un workflow N8N."""
     try:
-        from app.services.n8n_executor import N8NExecutorService
+        from app.services.n8n_backends import n8n_backends
         from app.models.workflow import Workflow, WorkflowExecution
+        from app.routers.workflows import _fail_execution
         
         db = next(get_db())
+        execution = None
         
         try:
             # Vérifier que le workflow existe
@@ -206,6 +435,7 @@ async def execute_workflow_direct(
                 workflow_id=workflow_id,
                 user_id=current_user["id"],
                 inputs={},
+                trigger="webhook" if workflow.webhook_url else "api",
                 status="running"
             )
             db.add(execution)
@@ -213,12 +443,15 @@ async def execute_workflow_direct(
             db.refresh(execution)
             
             # Exécuter via N8N
-            executor = N8NExecutorService()
+            executor = n8n_backends.executor_for(workflow)
             n8n_workflow_id = int(workflow.n8n_workflow_id)
-            result = await executor.execute_workflow_by_id(n8n_workflow_id)
+            result = await executor.execute_instance(n8n_workflow_id, workflow.webhook_url)
             
-            # Mettre à jour l'exécution
-            execution.status = "success" if result["success"] else "failed"
+            # Mettre à jour l'exécution (un webhook asynchrone reste "running")
+            if result.get("trigger") != "webhook":
+                execution.trigger = "api"
+            if not result.get("pending"):
+                execution.status = "success" if result["success"] else "failed"
             execution.outputs = result.get("data", {})
             execution.n8n_execution_id = result.get("execution_id")
             db.commit()
@@ -231,9 +464,20 @@ async def execute_workflow_direct(
                 "result": result
             }
             
+        except HTTPException as e:
+            _fail_execution(db, execution, str(e.detail))
+            raise
+        except Exception as e:
+            _fail_execution(db, execution, str(e))
+            raise
         finally:
             db.close()
             
+    except HTTPException:
+        raise
+    except N8NUnavailableError as e:
+        logger.error(f"❌ N8N unavailable, error executing workflow {workflow_id}: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error executing workflow {workflow_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -246,7 +490,7 @@ async def toggle_workflow_direct(
 ):
     """Active ou désactive un workflow N8N."""
     try:
-        from app.services.n8n_executor import N8NExecutorService
+        from app.services.n8n_backends import n8n_backends
         from app.models.workflow import Workflow
         
         active = toggle_data.get("active", False)
@@ -260,7 +504,7 @@ async def toggle_workflow_direct(
                 raise HTTPException(status_code=404, detail="Workflow not found")
             
             # Basculer l'état dans N8N
-            executor = N8NExecutorService()
+            executor = n8n_backends.executor_for(workflow)
             n8n_workflow_id = int(workflow.n8n_workflow_id)
             await executor.toggle_workflow(n8n_workflow_id, active)
             
@@ -280,35 +524,15 @@ async def toggle_workflow_direct(
         finally:
             db.close()
             
+    except N8NUnavailableError as e:
+        logger.error(f"❌ N8N unavailable, error toggling workflow {workflow_id}: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error toggling workflow {workflow_id}: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Route legacy pour compatibilité
 @app.post("/admin/sync-crews")
-async def manual_sync_crews():
-    """Synchronisation manuelle des équipes CrewAI SEULEMENT (legacy)"""
-    try:
-        logger.info("🔄 Synchronisation manuelle des crews (legacy endpoint)...")
-        
-        from app.services.crew_executor import CrewDiscoveryService
-        discovery = CrewDiscoveryService()
-        db = next(get_db())
-        
-        try:
-            result = discovery.sync_crews_with_database(db)
-            logger.info(f"✅ Synchronisation crews terminée: {result}")
-            return {
-                "success": True,
-                "message": "Synchronisation crews terminée avec succès",
-                "result": result
-            }
-        finally:
-            db.close()
-            
-    except Exception as e:
-        logger.error(f"❌ Erreur lors de la synchronisation crews: {e}")
-        return {
-            "success": False,
-            "message": f"Erreur lors de la synchronisation: {str(e)}"
-        }
\ No newline at end of file
+async def manual_sync_crews(wait: bool = False):
+    """Synchronisation des équipes CrewAI SEULEMENT (legacy)"""
+    return await _submit_sync("crews", "admin/sync-crews", wait)
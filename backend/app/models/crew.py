@@ -21,6 +21,12 @@ class Crew(Base):
     difficulty = Column(String(50), nullable=True, default="beginner")  # beginner, intermediate, advanced
     inputs = Column(JSON, nullable=True, default=dict)  # Schéma des inputs attendus
     outputs = Column(JSON, nullable=True, default=dict)  # Schéma des outputs produits
+    # Analyse statique du module principal (le code du crew n'est jamais importé pour le catalogue)
+    agents = Column(JSON, nullable=True)  # Rôles, objectifs et outils des agents
+    tasks = Column(JSON, nullable=True)  # Descriptions et résultats attendus des tâches
+    tools = Column(JSON, nullable=True)  # Outils référencés par les agents
+    run_signature = Column(JSON, nullable=True)  # Signature de run_crew (paramètres, défauts)
+    package_hash = Column(String(64), nullable=True)  # SHA-256 du package installé (None = dossier static/crews)
     
     # Champs de gestion
     is_active = Column(Boolean, default=True, nullable=False, index=True)
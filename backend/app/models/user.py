@@ -11,6 +11,8 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
+    plan = Column(String)  # Offre de l'utilisateur (rétention des exécutions, cf. EXECUTION_RETENTION_PLANS)
+    execution_retention_days = Column(Integer)  # Rétention propre à l'utilisateur (prioritaire sur l'offre)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, JSON, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.database.database import Base
 from sqlalchemy.orm import relationship 
@@ -15,6 +15,9 @@ class Workflow(Base):
     
     # Métadonnées N8N
     n8n_workflow_id = Column(String)  # ID dans N8N après installation
+    n8n_definition_hash = Column(String)  # Hash de la définition installée dans N8N (détection des changements)
+    n8n_backend = Column(String)  # Instance N8N qui héberge le workflow (None : backend par défaut)
+    webhook_url = Column(String)  # Webhook POST de déclenchement des workflows clonés (None : API d'exécution)
     node_count = Column(Integer, default=0)
     integrations = Column(JSON)  # Liste des intégrations requises
     required_credentials = Column(JSON)  # Credentials nécessaires
@@ -38,11 +41,26 @@ class WorkflowExecution(Base):
     inputs = Column(JSON)
     outputs = Column(JSON)
     error_message = Column(Text)
+    # Origine : "webhook" / "api" (lancée depuis l'application), sinon le mode N8N (exécutions suivies par le tracker)
+    trigger = Column(String)
     
     # Timestamps
     started_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True))
     
+    # Rétention : après archivage, inputs/outputs sont vidés et la ligne ne sert plus que de résumé
+    archived_at = Column(DateTime(timezone=True))
+    archive_file = Column(String)  # Fichier d'archive (relatif à EXECUTION_ARCHIVE_DIR) qui contient le détail
+    
     # Relations
     workflow = relationship("Workflow")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        # Historique d'un utilisateur trié par date (/workflows/executions)
+        Index("ix_workflow_executions_user_started", "user_id", "started_at"),
+        # Sélection des lignes à archiver
+        Index("ix_workflow_executions_archived_started", "archived_at", "started_at"),
+        # Une exécution N8N ne correspond qu'à une ligne (un workflow vit sur un seul backend)
+        Index("uq_workflow_executions_workflow_n8n", "workflow_id", "n8n_execution_id", unique=True),
+    )
@@ -7,6 +7,7 @@ from sqlalchemy.sql import func
 from app.database.database import get_db
 from app.core.security import get_current_user
 from app.services.credential_manager import CredentialManager, INTEGRATION_TEMPLATES
+from app.services.http_client import http_pool
 from app.models.user import User, UserIntegration
 from app.models.user import User, UserIntegration 
 
@@ -203,6 +204,7 @@ async def remove_integration(
     integration.is_active = False
     integration.status = "not_configured"
     db.commit()
+    credential_manager.forget_cached_credentials(current_user["id"], service_name.lower())
     
     return {"message": f"{service_name.title()} integration removed successfully"}
 
@@ -247,15 +249,13 @@ async def test_integration(service_name: str, credentials: Dict[str, str]) -> bo
     
     try:
         if service_name == "telegram":
-            # Test simple pour Telegram
-            import aiohttp
+            # Test simple pour Telegram (session HTTP partagée)
             token = credentials.get("bot_token")
             if not token:
                 return False
                 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"https://api.telegram.org/bot{token}/getMe") as response:
-                    return response.status == 200
+            async with http_pool.session.get(f"https://api.telegram.org/bot{token}/getMe") as response:
+                return response.status == 200
                     
         elif service_name == "discord":
             # Test pour Discord webhook
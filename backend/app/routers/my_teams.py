@@ -21,6 +21,7 @@ from app.crud.team_instance import (
 from app.crud.crew import get_crew_by_id
 from app.core.security import get_current_user
 from app.services.crew_executor import CrewExecutorService
+from app.services.crew_analysis import validate_crew_inputs
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -269,6 +270,16 @@ async def run_my_team_instance(
                 detail="Définition d'équipe associée non trouvée"
             )
 
+        # Valider les inputs contre la signature analysée (sans importer le crew)
+        crew_inputs = {"topic": input_data.topic}
+        if crew_details.run_signature:
+            input_errors = validate_crew_inputs(crew_details.run_signature, crew_inputs)
+            if input_errors:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Inputs invalides: {'; '.join(input_errors)}"
+                )
+
         # Préparer l'exécution via CrewExecutorService
         executor_service = CrewExecutorService()
         
@@ -277,7 +288,7 @@ async def run_my_team_instance(
         # Exécuter l'équipe
         crew_output = await executor_service.execute_crew(
             crew_details.folder_name,
-            {"topic": input_data.topic}
+            crew_inputs
         )
 
         # Mettre à jour la date de dernière exécution
@@ -413,12 +424,13 @@ async def delete_cloned_workflow(
         # Supprimer dans N8N si possible
         try:
             if workflow.n8n_workflow_id:
-                from app.services.n8n_executor import N8NExecutorService
-                n8n_executor = N8NExecutorService()
+                from app.services.n8n_backends import n8n_backends
+                n8n_executor = n8n_backends.executor_for(workflow)
                 # Try to convert to int, but handle string IDs gracefully
                 try:
                     n8n_id = int(workflow.n8n_workflow_id)
                     await n8n_executor.delete_workflow(n8n_id)
+                    n8n_backends.release(workflow.n8n_backend)
                     logger.info(f"✅ Workflow N8N {workflow.n8n_workflow_id} supprimé")
                 except ValueError:
                     logger.warning(f"⚠️ N8N workflow ID '{workflow.n8n_workflow_id}' is not a valid integer, skipping N8N deletion")
@@ -1,13 +1,14 @@
 # Store API Router - Version Unifiée (Crews + Workflows N8N)
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 from app.database.database import get_db
 from app.schemas.crew import CrewResponse
 from app.crud.crew import get_crews, get_crews_by_category, get_crew_by_id
-from app.services.crew_executor import CrewDiscoveryService
-from app.services.unified_discovery import UnifiedDiscoveryService 
 from app.services.credential_manager import CredentialManager  
+from app.services.sync_manager import sync_manager
+from app.services.n8n_executor import N8NUnavailableError
 from app.core.security import get_current_user
 from app.models.user import User  
 import logging
@@ -17,7 +18,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # ✅ NOUVEAUX : Services unifiés
-unified_discovery = UnifiedDiscoveryService()
 credential_manager = CredentialManager()
 
 # ✅ GARDÉ : Endpoint legacy pour les crews (compatibilité)
@@ -190,7 +190,7 @@ async def get_automation_details(
     automation_id: int,
     automation_type: str,  # "crewai" ou "n8n_workflow"
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Récupère les détails d'une automation spécifique (crew ou workflow)
@@ -217,21 +217,17 @@ async def get_automation_details(
             if not workflow:
                 raise HTTPException(status_code=404, detail="Workflow not found")
             
-            # Vérifier les credentials requis
-            required_creds = workflow.required_credentials or []
-            credential_status = credential_manager.validate_required_credentials(
-                db, current_user.id, required_creds
-            ) if required_creds else {}
+            # Vérifier les credentials requis (une requête, sans déchiffrement)
+            resolved = credential_manager.get_required_credentials(
+                db, current_user["id"], workflow.required_credentials or [], decrypt=False
+            )
             
             return {
                 **workflow.__dict__,
                 "automation_type": "n8n_workflow",
-                "credential_status": credential_status,
-                "can_execute": all(credential_status.values()) if credential_status else True,
-                "missing_credentials": [
-                    cred for cred, configured in credential_status.items() 
-                    if not configured
-                ]
+                "credential_status": resolved["status"],
+                "can_execute": not resolved["missing"],
+                "missing_credentials": resolved["missing"]
             }
         else:
             raise HTTPException(status_code=400, detail="Invalid automation type")
@@ -242,27 +238,38 @@ async def get_automation_details(
         logger.error(f"❌ Erreur lors de la récupération de l'automation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# ✅ MODIFIÉ : Endpoint unifié pour synchroniser tout
+# ✅ MODIFIÉ : Endpoint unifié pour synchroniser tout (via le gestionnaire de jobs)
 @router.post("/sync-all")
-async def sync_all_automations(db: Session = Depends(get_db)):
+async def sync_all_automations(wait: bool = False):
     """
     Synchronise toutes les automations (crews CrewAI + workflows N8N) depuis le système de fichiers
     Args:
-        db: Session de base de données
+        wait: Attendre la fin de la synchronisation avant de répondre
     Returns:
-        Résultat de la synchronisation complète
+        Job de synchronisation (et ses résultats si wait=true)
     """
     try:
         logger.info("🔄 Synchronisation complète des automations depuis le système de fichiers")
         
-        result = unified_discovery.auto_sync_all(db)
+        job = sync_manager.submit("all", trigger="store/sync-all")
+        if not wait:
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+                "success": True,
+                "message": "Automations synchronization scheduled",
+                "job": job.to_dict()
+            })
         
-        logger.info(f"✅ Synchronisation complète terminée: {result}")
+        await sync_manager.wait(job)
+        logger.info(f"✅ Synchronisation complète terminée: {job.status}")
         
         return {
-            "success": True,
-            "message": "Automations synchronized successfully",
-            "results": result
+            "success": job.status == "completed",
+            "message": {
+                "completed": "Automations synchronized successfully",
+                "partial": "Automations partially synchronized (see errors)",
+            }.get(job.status, "Automations synchronization failed"),
+            "results": job.result(),
+            "job": job.to_dict()
         }
         
     except Exception as e:
@@ -274,7 +281,7 @@ async def sync_all_automations(db: Session = Depends(get_db)):
 
 # ✅ GARDÉ : Endpoint legacy pour compatibilité (crews seulement)
 @router.post("/refresh-crews")
-async def refresh_crews_from_filesystem(db: Session = Depends(get_db)):
+async def refresh_crews_from_filesystem(wait: bool = False):
     """
     Rafraîchit la liste des équipes CrewAI en scannant le système de fichiers
     LEGACY: Utilisez /sync-all maintenant pour synchroniser tout
@@ -282,17 +289,29 @@ async def refresh_crews_from_filesystem(db: Session = Depends(get_db)):
     try:
         logger.info("🔄 Rafraîchissement des crews depuis le système de fichiers (legacy endpoint)")
         
-        discovery_service = CrewDiscoveryService()
-        result = discovery_service.sync_crews_with_database(db)
+        job = sync_manager.submit("crews", trigger="store/refresh-crews")
+        if not wait:
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+                "success": True,
+                "message": "Crews refresh scheduled (consider using /sync-all for complete sync)",
+                "job": job.to_dict()
+            })
+        
+        await sync_manager.wait(job)
+        result = job.phase_results.get("crews", {})
         
         logger.info(f"✅ Rafraîchissement crews terminé: {result}")
         
         return {
-            "success": True,
-            "message": "Crews refreshed successfully (consider using /sync-all for complete sync)",
+            "success": job.status == "completed",
+            "message": {
+                "completed": "Crews refreshed successfully (consider using /sync-all for complete sync)",
+                "partial": "Crews partially refreshed (see errors)",
+            }.get(job.status, "Crews refresh failed"),
             "added": result.get("added", 0),
             "updated": result.get("updated", 0),
-            "total": result.get("total", 0)
+            "total": result.get("total", 0),
+            "job": job.to_dict()
         }
         
     except Exception as e:
@@ -453,7 +472,7 @@ async def clone_workflow_template(
     Body: { "userId": "...", "credentials": { "gmail": credId, "googleDrive": credId } }
     """
     try:
-        from app.services.n8n_executor import N8NExecutorService, N8NDiscoveryService
+        from app.services.n8n_executor import N8NDiscoveryService
         from sqlalchemy.orm import Session
         from app.database.database import get_db
         import os
@@ -522,11 +541,16 @@ async def clone_workflow_template(
                 detail=f"You have already cloned the template '{template_name}'. Check your my-teams page."
             )
         
-        # Cloner le workflow
-        executor_service = N8NExecutorService()
-        workflow_id, webhook_url = await executor_service.clone_workflow(
-            template_path, user_id, credentials
-        )
+        # Cloner le workflow sur le backend N8N choisi pour cet utilisateur
+        from app.services.n8n_backends import n8n_backends
+        backend = n8n_backends.place(user_id)
+        try:
+            workflow_id, webhook_url = await n8n_backends.executor(backend.name).clone_workflow(
+                template_path, user_id, credentials
+            )
+        except Exception:
+            n8n_backends.release(backend.name)
+            raise
         unique_folder_name = f"{template_name}_user_{user_id}_{str(uuid.uuid4())[:8]}"
         
         workflow_instance = Workflow(
@@ -536,6 +560,8 @@ async def clone_workflow_template(
             category="Cloned",
             type="n8n_workflow",
             n8n_workflow_id=str(workflow_id),
+            n8n_backend=backend.name,
+            webhook_url=webhook_url,
             is_active=True,
             required_credentials=list(credentials.keys())
         )
@@ -569,6 +595,173 @@ async def clone_workflow_template(
         
     except HTTPException:
         raise
+    except N8NUnavailableError as e:
+        logger.error(f"❌ N8N indisponible lors du clonage: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Erreur lors du clonage: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/workflows/{template_name}/clone-bulk")
+async def clone_workflow_template_bulk(
+    template_name: str,
+    bulk_request: dict,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Clone un template de workflow pour plusieurs utilisateurs (onboarding d'une organisation)
+    Body: { "users": [ { "userId": 1, "credentials": { "gmail": credId } }, ... ],
+            "credentials": { ... } }   # credentials par défaut, complétés par ceux de chaque utilisateur
+    Les lignes Workflow et TeamInstance de tous les clones réussis sont créées en une transaction.
+    Chaque `userId` doit être celui de l'utilisateur connecté (403 sinon).
+    """
+    try:
+        from app.services.n8n_executor import N8NDiscoveryService
+        from app.services.n8n_backends import n8n_backends
+        from app.models.team_instance import TeamInstance
+        from app.models.workflow import Workflow
+        import os
+        import uuid
+
+        users = bulk_request.get("users", [])
+        default_credentials = bulk_request.get("credentials", {})
+        if not users:
+            raise HTTPException(status_code=400, detail="'users' must be a non-empty list")
+
+        # Vérifier que le template existe (une seule lecture du template et des métadonnées)
+        discovery_service = N8NDiscoveryService()
+        template_folder = os.path.join(discovery_service.workflows_base_path, template_name)
+        template_path = os.path.join(template_folder, "workflow.json")
+        if not os.path.exists(template_path):
+            raise HTTPException(status_code=404, detail=f"Template '{template_name}' not found")
+
+        required_services = []
+        meta_path = os.path.join(template_folder, "workflow_meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                required_services = json.load(f).get("required_services", [])
+
+        requested_ids = []
+        for entry in users:
+            try:
+                requested_ids.append(int(entry.get("userId")))
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail=f"Invalid userId: {entry.get('userId')}")
+
+        # Pas de provisionnement pour le compte d'un autre utilisateur
+        foreign_ids = sorted({user_id for user_id in requested_ids if user_id != current_user["id"]})
+        if foreign_ids:
+            raise HTTPException(
+                status_code=403,
+                detail=f"Cannot clone workflows for other users: {', '.join(map(str, foreign_ids))}"
+            )
+
+        # Utilisateurs existants et clones déjà présents, en deux requêtes pour tout le lot
+        existing_users = {
+            row.id for row in db.query(User.id).filter(User.id.in_(requested_ids))
+        }
+        already_cloned = {
+            row.user_id for row in db.query(TeamInstance.user_id).join(Workflow).filter(
+                TeamInstance.user_id.in_(requested_ids),
+                TeamInstance.workflow_id.isnot(None),
+                Workflow.category == "Cloned",
+                Workflow.description.contains(f"Cloned from template {template_name}"),
+                TeamInstance.is_active == True
+            )
+        }
+
+        results: Dict[int, Dict[str, Any]] = {}
+        clone_requests = []
+        for user_id, entry in zip(requested_ids, users):
+            if user_id in results:
+                continue
+            credentials = {**default_credentials, **entry.get("credentials", {})}
+            missing_services = [service for service in required_services if service not in credentials]
+            if user_id not in existing_users:
+                results[user_id] = {"user_id": user_id, "status": "failed", "error": "User not found"}
+            elif user_id in already_cloned:
+                results[user_id] = {"user_id": user_id, "status": "skipped",
+                                    "error": f"Template '{template_name}' already cloned"}
+            elif missing_services:
+                results[user_id] = {"user_id": user_id, "status": "failed",
+                                    "error": f"Missing credentials for services: {', '.join(missing_services)}"}
+            else:
+                results[user_id] = None
+                clone_requests.append({"user_id": user_id, "credentials": credentials})
+
+        # Créations et activations N8N réparties entre les backends, en parallèle (concurrence bornée)
+        clone_results = await n8n_backends.clone_workflows_bulk(template_path, clone_requests)
+
+        # Toutes les lignes en une transaction
+        created = []
+        for request, clone_result in zip(clone_requests, clone_results):
+            user_id = request["user_id"]
+            if not clone_result["success"]:
+                results[user_id] = {"user_id": user_id, "status": "failed", "error": clone_result["error"]}
+                continue
+            workflow_instance = Workflow(
+                name=f"{template_name} - User {user_id}",
+                description=f"Cloned from template {template_name}",
+                folder_name=f"{template_name}_user_{user_id}_{str(uuid.uuid4())[:8]}",
+                category="Cloned",
+                type="n8n_workflow",
+                n8n_workflow_id=str(clone_result["workflow_id"]),
+                n8n_backend=clone_result["backend"],
+                webhook_url=clone_result["webhook_url"],
+                is_active=True,
+                required_credentials=list(request["credentials"].keys())
+            )
+            team_instance = TeamInstance(
+                user_id=user_id,
+                workflow=workflow_instance,
+                name=f"{template_name} - User {user_id}",
+                is_active=True
+            )
+            db.add_all([workflow_instance, team_instance])
+            created.append((user_id, clone_result, workflow_instance))
+
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Les workflows N8N créés n'ont plus de ligne en base : on les supprime
+            for _, clone_result, _ in created:
+                try:
+                    await n8n_backends.executor(clone_result["backend"]).delete_workflow(clone_result["workflow_id"])
+                    n8n_backends.release(clone_result["backend"])
+                except Exception as cleanup_error:
+                    logger.warning(f"⚠️ Workflow N8N {clone_result['workflow_id']} orphelin: {cleanup_error}")
+            raise
+
+        for user_id, clone_result, workflow_instance in created:
+            results[user_id] = {
+                "user_id": user_id,
+                "status": "created",
+                "workflowId": clone_result["workflow_id"],
+                "webhookUrl": clone_result["webhook_url"],
+                "database_id": workflow_instance.id
+            }
+
+        summary = {"requested": len(results), "created": 0, "skipped": 0, "failed": 0}
+        for result in results.values():
+            summary[result["status"]] += 1
+
+        logger.info(
+            f"✅ Clonage en masse de '{template_name}': {summary['created']} créés, "
+            f"{summary['skipped']} ignorés, {summary['failed']} en échec"
+        )
+
+        return {
+            "success": summary["failed"] == 0,
+            "template": template_name,
+            "summary": summary,
+            "results": list(results.values())
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Erreur lors du clonage en masse: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
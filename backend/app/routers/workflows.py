@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
+import asyncio
 import os
 import json
 import logging
 
-from app.database.database import get_db
+from app.database.database import get_db, SessionLocal
 from app.core.security import get_current_user
-from app.services.n8n_executor import N8NExecutorService, N8NDiscoveryService
+from app.services.n8n_executor import N8NExecutorService, N8NDiscoveryService, N8NUnavailableError
+from app.services.n8n_backends import n8n_backends
 from app.services.credential_manager import CredentialManager, INTEGRATION_TEMPLATES
+from app.services.sync_manager import sync_manager
+from app.services.n8n_health import n8n_health
+from app.services.execution_results import (
+    execution_results, iter_result_items, ResultWriter, EXECUTION_RESULTS_CHUNK_SIZE
+)
+from app.services.execution_retention import execution_archive
 from app.models.user import User
 from app.models.workflow import Workflow, WorkflowExecution
 from app.schemas.workflow import WorkflowResponse, CredentialCreate, WorkflowExecutionInput
@@ -18,10 +28,105 @@ from app.models.user import  UserIntegration
 logger = logging.getLogger(__name__) 
 
 router = APIRouter()
-n8n_executor = N8NExecutorService()
+n8n_executor = n8n_backends.executor()  # catalogue : backend par défaut
 n8n_discovery = N8NDiscoveryService()
 credential_manager = CredentialManager()
 
+EXECUTION_OUTPUT_MODES = ("inline", "stream", "disk")
+MAX_RESULTS_PAGE_SIZE = 500
+MAX_STATUS_BATCH_SIZE = 500
+
+def _check_output_mode(output: str) -> None:
+    if output not in EXECUTION_OUTPUT_MODES:
+        raise HTTPException(status_code=400, detail=f"output must be one of: {', '.join(EXECUTION_OUTPUT_MODES)}")
+
+def _finish_stored_execution(execution_id: int, status: str, writer: Optional[ResultWriter] = None,
+                             error_message: Optional[str] = None) -> None:
+    """Met à jour une exécution dont le résultat est écrit sur disque (hors session de la requête)."""
+    db = SessionLocal()
+    try:
+        execution = db.query(WorkflowExecution).filter(WorkflowExecution.id == execution_id).first()
+        execution.status = status
+        execution.completed_at = datetime.utcnow()
+        execution.error_message = error_message
+        if writer is not None:
+            execution.n8n_execution_id = writer.n8n_execution_id
+            execution.outputs = {
+                "stored": True,
+                "bytes": writer.size,
+                "results_url": f"/workflows/executions/{execution_id}/results"
+            }
+        db.commit()
+    finally:
+        db.close()
+
+def _fail_execution(db: Session, execution: Optional[WorkflowExecution], error_message: str) -> None:
+    """
+    Exécution qui n'a pas pu être lancée : marquée "failed", sans trigger, pour que le
+    tracker ne lui associe pas une autre exécution N8N.
+    """
+    if execution is None:
+        return
+    try:
+        db.rollback()
+        execution.status = "failed"
+        execution.error_message = error_message
+        execution.trigger = None
+        execution.completed_at = datetime.utcnow()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Could not mark execution {execution.id} as failed: {e}")
+
+async def _stored_execution_body(execution_id: int, n8n_workflow_id: str, payload: Dict[str, Any],
+                                 executor: N8NExecutorService):
+    """Relaie la réponse N8N morceau par morceau tout en l'écrivant sur disque."""
+    try:
+        with execution_results.open_writer(execution_id) as writer:
+            async for chunk in executor.stream_execution(
+                n8n_workflow_id, payload, chunk_size=EXECUTION_RESULTS_CHUNK_SIZE
+            ):
+                writer.write(chunk)
+                yield chunk
+    except BaseException as e:
+        # Aussi en cas de déconnexion du client (GeneratorExit) : appel synchrone, sans await
+        _finish_stored_execution(execution_id, "failed", error_message=str(e) or type(e).__name__)
+        raise
+    await asyncio.to_thread(_finish_stored_execution, execution_id, "success", writer)
+
+async def _stored_execution_response(execution_id: int, n8n_workflow_id: str, payload: Dict[str, Any], output: str,
+                                     executor: N8NExecutorService = n8n_executor):
+    body = _stored_execution_body(execution_id, n8n_workflow_id, payload, executor)
+    if output == "disk":
+        async for _ in body:
+            pass
+        index = await asyncio.to_thread(execution_results.build_index, execution_id)
+        return {
+            "success": True,
+            "execution_id": execution_id,
+            "status": "success",
+            "stored": True,
+            "items": index["total"],
+            "results_url": f"/workflows/executions/{execution_id}/results"
+        }
+    
+    # Premier morceau lu avant de répondre : une erreur N8N donne encore un vrai statut HTTP
+    try:
+        first_chunk = await body.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    
+    async def relay():
+        yield first_chunk
+        async for chunk in body:
+            yield chunk
+    
+    return StreamingResponse(
+        relay(),
+        media_type="application/json",
+        headers={"X-Execution-Id": str(execution_id)}
+    )
+
 @router.get("/workflows", response_model=List[WorkflowResponse])
 async def get_workflows(
     skip: int = 0,
@@ -42,76 +147,76 @@ async def get_workflows(
 async def get_workflow_details(
     workflow_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Récupère les détails d'un workflow spécifique."""
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    # Vérifier les credentials requis pour cet utilisateur
-    required_creds = workflow.required_credentials or []
-    credential_status = credential_manager.validate_required_credentials(
-        db, current_user.id, required_creds
+    # Vérifier les credentials requis pour cet utilisateur (une requête, sans déchiffrement)
+    resolved = credential_manager.get_required_credentials(
+        db, current_user["id"], workflow.required_credentials or [], decrypt=False
     )
     
     return {
         **workflow.__dict__,
-        "credential_status": credential_status,
-        "missing_credentials": [
-            cred for cred, configured in credential_status.items() 
-            if not configured
-        ]
+        "credential_status": resolved["status"],
+        "missing_credentials": resolved["missing"]
     }
 
 @router.post("/workflows/{workflow_id}/execute")
 async def execute_workflow(
     workflow_id: int,
     execution_input: WorkflowExecutionInput = WorkflowExecutionInput(),
+    output: str = "inline",
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
-    """Exécute un workflow N8N."""
+    """
+    Exécute un workflow N8N.
+    `output` : "inline" (résultat dans la réponse et en base), "stream" (réponse N8N
+    relayée au client et copiée sur disque) ou "disk" (stockée sur disque, consultable
+    via /executions/{id}/results).
+    """
+    _check_output_mode(output)
     workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
     if not workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
     
-    # Vérifier les credentials requis
-    required_creds = workflow.required_credentials or []
-    credential_status = credential_manager.validate_required_credentials(
-        db, current_user.id, required_creds
+    # Vérifier et récupérer les credentials requis (une requête)
+    resolved = credential_manager.get_required_credentials(
+        db, current_user["id"], workflow.required_credentials or []
     )
-    
-    missing_creds = [cred for cred, configured in credential_status.items() if not configured]
-    if missing_creds:
+    if resolved["missing"]:
         raise HTTPException(
             status_code=400, 
-            detail=f"Missing credentials for: {', '.join(missing_creds)}"
+            detail=f"Missing credentials for: {', '.join(resolved['missing'])}"
         )
+    user_credentials = resolved["credentials"]
     
-    # Récupérer les credentials utilisateur
-    user_credentials = {}
-    for service in required_creds:
-        creds = credential_manager.get_user_credentials(db, current_user.id, service)
-        if creds:
-            user_credentials[service] = creds
+    # Vérifier que N8N est accessible (état en cache, sans appel réseau)
+    if not n8n_health.is_available():
+        raise HTTPException(status_code=503, detail="N8N service is not available")
     
     try:
-        # Vérifier que N8N est accessible
-        if not await n8n_executor.check_n8n_health():
-            raise HTTPException(status_code=503, detail="N8N service is not available")
-        
         # Créer un enregistrement d'exécution
         execution = WorkflowExecution(
             workflow_id=workflow_id,
-            user_id=current_user.id,
+            user_id=current_user["id"],
             inputs=execution_input.inputs,
+            trigger="api",
             status="running"
         )
         db.add(execution)
         db.commit()
         db.refresh(execution)
         
+        if output != "inline":
+            n8n_workflow_id = await n8n_executor.resolve_workflow_id(workflow.folder_name)
+            payload = n8n_executor.execution_payload(n8n_workflow_id, execution_input.inputs)
+            return await _stored_execution_response(execution.id, n8n_workflow_id, payload, output)
+        
         # Exécuter le workflow
         result = await n8n_executor.execute_workflow(
             workflow.folder_name, 
@@ -137,14 +242,15 @@ async def execute_workflow(
         execution.error_message = str(e)
         db.commit()
         
-        raise HTTPException(status_code=500, detail=str(e))
+        status_code = e.status if isinstance(e, N8NUnavailableError) else 500
+        raise HTTPException(status_code=status_code, detail=str(e))
 
 @router.post("/credentials/{service_name}")
 async def store_credentials(
     service_name: str,
     credentials: CredentialCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Stocke les credentials d'un utilisateur pour un service."""
     if service_name not in INTEGRATION_TEMPLATES:
@@ -155,7 +261,7 @@ async def store_credentials(
     try:
         stored_credential = credential_manager.store_user_credentials(
             db=db,
-            user_id=current_user.id,
+            user_id=current_user["id"],
             service_name=service_name,
             credential_type=template["type"],
             credentials=credentials.credentials
@@ -171,10 +277,10 @@ async def store_credentials(
 @router.get("/credentials")
 async def get_user_integrations(
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Récupère les intégrations configurées par l'utilisateur."""
-    integrations = credential_manager.get_user_integrations(db, current_user.id)
+    integrations = credential_manager.get_user_integrations(db, current_user["id"])
     
     return {
         "configured_integrations": integrations,
@@ -192,11 +298,11 @@ async def get_user_integrations(
 async def delete_credentials(
     service_name: str,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Supprime les credentials d'un service."""
     credential = db.query(UserIntegration).filter(
-        UserIntegration.user_id == current_user.id,
+        UserIntegration.user_id == current_user["id"],
         UserIntegration.service_name == service_name
     ).first()
     
@@ -205,44 +311,33 @@ async def delete_credentials(
     
     credential.is_active = False
     db.commit()
+    credential_manager.forget_cached_credentials(current_user["id"], service_name)
     
     return {"message": f"Credentials for {service_name} have been deactivated"}
 
 @router.post("/sync-workflows")
 async def sync_workflows(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    wait: bool = False,
+    current_user: dict = Depends(get_current_user)
 ):
-    """Synchronise les workflows depuis le système de fichiers."""
+    """Synchronise les workflows depuis le système de fichiers (job d'arrière-plan partagé)."""
     try:
-        discovered_workflows = n8n_discovery.discover_workflows()
-        added_count = 0
-        updated_count = 0
-        
-        for workflow_data in discovered_workflows:
-            existing = db.query(Workflow).filter(
-                Workflow.folder_name == workflow_data["folder_name"]
-            ).first()
-            
-            if existing:
-                # Mettre à jour
-                for key, value in workflow_data.items():
-                    if hasattr(existing, key):
-                        setattr(existing, key, value)
-                updated_count += 1
-            else:
-                # Créer nouveau
-                new_workflow = Workflow(**workflow_data)
-                db.add(new_workflow)
-                added_count += 1
+        job = sync_manager.submit("workflows", trigger="workflows/sync-workflows")
+        if not wait:
+            return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content={
+                "message": "Workflows synchronization scheduled",
+                "job": job.to_dict()
+            })
         
-        db.commit()
+        await sync_manager.wait(job)
+        result = job.phase_results.get("workflows", {})
         
         return {
             "message": "Workflows synchronized successfully",
-            "added": added_count,
-            "updated": updated_count,
-            "total": len(discovered_workflows)
+            "added": result.get("added", 0),
+            "updated": result.get("updated", 0),
+            "total": result.get("total", 0),
+            "job": job.to_dict()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -252,15 +347,54 @@ async def get_user_executions(
     skip: int = 0,
     limit: int = 50,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Récupère l'historique des exécutions de l'utilisateur."""
     executions = db.query(WorkflowExecution).filter(
-        WorkflowExecution.user_id == current_user.id
+        WorkflowExecution.user_id == current_user["id"]
     ).order_by(WorkflowExecution.started_at.desc()).offset(skip).limit(limit).all()
     
     return executions
 
+@router.get("/executions/{execution_id}/results")
+async def get_execution_results(
+    execution_id: int,
+    page: int = 1,
+    page_size: int = 50,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Parcourt les items du résultat d'une exécution, page par page."""
+    if page < 1 or not 1 <= page_size <= MAX_RESULTS_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"page must be >= 1 and page_size between 1 and {MAX_RESULTS_PAGE_SIZE}")
+    
+    execution = db.query(WorkflowExecution).filter(
+        WorkflowExecution.id == execution_id,
+        WorkflowExecution.user_id == current_user["id"]
+    ).first()
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    if execution_results.exists(execution_id):
+        results_page = await asyncio.to_thread(execution_results.page, execution_id, page, page_size)
+    else:
+        # Résultat "inline" stocké en base, ou dans l'archive pour les exécutions anciennes
+        result = {"data": execution.outputs or {}}
+        if execution.archived_at is not None:
+            result = await asyncio.to_thread(execution_archive.load_result, execution.archive_file, execution_id)
+        items = list(iter_result_items(result or {}))
+        start = (page - 1) * page_size
+        results_page = {
+            "items": items[start:start + page_size],
+            "page": page,
+            "page_size": page_size,
+            "total": len(items),
+            "pages": (len(items) + page_size - 1) // page_size
+        }
+    
+    return {"execution_id": execution_id, "status": execution.status,
+            "archived": execution.archived_at is not None, **results_page}
+
 # Nouveaux endpoints pour le clonage de workflows
 
 @router.get("/templates")
@@ -295,11 +429,11 @@ async def clone_workflow_template(
     template_name: str,
     clone_data: Dict[str, Any],
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Clone un template de workflow pour un utilisateur avec ses credentials."""
     try:
-        user_id = str(current_user.id)
+        user_id = str(current_user["id"])
         credential_map = clone_data.get("credentials", {})
         
         # Construire le chemin vers le template
@@ -358,10 +492,15 @@ async def clone_workflow_template(
                 detail=f"You have already cloned the template '{template_name}'. Check your my-teams page."
             )
         
-        # Cloner le workflow
-        workflow_id, webhook_url = await n8n_executor.clone_workflow(
-            template_path, user_id, credential_map
-        )
+        # Cloner le workflow sur le backend N8N choisi pour cet utilisateur
+        backend = n8n_backends.place(user_id)
+        try:
+            workflow_id, webhook_url = await n8n_backends.executor(backend.name).clone_workflow(
+                template_path, user_id, credential_map
+            )
+        except Exception:
+            n8n_backends.release(backend.name)
+            raise
         unique_folder_name = f"{template_name}_user_{user_id}_{str(uuid.uuid4())[:8]}"
         
         workflow_instance = Workflow(
@@ -371,6 +510,8 @@ async def clone_workflow_template(
             category="Cloned",
             type="n8n_workflow",
             n8n_workflow_id=str(workflow_id),
+            n8n_backend=backend.name,
+            webhook_url=webhook_url,
             is_active=True,
             required_credentials=list(credential_map.keys())
         )
@@ -382,7 +523,7 @@ async def clone_workflow_template(
         # Ajouter automatiquement le workflow aux équipes de l'utilisateur
         from app.models.team_instance import TeamInstance
         team_instance = TeamInstance(
-            user_id=current_user.id,
+            user_id=current_user["id"],
             workflow_id=workflow_instance.id,
             name=f"{template_name} - User {user_id}",
             is_active=True
@@ -401,6 +542,9 @@ async def clone_workflow_template(
         
     except HTTPException:
         raise
+    except N8NUnavailableError as e:
+        logger.error(f"Error cloning workflow template, N8N unavailable: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"Error cloning workflow template: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -408,10 +552,19 @@ async def clone_workflow_template(
 @router.post("/instances/{workflow_id}/execute")
 async def execute_workflow_instance(
     workflow_id: int,
+    output: str = "inline",
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
-    """Lance l'exécution manuelle d'une instance de workflow."""
+    """
+    Lance l'exécution manuelle d'une instance de workflow.
+    `output` : "inline", "stream" ou "disk" (voir POST /workflows/{workflow_id}/execute).
+    En mode "inline", un clone muni d'un webhook est déclenché par ce webhook ; si N8N
+    répond avant la fin de l'exécution, elle reste "running" jusqu'à ce que le tracker
+    d'exécutions la complète.
+    """
+    _check_output_mode(output)
+    execution = None
     try:
         # Vérifier que le workflow existe et appartient à l'utilisateur
         workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
@@ -424,19 +577,27 @@ async def execute_workflow_instance(
         # Créer un enregistrement d'exécution
         execution = WorkflowExecution(
             workflow_id=workflow_id,
-            user_id=current_user.id,
+            user_id=current_user["id"],
             inputs={},
+            trigger="webhook" if workflow.webhook_url and output == "inline" else "api",
             status="running"
         )
         db.add(execution)
         db.commit()
         db.refresh(execution)
         
-        # Exécuter via N8N
-        result = await n8n_executor.execute_workflow_by_id(n8n_workflow_id)
+        # Exécuter sur le backend N8N qui héberge le workflow
+        executor = n8n_backends.executor_for(workflow)
+        if output != "inline":
+            return await _stored_execution_response(execution.id, str(n8n_workflow_id), {"data": {}}, output, executor)
         
-        # Mettre à jour l'exécution
-        execution.status = "success" if result["success"] else "failed"
+        result = await executor.execute_instance(n8n_workflow_id, workflow.webhook_url)
+        
+        # Mettre à jour l'exécution (un webhook asynchrone reste "running")
+        if result.get("trigger") != "webhook":
+            execution.trigger = "api"
+        if not result.get("pending"):
+            execution.status = "success" if result["success"] else "failed"
         execution.outputs = result.get("data", {})
         execution.n8n_execution_id = result.get("execution_id")
         db.commit()
@@ -447,10 +608,106 @@ async def execute_workflow_instance(
             "result": result
         }
         
-    except HTTPException:
+    except HTTPException as e:
+        _fail_execution(db, execution, str(e.detail))
         raise
+    except N8NUnavailableError as e:
+        logger.error(f"Error executing workflow instance, N8N unavailable: {e}")
+        _fail_execution(db, execution, str(e))
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"Error executing workflow instance: {e}")
+        _fail_execution(db, execution, str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _visible_to(current_user: dict):
+    """Condition SQLAlchemy : workflows du catalogue ou clones appartenant à l'utilisateur."""
+    from sqlalchemy import or_, select
+    from app.models.team_instance import TeamInstance
+
+    owned = select(TeamInstance.workflow_id).where(
+        TeamInstance.user_id == current_user["id"], TeamInstance.workflow_id.isnot(None)
+    )
+    return or_(Workflow.category.is_(None), Workflow.category != "Cloned", Workflow.id.in_(owned))
+
+def _instance_status(workflow: Workflow, n8n_status: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "workflow_id": workflow.id,
+        "n8n_workflow_id": workflow.n8n_workflow_id,
+        "found": n8n_status is not None,
+        "active": n8n_status["active"] if n8n_status else False,
+        "updated_at": n8n_status["updatedAt"] if n8n_status else None,
+    }
+
+@router.get("/instances/status")
+async def get_workflow_instances_status(
+    ids: List[int] = Query(...),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Statut N8N de plusieurs instances de workflow (`?ids=1&ids=2`), avec un appel
+    de liste par backend au plus (statuts en cache quelques secondes). Les clones
+    d'autres utilisateurs sont rapportés dans `not_found`.
+    """
+    if len(ids) > MAX_STATUS_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STATUS_BATCH_SIZE} ids per request")
+    try:
+        workflows = db.query(Workflow).filter(
+            Workflow.id.in_(ids), Workflow.n8n_workflow_id.isnot(None), _visible_to(current_user)
+        ).all()
+        # Lecture seule : la connexion est rendue au pool avant d'attendre N8N
+        db.close()
+        
+        # Un lot par backend N8N, interrogés en parallèle
+        groups: Dict[Optional[str], List[Workflow]] = {}
+        for workflow in workflows:
+            groups.setdefault(workflow.n8n_backend, []).append(workflow)
+        backend_statuses = await asyncio.gather(*(
+            n8n_backends.executor(backend).get_workflow_statuses([workflow.n8n_workflow_id for workflow in group])
+            for backend, group in groups.items()
+        ))
+        
+        statuses = {}
+        for group, n8n_statuses in zip(groups.values(), backend_statuses):
+            for workflow in group:
+                statuses[str(workflow.id)] = _instance_status(workflow, n8n_statuses.get(str(workflow.n8n_workflow_id)))
+        
+        return {
+            "statuses": statuses,
+            "not_found": [workflow_id for workflow_id in ids if str(workflow_id) not in statuses]
+        }
+        
+    except N8NUnavailableError as e:
+        logger.error(f"Error getting workflow statuses, N8N unavailable: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting workflow statuses: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/instances/{workflow_id}/status")
+async def get_workflow_instance_status(
+    workflow_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Statut N8N d'une instance de workflow (en cache quelques secondes)."""
+    try:
+        workflow = db.query(Workflow).filter(Workflow.id == workflow_id, _visible_to(current_user)).first()
+        if not workflow or not workflow.n8n_workflow_id:
+            raise HTTPException(status_code=404, detail="Workflow not found")
+        db.close()
+        
+        n8n_status = await n8n_backends.executor_for(workflow).get_workflow_status(workflow.n8n_workflow_id)
+        return _instance_status(workflow, n8n_status)
+        
+    except HTTPException:
+        raise
+    except N8NUnavailableError as e:
+        logger.error(f"Error getting workflow status, N8N unavailable: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting workflow status: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.patch("/instances/{workflow_id}")
@@ -458,7 +715,7 @@ async def toggle_workflow_instance(
     workflow_id: int,
     toggle_data: Dict[str, bool],
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """Active ou désactive une instance de workflow."""
     try:
@@ -471,7 +728,7 @@ async def toggle_workflow_instance(
         
         # Basculer l'état dans N8N
         n8n_workflow_id = int(workflow.n8n_workflow_id)
-        await n8n_executor.toggle_workflow(n8n_workflow_id, active)
+        await n8n_backends.executor_for(workflow).toggle_workflow(n8n_workflow_id, active)
         
         # Mettre à jour en base de données
         workflow.is_active = active
@@ -486,6 +743,9 @@ async def toggle_workflow_instance(
         
     except HTTPException:
         raise
+    except N8NUnavailableError as e:
+        logger.error(f"Error toggling workflow, N8N unavailable: {e}")
+        raise HTTPException(status_code=e.status, detail=str(e))
     except Exception as e:
         logger.error(f"Error toggling workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -16,6 +16,11 @@ class CrewBase(BaseModel):
     difficulty: Optional[str] = "beginner"
     inputs: Optional[Dict[str, Any]] = {}
     outputs: Optional[Dict[str, Any]] = {}
+    agents: Optional[List[Dict[str, Any]]] = None
+    tasks: Optional[List[Dict[str, Any]]] = None
+    tools: Optional[List[Dict[str, Any]]] = None
+    run_signature: Optional[Dict[str, Any]] = None
+    package_hash: Optional[str] = None
 
 class CrewCreate(CrewBase):
     """Schéma pour la création d'une équipe"""
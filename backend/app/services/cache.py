@@ -0,0 +1,129 @@
+# app/services/cache.py
+"""
+Cache mémoire à durée de vie courte, avec regroupement des chargements simultanés.
+
+Quand plusieurs requêtes demandent en même temps une clé absente ou expirée, un
+seul chargement est lancé et tous les appelants attendent son résultat. Les erreurs
+ne sont pas mises en cache. Les entrées les plus anciennement utilisées sont
+évincées au-delà de `max_entries`.
+
+Chaque invalidation fait avancer un compteur de génération. Un chargement note la
+génération à son début et la passe à `set` : si la clé a été invalidée entre-temps,
+la valeur lue avant l'invalidation n'est pas mise en cache.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Awaitable, Hashable, Optional
+
+# Distingue "absent du cache" d'une valeur None mise en cache
+MISSING = object()
+
+
+class CoalescingCache:
+    """
+    Cache TTL borné ; `get_or_load` et `coalesce` partagent les appels en cours.
+    """
+    def __init__(self, name: str, ttl: float, max_entries: int = 10000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        # Génération de la dernière invalidation de chaque clé (bornée comme les entrées)
+        self._generation = 0
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self._cleared_at = 0
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "loads": 0, "load_errors": 0, "evictions": 0,
+                       "stale_loads": 0}
+
+    def get(self, key: Hashable) -> Any:
+        """Valeur en cache et encore fraîche, sinon MISSING."""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() >= entry[1]:
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self._stats["misses"] += 1
+            return MISSING
+        self._stats["hits"] += 1
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def generation(self) -> int:
+        """Génération courante, à noter avant un chargement et à passer à `set`."""
+        return self._generation
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None) -> bool:
+        """
+        Met `value` en cache. Avec `generation`, la valeur est ignorée (False) si la
+        clé a été invalidée depuis cette génération.
+        """
+        if generation is not None and max(self._cleared_at, self._invalidated.get(key, 0)) > generation:
+            self._stats["stale_loads"] += 1
+            return False
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        self._generation += 1
+        self._entries.pop(key, None)
+        self._invalidated[key] = self._generation
+        self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_entries:
+            self._invalidated.popitem(last=False)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._cleared_at = self._generation
+        self._entries.clear()
+        self._invalidated.clear()
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Valeur fraîche du cache, sinon résultat de `loader()` (un seul appel par clé à la fois)."""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+
+        async def load_and_store() -> Any:
+            generation = self.generation()
+            value = await loader()
+            self.set(key, value, generation)
+            return value
+
+        return await self.coalesce(key, load_and_store)
+
+    async def coalesce(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Exécute `loader()`, ou attend l'appel déjà en cours pour la même clé. Le
+        résultat n'est pas mis en cache par cette méthode.
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self._stats["coalesced"] += 1
+        else:
+            self._stats["loads"] += 1
+            future = self._in_flight[key] = asyncio.ensure_future(loader())
+
+            def done(completed: asyncio.Future) -> None:
+                self._in_flight.pop(key, None)
+                if not completed.cancelled() and completed.exception() is not None:
+                    self._stats["load_errors"] += 1
+
+            future.add_done_callback(done)
+        # Un appelant annulé n'annule pas le chargement partagé
+        return await asyncio.shield(future)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "ttl": self.ttl,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "in_flight": len(self._in_flight),
+            **self._stats,
+        }
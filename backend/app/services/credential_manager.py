@@ -1,11 +1,111 @@
 import os
 import json
 import base64
-from cryptography.fernet import Fernet
-from typing import Dict, Any, Optional
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from typing import Dict, Any, Optional, Tuple, List
 from sqlalchemy.orm import Session
 from app.models.user import UserIntegration
 
+# Anciennes clés de chiffrement (séparées par des virgules) : encore acceptées en lecture,
+# CREDENTIAL_ENCRYPTION_KEY (la plus récente) chiffre toutes les écritures
+CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS = os.getenv("CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS", "")
+
+# Format stocké : le jeton Fernet tel quel (déjà en base64 URL-safe). Le texte chiffré
+# commence par un octet d'en-tête indiquant la version du format :
+#   0x01 : JSON UTF-8
+#   0x02 : JSON UTF-8 compressé (zlib)
+# Ancien format (sans en-tête) : base64(jeton Fernet(JSON)), encore lu et converti par
+# le rechiffrement en arrière-plan (app/services/credential_rotation.py).
+FORMAT_JSON = 0x01
+FORMAT_JSON_ZLIB = 0x02
+# Un jeton Fernet commence toujours par l'octet de version 0x80 ("gAAAAA" en base64) ;
+# l'ancien format le ré-encode en base64 et commence donc par "Z0FBQUFB".
+_FERNET_TOKEN_PREFIX = "gAAAAA"
+
+# Compression des credentials dont le JSON dépasse ce nombre d'octets (0 : jamais)
+CREDENTIAL_COMPRESS_MIN_BYTES = int(os.getenv("CREDENTIAL_COMPRESS_MIN_BYTES", "512"))
+
+# Credentials déchiffrés gardés en mémoire (secondes, 0 : pas de cache) et nombre d'entrées
+CREDENTIAL_CACHE_TTL = float(os.getenv("CREDENTIAL_CACHE_TTL", "300"))
+CREDENTIAL_CACHE_SIZE = int(os.getenv("CREDENTIAL_CACHE_SIZE", "1000"))
+
+
+class DecryptedCredentialCache:
+    """
+    Cache borné (LRU) et à durée de vie limitée des credentials déchiffrés, par
+    (utilisateur, service). Le JSON en clair est gardé dans un bytearray, remis à
+    zéro dès que l'entrée expire, est invalidée ou évincée ; chaque lecture renvoie
+    un nouveau dict. Python ne permet pas d'effacer les copies faites ailleurs
+    (dict renvoyé, chaînes intermédiaires) : l'effacement limite seulement la durée
+    de vie du secret dans le cache.
+    """
+    def __init__(self, ttl: float = CREDENTIAL_CACHE_TTL, max_entries: int = CREDENTIAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[int, str], Tuple[bytearray, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _wipe(secret: bytearray) -> None:
+        secret[:] = bytes(len(secret))
+
+    def get(self, user_id: int, service_name: str) -> Optional[Dict[str, Any]]:
+        key = (user_id, service_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() >= entry[1]:
+                self._wipe(self._entries.pop(key)[0])
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._entries.move_to_end(key)
+            return json.loads(bytes(entry[0]))
+
+    def put(self, user_id: int, service_name: str, plaintext: bytes) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        key = (user_id, service_name)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._wipe(previous[0])
+            self._entries[key] = (bytearray(plaintext), time.monotonic() + self.ttl)
+            while len(self._entries) > self.max_entries:
+                self._wipe(self._entries.popitem(last=False)[1][0])
+                self._stats["evictions"] += 1
+
+    def invalidate(self, user_id: int, service_name: Optional[str] = None) -> None:
+        """Oublie un service d'un utilisateur, ou tous ses services si `service_name` est None."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == user_id and service_name in (None, key[1])]
+            for key in keys:
+                self._wipe(self._entries.pop(key)[0])
+            self._stats["invalidations"] += len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            for secret, _ in self._entries.values():
+                self._wipe(secret)
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"ttl": self.ttl, "entries": len(self._entries), "max_entries": self.max_entries, **self._stats}
+
+
+# Partagé par toutes les instances de CredentialManager (une par router) : une écriture
+# dans un router invalide le cache lu par les autres. Chaque processus a le sien ;
+# le TTL borne le décalage entre workers.
+decrypted_credentials = DecryptedCredentialCache()
+
+
 class CredentialManager:
     """
     Gestionnaire sécurisé des credentials utilisateur pour les intégrations.
@@ -20,23 +120,81 @@ class CredentialManager:
             print(f"⚠️  Generated encryption key: {encryption_key}")
             print("⚠️  Set CREDENTIAL_ENCRYPTION_KEY environment variable in production!")
         
-        self.cipher = Fernet(encryption_key.encode() if isinstance(encryption_key, str) else encryption_key)
+        # La clé courante chiffre ; toutes les clés (courante puis anciennes) déchiffrent
+        keys = [encryption_key] + [key.strip() for key in CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS.split(",") if key.strip()]
+        fernets = [Fernet(key.encode() if isinstance(key, str) else key) for key in keys]
+        self.primary_cipher = fernets[0]
+        self.cipher = MultiFernet(fernets)
+        self.key_count = len(fernets)
 
     def encrypt_credentials(self, credentials: Dict[str, Any]) -> str:
         """Chiffre les credentials utilisateur."""
-        credentials_json = json.dumps(credentials)
-        encrypted_data = self.cipher.encrypt(credentials_json.encode())
-        return base64.b64encode(encrypted_data).decode()
+        return self._encrypt(json.dumps(credentials).encode())
+
+    def _encrypt(self, plaintext: bytes) -> str:
+        """Valeur stockée (format courant) pour un JSON en clair."""
+        payload = bytes([FORMAT_JSON]) + plaintext
+        if CREDENTIAL_COMPRESS_MIN_BYTES and len(plaintext) >= CREDENTIAL_COMPRESS_MIN_BYTES:
+            compressed = zlib.compress(plaintext)
+            if len(compressed) < len(plaintext):
+                payload = bytes([FORMAT_JSON_ZLIB]) + compressed
+        return self.primary_cipher.encrypt(payload).decode()
+
+    @staticmethod
+    def is_legacy_format(encrypted_credentials: str) -> bool:
+        """Valeur stockée dans l'ancien format (jeton Fernet ré-encodé en base64)."""
+        return not encrypted_credentials.startswith(_FERNET_TOKEN_PREFIX)
+
+    def _open(self, encrypted_credentials: str, cipher) -> bytes:
+        """Déchiffre une valeur stockée (ancien ou nouveau format) et renvoie le JSON en clair."""
+        if self.is_legacy_format(encrypted_credentials):
+            # Ancien format : pas d'en-tête, le texte chiffré est directement le JSON
+            return cipher.decrypt(base64.b64decode(encrypted_credentials.encode()))
+        payload = cipher.decrypt(encrypted_credentials.encode())
+        if payload[0] == FORMAT_JSON:
+            return payload[1:]
+        if payload[0] == FORMAT_JSON_ZLIB:
+            return zlib.decompress(payload[1:])
+        raise ValueError(f"Unknown credential format version: {payload[0]}")
+
+    def _decrypt(self, encrypted_credentials: str) -> bytes:
+        """JSON en clair des credentials."""
+        try:
+            return self._open(encrypted_credentials, self.cipher)
+        except InvalidToken:
+            raise ValueError("Failed to decrypt credentials: no configured key decrypts them")
+        except Exception as e:
+            raise ValueError(f"Failed to decrypt credentials: {e}")
 
     def decrypt_credentials(self, encrypted_credentials: str) -> Dict[str, Any]:
         """Déchiffre les credentials utilisateur."""
+        plaintext = self._decrypt(encrypted_credentials)
         try:
-            encrypted_data = base64.b64decode(encrypted_credentials.encode())
-            decrypted_data = self.cipher.decrypt(encrypted_data)
-            return json.loads(decrypted_data.decode())
-        except Exception as e:
+            return json.loads(plaintext.decode())
+        except ValueError as e:
             raise ValueError(f"Failed to decrypt credentials: {e}")
 
+    def reencrypt_credentials(self, encrypted_credentials: str) -> Optional[str]:
+        """
+        Valeur stockée réécrite avec la clé et le format courants, ou None si elle
+        les utilise déjà.
+
+        Raises:
+            ValueError: aucune clé connue ne déchiffre la valeur.
+        """
+        try:
+            if not self.is_legacy_format(encrypted_credentials):
+                try:
+                    self._open(encrypted_credentials, self.primary_cipher)
+                    return None
+                except InvalidToken:
+                    pass
+            return self._encrypt(self._open(encrypted_credentials, self.cipher))
+        except InvalidToken:
+            raise ValueError("Failed to re-encrypt credentials: no configured key decrypts them")
+        except Exception as e:
+            raise ValueError(f"Failed to re-encrypt credentials: {e}")
+
     def store_user_credentials(self, 
                              db: Session, 
                              user_id: int, 
@@ -57,9 +215,10 @@ class CredentialManager:
         if existing:
             # Mettre à jour
             existing.encrypted_credentials = encrypted_creds
-            existing.credential_type = credential_type
+            existing.service_type = credential_type
             existing.is_active = True
             db.commit()
+            decrypted_credentials.invalidate(user_id, service_name)
             db.refresh(existing)
             return existing
         else:
@@ -67,22 +226,34 @@ class CredentialManager:
             new_credential = UserIntegration(
                 user_id=user_id,
                 service_name=service_name,
-                credential_type=credential_type,
+                service_type=credential_type,
                 encrypted_credentials=encrypted_creds,
                 is_active=True
             )
             db.add(new_credential)
             db.commit()
+            decrypted_credentials.invalidate(user_id, service_name)
             db.refresh(new_credential)
             return new_credential
 
+    def forget_cached_credentials(self, user_id: int, service_name: Optional[str] = None) -> None:
+        """
+        À appeler après toute modification directe d'une ligne UserIntegration
+        (désactivation, suppression) : les credentials déchiffrés en cache sont effacés.
+        """
+        decrypted_credentials.invalidate(user_id, service_name)
+
     def get_user_credentials(self, 
                            db: Session, 
                            user_id: int, 
                            service_name: str) -> Optional[Dict[str, Any]]:
         """
-        Récupère et déchiffre les credentials utilisateur.
+        Récupère et déchiffre les credentials utilisateur (en cache CREDENTIAL_CACHE_TTL secondes).
         """
+        cached = decrypted_credentials.get(user_id, service_name)
+        if cached is not None:
+            return cached
+
         credential = db.query(UserIntegration).filter(
             UserIntegration.user_id == user_id,
             UserIntegration.service_name == service_name,
@@ -90,7 +261,9 @@ class CredentialManager:
         ).first()
 
         if credential:
-            return self.decrypt_credentials(credential.encrypted_credentials)
+            plaintext = self._decrypt(credential.encrypted_credentials)
+            decrypted_credentials.put(user_id, service_name, plaintext)
+            return json.loads(plaintext.decode())
         return None
 
     def get_user_integrations(self, db: Session, user_id: int) -> Dict[str, str]:
@@ -103,7 +276,7 @@ class CredentialManager:
         ).all()
 
         return {
-            cred.service_name: cred.credential_type 
+            cred.service_name: cred.service_type 
             for cred in credentials
         }
 
@@ -114,13 +287,49 @@ class CredentialManager:
         """
         Vérifie si l'utilisateur a configuré toutes les intégrations requises.
         """
-        user_integrations = self.get_user_integrations(db, user_id)
-        
-        return {
-            integration: integration in user_integrations
-            for integration in required_integrations
+        return self.get_required_credentials(db, user_id, required_integrations, decrypt=False)["status"]
+
+    def get_required_credentials(self,
+                                 db: Session,
+                                 user_id: int,
+                                 required_integrations: List[str],
+                                 decrypt: bool = True) -> Dict[str, Any]:
+        """
+        Valide et déchiffre en une requête les credentials requis d'un utilisateur :
+        {"status": {service: configuré}, "missing": [services], "credentials": {service: dict}}.
+        Les credentials déjà en cache ne sont pas déchiffrés à nouveau ; avec
+        `decrypt=False`, seule la validation est faite (sans lire les secrets).
+        """
+        required = list(dict.fromkeys(required_integrations or []))
+        result = {"status": {}, "missing": [], "credentials": {}}
+        if not required:
+            return result
+
+        columns = [UserIntegration.service_name]
+        if decrypt:
+            columns.append(UserIntegration.encrypted_credentials)
+        rows = {
+            row.service_name: row for row in db.query(*columns).filter(
+                UserIntegration.user_id == user_id,
+                UserIntegration.service_name.in_(required),
+                UserIntegration.is_active == True
+            )
         }
 
+        for service_name in required:
+            row = rows.get(service_name)
+            result["status"][service_name] = row is not None
+            if row is None:
+                result["missing"].append(service_name)
+            elif decrypt:
+                credentials = decrypted_credentials.get(user_id, service_name)
+                if credentials is None:
+                    plaintext = self._decrypt(row.encrypted_credentials)
+                    decrypted_credentials.put(user_id, service_name, plaintext)
+                    credentials = json.loads(plaintext.decode())
+                result["credentials"][service_name] = credentials
+        return result
+
 # Templates de configuration pour les intégrations populaires
 INTEGRATION_TEMPLATES = {
     "telegram": {
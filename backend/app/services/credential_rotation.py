@@ -0,0 +1,257 @@
+# app/services/credential_rotation.py
+"""
+Réécriture en arrière-plan des credentials stockés avec une ancienne clé ou dans
+l'ancien format (base64 du jeton Fernet, sans en-tête de version).
+
+Les lignes de `user_integrations` sont parcourues par lots (par id croissant). Chaque
+lot est lu, rechiffré hors transaction puis écrit et validé séparément, si bien que
+les lectures normales de credentials ne sont jamais bloquées longtemps. L'écriture
+ne remplace une valeur que si elle n'a pas changé depuis sa lecture : un credential
+modifié entre-temps par l'utilisateur est déjà au format et à la clé courants.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from sqlalchemy import func
+
+from app.database.database import SessionLocal
+from app.models.user import UserIntegration
+
+logger = logging.getLogger(__name__)
+
+# Lignes traitées par transaction et pause entre deux lots (secondes)
+CREDENTIAL_ROTATION_BATCH_SIZE = int(os.getenv("CREDENTIAL_ROTATION_BATCH_SIZE", "200"))
+CREDENTIAL_ROTATION_PAUSE = float(os.getenv("CREDENTIAL_ROTATION_PAUSE", "0.05"))
+
+
+class CredentialRotationJob:
+    """
+    Un passage de rechiffrement et sa progression.
+    """
+    def __init__(self, trigger: str, batch_size: int):
+        self.id = str(uuid.uuid4())
+        self.trigger = trigger
+        self.batch_size = batch_size
+        self.status = "queued"  # "queued", "running", "completed", "failed"
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.rotated = 0
+        self.converted = 0
+        self.unchanged = 0
+        self.conflicts = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_id = 0
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self.errors: List[str] = []
+        self.joined_requests = 0
+        self.cancel_requested = False
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started_monotonic: Optional[float] = None
+        self._finished_monotonic: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self._started_monotonic is None:
+            return None
+        end = self._finished_monotonic if self._finished_monotonic is not None else time.monotonic()
+        return round(end - self._started_monotonic, 3)
+
+    def progress_percent(self) -> float:
+        if self.status == "completed":
+            return 100.0
+        if not self.total:
+            return 0.0
+        return round(100.0 * min(self.processed, self.total) / self.total, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "trigger": self.trigger,
+            "status": self.status,
+            "progress_percent": self.progress_percent(),
+            "total": self.total,
+            "processed": self.processed,
+            "rotated": self.rotated,
+            "converted": self.converted,
+            "unchanged": self.unchanged,
+            "conflicts": self.conflicts,
+            "failed": self.failed,
+            "batches": self.batches,
+            "batch_size": self.batch_size,
+            "last_id": self.last_id,
+            "bytes_before": self.bytes_before,
+            "bytes_after": self.bytes_after,
+            "errors": list(self.errors),
+            "joined_requests": self.joined_requests,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": self.duration_seconds,
+        }
+
+
+class CredentialRotationManager:
+    """
+    Lance et suit les passages de rechiffrement ; un seul tourne à la fois et une
+    nouvelle demande rejoint le passage actif.
+    """
+    def __init__(self, history_size: int = 10):
+        self._jobs: Dict[str, CredentialRotationJob] = {}
+        self._active: Optional[CredentialRotationJob] = None
+        self._history: deque = deque(maxlen=history_size)
+
+    def submit(self, trigger: str = "manual", batch_size: Optional[int] = None) -> CredentialRotationJob:
+        """Planifie un rechiffrement, ou renvoie le passage déjà en cours."""
+        if not os.getenv("CREDENTIAL_ENCRYPTION_KEY"):
+            raise ValueError("CREDENTIAL_ENCRYPTION_KEY is not set")
+
+        if self._active is not None and self._active.is_active:
+            self._active.joined_requests += 1
+            logger.info(f"Credential rotation request ({trigger}) joined running job {self._active.id}")
+            return self._active
+
+        job = CredentialRotationJob(trigger, batch_size or CREDENTIAL_ROTATION_BATCH_SIZE)
+        self._jobs[job.id] = job
+        self._active = job
+        job.task = asyncio.create_task(self._run(job))
+        logger.info(f"Credential rotation job {job.id} queued (trigger={trigger})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[CredentialRotationJob]:
+        return self._jobs.get(job_id)
+
+    def status(self) -> Dict[str, Any]:
+        from app.services.credential_manager import CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS
+
+        previous_keys = [key for key in CREDENTIAL_ENCRYPTION_PREVIOUS_KEYS.split(",") if key.strip()]
+        return {
+            "previous_keys": len(previous_keys),
+            "active": self._active.to_dict() if self._active is not None and self._active.is_active else None,
+            "history": [job.to_dict() for job in reversed(self._history)],
+        }
+
+    async def shutdown(self) -> None:
+        """Arrête le passage en cours à la fin du lot courant."""
+        job = self._active
+        if job is None or job.task is None or job.task.done():
+            return
+        job.cancel_requested = True
+        try:
+            await job.task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self, job: CredentialRotationJob) -> None:
+        try:
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            job._started_monotonic = time.monotonic()
+            logger.info(f"Credential rotation job {job.id} started (batch_size={job.batch_size})")
+
+            await asyncio.to_thread(self._rotate_rows, job)
+
+            if job.cancel_requested:
+                job.status = "failed"
+                job.errors.append("cancelled")
+            else:
+                job.status = "completed"
+        except Exception as e:
+            job.status = "failed"
+            job.errors.append(str(e))
+            logger.error(f"Credential rotation job {job.id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+            if job._started_monotonic is not None:
+                job._finished_monotonic = time.monotonic()
+            self._history.append(job)
+            kept = {j.id for j in self._history}
+            self._jobs = {job_id: j for job_id, j in self._jobs.items() if job_id in kept}
+            logger.info(
+                f"Credential rotation job {job.id} {job.status} in {job.duration_seconds}s: "
+                f"{job.rotated} rotated, {job.unchanged} unchanged, {job.conflicts} conflicts, {job.failed} failed"
+            )
+
+    def _rotate_rows(self, job: CredentialRotationJob) -> None:
+        """Parcourt la table par lots dans un thread, avec sa propre session DB."""
+        from app.services.credential_manager import CredentialManager
+
+        credential_manager = CredentialManager()
+        table = UserIntegration.__table__
+        db = SessionLocal()
+        try:
+            job.total = db.query(func.count(UserIntegration.id)).scalar() or 0
+            db.commit()
+
+            while not job.cancel_requested:
+                rows = (
+                    db.query(UserIntegration.id, UserIntegration.encrypted_credentials)
+                    .filter(UserIntegration.id > job.last_id)
+                    .order_by(UserIntegration.id)
+                    .limit(job.batch_size)
+                    .all()
+                )
+                # Rechiffrement hors transaction
+                db.commit()
+                if not rows:
+                    break
+
+                updates = []
+                for row_id, stored in rows:
+                    try:
+                        rewritten = credential_manager.reencrypt_credentials(stored)
+                    except ValueError as e:
+                        job.failed += 1
+                        if len(job.errors) < 20:
+                            job.errors.append(f"integration {row_id}: {e}")
+                        continue
+                    if rewritten is None:
+                        job.unchanged += 1
+                    else:
+                        updates.append((row_id, stored, rewritten))
+
+                for row_id, stored, rewritten in updates:
+                    result = db.execute(
+                        table.update()
+                        .where(table.c.id == row_id, table.c.encrypted_credentials == stored)
+                        .values(encrypted_credentials=rewritten)
+                    )
+                    if result.rowcount:
+                        job.rotated += 1
+                        if credential_manager.is_legacy_format(stored):
+                            job.converted += 1
+                        job.bytes_before += len(stored)
+                        job.bytes_after += len(rewritten)
+                    else:
+                        job.conflicts += 1
+                db.commit()
+
+                job.batches += 1
+                job.processed += len(rows)
+                job.last_id = rows[-1][0]
+                if len(rows) < job.batch_size:
+                    break
+                if CREDENTIAL_ROTATION_PAUSE > 0:
+                    time.sleep(CREDENTIAL_ROTATION_PAUSE)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+credential_rotation = CredentialRotationManager()
@@ -0,0 +1,212 @@
+# app/services/crew_analysis.py
+"""
+Analyse statique (ast) du module principal d'un crew.
+
+Extrait agents, tâches, outils et la signature de `run_crew` sans importer
+le module : l'import d'un crew instancie ses LLM et ses outils.
+"""
+import ast
+import logging
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RUN_FUNCTION_NAME = "run_crew"
+
+
+def _literal_text(node: Optional[ast.AST]) -> Optional[str]:
+    """Texte d'une constante ou d'une f-string (les expressions gardent la forme `{expr}`)."""
+    if node is None:
+        return None
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(str(value.value))
+            elif isinstance(value, ast.FormattedValue):
+                parts.append("{" + ast.unparse(value.value) + "}")
+        return "".join(parts)
+    return ast.unparse(node)
+
+
+def _call_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Call):
+        node = node.func
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _keywords(call: ast.Call) -> Dict[str, ast.AST]:
+    return {keyword.arg: keyword.value for keyword in call.keywords if keyword.arg}
+
+
+def _names_in(node: Optional[ast.AST]) -> List[str]:
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [ast.unparse(element) for element in node.elts]
+    return [ast.unparse(node)] if node is not None else []
+
+
+class _CrewVisitor(ast.NodeVisitor):
+    def __init__(self):
+        self.function_stack: List[str] = []
+        self.module_assignments: Dict[str, ast.AST] = {}
+        self.imports: List[str] = []
+        self.agents: List[Dict[str, Any]] = []
+        self.tasks: List[Dict[str, Any]] = []
+        self.tool_refs: List[str] = []
+        self.crews: List[Dict[str, Any]] = []
+        self.run_function: Optional[ast.FunctionDef] = None
+
+    def visit_Import(self, node: ast.Import):
+        self.imports.extend(alias.name for alias in node.names)
+
+    def visit_ImportFrom(self, node: ast.ImportFrom):
+        if node.module and node.level == 0:
+            self.imports.append(node.module)
+
+    def visit_Assign(self, node: ast.Assign):
+        if not self.function_stack:
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    self.module_assignments[target.id] = node.value
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        if not self.function_stack and node.name == RUN_FUNCTION_NAME:
+            self.run_function = node
+        self.function_stack.append(node.name)
+        self.generic_visit(node)
+        self.function_stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_Call(self, node: ast.Call):
+        name = _call_name(node)
+        keywords = _keywords(node)
+        defined_in = self.function_stack[-1] if self.function_stack else None
+
+        if name == "Agent":
+            tools = _names_in(keywords.get("tools"))
+            self.tool_refs.extend(tools)
+            self.agents.append({
+                "role": _literal_text(keywords.get("role")),
+                "goal": _literal_text(keywords.get("goal")),
+                "tools": tools,
+                "llm": ast.unparse(keywords["llm"]) if "llm" in keywords else None,
+                "allow_delegation": _literal_text(keywords.get("allow_delegation")),
+                "factory": defined_in,
+            })
+        elif name == "Task":
+            self.tasks.append({
+                "description": _literal_text(keywords.get("description")),
+                "expected_output": _literal_text(keywords.get("expected_output")),
+                "agent": ast.unparse(keywords["agent"]) if "agent" in keywords else None,
+                "factory": defined_in,
+            })
+        elif name == "Crew":
+            self.crews.append({
+                "process": ast.unparse(keywords["process"]) if "process" in keywords else None,
+                "agent_count": len(_names_in(keywords.get("agents"))),
+                "task_count": len(_names_in(keywords.get("tasks"))),
+            })
+        self.generic_visit(node)
+
+
+def _signature(function: ast.FunctionDef) -> Dict[str, Any]:
+    args = function.args
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    parameters = []
+    for arg, default in zip(positional, defaults):
+        parameters.append({
+            "name": arg.arg,
+            "kind": "positional_or_keyword",
+            "annotation": ast.unparse(arg.annotation) if arg.annotation else None,
+            "default": ast.unparse(default) if default is not None else None,
+            "required": default is None,
+        })
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        parameters.append({
+            "name": arg.arg,
+            "kind": "keyword_only",
+            "annotation": ast.unparse(arg.annotation) if arg.annotation else None,
+            "default": ast.unparse(default) if default is not None else None,
+            "required": default is None,
+        })
+    return {
+        "name": function.name,
+        "is_async": isinstance(function, ast.AsyncFunctionDef),
+        "parameters": parameters,
+        "var_positional": args.vararg.arg if args.vararg else None,
+        "var_keyword": args.kwarg.arg if args.kwarg else None,
+        "returns": ast.unparse(function.returns) if function.returns else None,
+        "docstring": ast.get_docstring(function),
+    }
+
+
+def analyze_crew_source(source: str, filename: str = "<crew>") -> Dict[str, Any]:
+    """
+    Analyse le code source d'un module de crew et renvoie ses métadonnées.
+
+    Raises:
+        SyntaxError: si le module n'est pas du Python valide.
+    """
+    tree = ast.parse(source, filename=filename)
+    visitor = _CrewVisitor()
+    visitor.visit(tree)
+
+    tools = []
+    for reference in dict.fromkeys(visitor.tool_refs):
+        assignment = visitor.module_assignments.get(reference)
+        tools.append({
+            "name": reference,
+            "type": _call_name(assignment) if isinstance(assignment, ast.Call) else None,
+        })
+
+    run_signature = _signature(visitor.run_function) if visitor.run_function else None
+    return {
+        "agents": visitor.agents,
+        "tasks": visitor.tasks,
+        "tools": tools,
+        "run_signature": run_signature,
+        "crew": visitor.crews[0] if visitor.crews else None,
+        "imports": sorted(set(visitor.imports)),
+    }
+
+
+def inputs_from_signature(run_signature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Schéma d'inputs (format crew_meta.json) déduit de la signature de run_crew."""
+    if not run_signature:
+        return {}
+    inputs = {}
+    for parameter in run_signature["parameters"]:
+        schema = {"type": "string", "required": parameter["required"]}
+        if parameter["default"] is not None and parameter["default"] != "None":
+            schema["default"] = parameter["default"]
+        inputs[parameter["name"]] = schema
+    return inputs
+
+
+def validate_crew_inputs(run_signature: Optional[Dict[str, Any]], inputs: Dict[str, Any]) -> List[str]:
+    """
+    Vérifie des inputs contre la signature analysée de run_crew, sans importer le crew.
+    Renvoie la liste des erreurs (vide si les inputs sont acceptables).
+    """
+    if not run_signature:
+        return [f"Function '{RUN_FUNCTION_NAME}' not found in crew module"]
+
+    errors = []
+    parameters = {parameter["name"]: parameter for parameter in run_signature["parameters"]}
+    for name, parameter in parameters.items():
+        if parameter["required"] and name not in inputs:
+            errors.append(f"Missing required input: {name}")
+    if not run_signature.get("var_keyword"):
+        for name in inputs:
+            if name not in parameters:
+                errors.append(f"Unexpected input: {name}")
+    return errors
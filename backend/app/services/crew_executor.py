@@ -3,15 +3,26 @@ import importlib.util
 import logging
 import subprocess
 import sys
-from typing import Dict, Any, Optional, List
+import tempfile
+import zipimport
+from typing import Dict, Any, Optional, List, Callable
 from sqlalchemy.orm import Session
 
 # Adjust import paths for your models and crud if needed
 from app.models.crew import Crew
 from app.schemas.crew import CrewCreate
+from app.services.crew_packages import CrewPackageStore
+from app.services.crew_analysis import analyze_crew_source, inputs_from_signature
 
 logger = logging.getLogger(__name__)
 
+# Chargement des crews packagés : "extract" (cache par hash) ou "zipimport" (sans extraction)
+CREW_PACKAGE_LOAD_MODE = os.getenv("CREW_PACKAGE_LOAD_MODE", "extract")
+# Champs issus de l'analyse statique du module principal, synchronisés en base
+ANALYSIS_FIELDS = ("inputs", "agents", "tasks", "tools", "run_signature")
+# Packages dont les dépendances ont déjà été installées par ce processus
+_installed_package_dependencies = set()
+
 class CrewExecutorService:
     """
     Service pour exécuter dynamiquement les équipes CrewAI.
@@ -22,6 +33,7 @@ class CrewExecutorService:
         # Normalisation du chemin pour éviter les problèmes
         self.crews_base_path = os.path.normpath(self.crews_base_path)
         logger.info(f"Crew execution base path: {self.crews_base_path}")
+        self.package_store = CrewPackageStore()
 
     def _install_crew_dependencies(self, crew_folder_path: str) -> bool:
         """
@@ -43,21 +55,9 @@ class CrewExecutorService:
             logger.error(f"Failed to install dependencies: {e}")
             return False
 
-    async def execute_crew(self, folder_name: str, inputs: Dict[str, Any]) -> Any:
+    def _load_folder_crew(self, folder_name: str):
         """
-        Exécute une équipe CrewAI spécifique.
-
-        Args:
-            folder_name: Le nom du dossier de l'équipe (ex: "divert_marketing_pitch").
-            inputs: Un dictionnaire d'inputs pour le crew (ex: {"topic": "AI in healthcare"}).
-
-        Returns:
-            Le résultat de l'exécution du CrewAI.
-
-        Raises:
-            FileNotFoundError: Si le dossier de l'équipe ou le module principal n'est pas trouvé.
-            AttributeError: Si la fonction d'exécution du crew n'est pas trouvée.
-            Exception: Pour toute autre erreur lors de l'exécution du crew.
+        Charge le module principal d'un crew depuis son dossier static/crews.
         """
         crew_path = os.path.join(self.crews_base_path, folder_name)
         main_crew_module_name = f"{folder_name}_main"
@@ -74,14 +74,75 @@ class CrewExecutorService:
         if not self._install_crew_dependencies(crew_path):
             raise Exception(f"Failed to install dependencies for crew '{folder_name}'")
 
-        try:
-            # Dynamically load the module
-            spec = importlib.util.spec_from_file_location(main_crew_module_name, main_crew_file)
+        return self._exec_module_from_file(main_crew_module_name, main_crew_file)
+
+    def _load_packaged_crew(self, folder_name: str, package_hash: str):
+        """
+        Charge le module principal d'un crew packagé : soit depuis son extraction
+        en cache (cache/<hash>/, faite une seule fois), soit directement depuis
+        l'archive via zipimport (CREW_PACKAGE_LOAD_MODE=zipimport).
+        """
+        main_crew_module_name = f"{folder_name}_main"
+
+        if package_hash not in _installed_package_dependencies:
+            requirements = self.package_store.read_file(package_hash, "requirements.txt")
+            if requirements is not None:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    with open(os.path.join(tmp_dir, "requirements.txt"), 'wb') as f:
+                        f.write(requirements)
+                    if not self._install_crew_dependencies(tmp_dir):
+                        raise Exception(f"Failed to install dependencies for crew '{folder_name}'")
+            _installed_package_dependencies.add(package_hash)
+
+        if CREW_PACKAGE_LOAD_MODE == "zipimport":
+            importer = zipimport.zipimporter(self.package_store.package_file(package_hash))
+            spec = importer.find_spec(main_crew_module_name)
             if spec is None:
-                raise ImportError(f"Could not load spec for module {main_crew_module_name}")
-            
+                raise ImportError(f"Module {main_crew_module_name} not found in package {package_hash[:12]}")
             crew_module = importlib.util.module_from_spec(spec)
             spec.loader.exec_module(crew_module)
+            logger.info(f"Loaded crew '{folder_name}' from package {package_hash[:12]} (zipimport)")
+            return crew_module
+
+        package_dir = self.package_store.extract(package_hash)
+        main_crew_file = os.path.join(package_dir, f"{main_crew_module_name}.py")
+        logger.info(f"Loaded crew '{folder_name}' from package {package_hash[:12]} (cache)")
+        return self._exec_module_from_file(main_crew_module_name, main_crew_file)
+
+    def _exec_module_from_file(self, module_name: str, module_file: str):
+        # Dynamically load the module
+        spec = importlib.util.spec_from_file_location(module_name, module_file)
+        if spec is None:
+            raise ImportError(f"Could not load spec for module {module_name}")
+
+        crew_module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(crew_module)
+        return crew_module
+
+    async def execute_crew(self, folder_name: str, inputs: Dict[str, Any]) -> Any:
+        """
+        Exécute une équipe CrewAI spécifique.
+
+        Args:
+            folder_name: Le nom du dossier de l'équipe (ex: "divert_marketing_pitch").
+            inputs: Un dictionnaire d'inputs pour le crew (ex: {"topic": "AI in healthcare"}).
+
+        Returns:
+            Le résultat de l'exécution du CrewAI.
+
+        Raises:
+            FileNotFoundError: Si le dossier de l'équipe ou le module principal n'est pas trouvé.
+            AttributeError: Si la fonction d'exécution du crew n'est pas trouvée.
+            Exception: Pour toute autre erreur lors de l'exécution du crew.
+        """
+        main_crew_module_name = f"{folder_name}_main"
+        package_hash = self.package_store.current_package(folder_name)
+
+        try:
+            if package_hash:
+                crew_module = self._load_packaged_crew(folder_name, package_hash)
+            else:
+                crew_module = self._load_folder_crew(folder_name)
 
             # Assuming the crew's main execution function is named 'run_crew'
             if not hasattr(crew_module, 'run_crew'):
@@ -95,6 +156,8 @@ class CrewExecutorService:
             logger.info(f"Successfully executed crew: {folder_name}")
             return crew_result
 
+        except FileNotFoundError:
+            raise
         except Exception as e:
             logger.error(f"Error executing crew '{folder_name}': {e}", exc_info=True)
             raise Exception(f"Failed to execute crew '{folder_name}': {e}")
@@ -112,6 +175,7 @@ class CrewDiscoveryService:
         # Normalisation du chemin pour éviter les problèmes
         self.crews_base_path = os.path.normpath(self.crews_base_path)
         logger.info(f"Crew discovery base path: {self.crews_base_path}")
+        self.package_store = CrewPackageStore()
 
     def discover_crews(self) -> List[Dict[str, Any]]:
         """
@@ -135,6 +199,10 @@ class CrewDiscoveryService:
                                 meta["folder_name"] = folder_name
                                 if "is_active" not in meta:
                                     meta["is_active"] = True
+                                main_file_path = os.path.join(crew_folder_path, f"{folder_name}_main.py")
+                                if os.path.exists(main_file_path):
+                                    with open(main_file_path, 'r', encoding='utf-8') as main_file:
+                                        self._add_static_analysis(meta, main_file.read(), main_file_path)
                                 discovered_crews.append(meta)
                                 logger.info(f"Discovered crew: {meta['name']} (folder: {folder_name})")
                             else:
@@ -146,12 +214,55 @@ class CrewDiscoveryService:
                 else:
                     logger.warning(f"Skipping crew in '{folder_name}': crew_meta.json not found.")
         
+        # Crews packagés : le manifeste est lu dans l'archive, sans extraction.
+        # Un package remplace le dossier de même nom (version figée par son hash).
+        packaged_folders = set()
+        for manifest in self.package_store.iter_manifests():
+            if not all(field in manifest for field in ("name", "description", "category")):
+                logger.warning(f"Skipping crew package '{manifest['folder_name']}': manifest missing required fields.")
+                continue
+            manifest.setdefault("is_active", True)
+            main_module_name = f"{manifest['folder_name']}_main.py"
+            main_source = self.package_store.read_file(manifest["package_hash"], main_module_name)
+            if main_source is not None:
+                self._add_static_analysis(manifest, main_source.decode('utf-8'), main_module_name)
+            packaged_folders.add(manifest["folder_name"])
+            discovered_crews.append(manifest)
+            logger.info(f"Discovered crew package: {manifest['name']} {manifest.get('version')} ({manifest['package_hash'][:12]})")
+        if packaged_folders:
+            discovered_crews = [
+                crew for crew in discovered_crews
+                if crew.get("package_hash") or crew["folder_name"] not in packaged_folders
+            ]
+        
         logger.info(f"Total crews discovered: {len(discovered_crews)}")
         return discovered_crews
 
-    def sync_crews_with_database(self, db: Session) -> Dict[str, int]:
+    def _add_static_analysis(self, meta: Dict[str, Any], source: str, filename: str) -> None:
+        """
+        Complète les métadonnées d'un crew par l'analyse statique de son module
+        principal (agents, tâches, outils, signature de run_crew), sans l'importer.
+        """
+        try:
+            analysis = analyze_crew_source(source, filename)
+        except SyntaxError as e:
+            logger.error(f"Cannot analyse crew module {filename}: {e}")
+            return
+
+        meta["agents"] = analysis["agents"]
+        meta["tasks"] = analysis["tasks"]
+        meta["tools"] = analysis["tools"]
+        meta["run_signature"] = analysis["run_signature"]
+        if not meta.get("inputs"):
+            meta["inputs"] = inputs_from_signature(analysis["run_signature"])
+        if analysis["run_signature"] is None:
+            logger.warning(f"Crew module {filename} does not define run_crew()")
+
+    def sync_crews_with_database(self, db: Session,
+                                 on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
         """
         Synchronise les crews découverts avec la base de données.
+        `on_progress(processed, total)` est appelé après chaque crew traité.
         """
         from app.crud.crew import create_crew
         
@@ -159,7 +270,9 @@ class CrewDiscoveryService:
         added_count = 0
         updated_count = 0
         
-        for crew_data in discovered_crews:
+        for index, crew_data in enumerate(discovered_crews, start=1):
+            if on_progress:
+                on_progress(index - 1, len(discovered_crews))
             existing_crew = db.query(Crew).filter(Crew.folder_name == crew_data["folder_name"]).first()
             
             if existing_crew:
@@ -173,6 +286,16 @@ class CrewDiscoveryService:
                 if existing_crew.category != crew_data["category"]:
                     existing_crew.category = crew_data["category"]
                     changed = True
+                if existing_crew.version != crew_data.get("version", existing_crew.version):
+                    existing_crew.version = crew_data["version"]
+                    changed = True
+                if existing_crew.package_hash != crew_data.get("package_hash"):
+                    existing_crew.package_hash = crew_data.get("package_hash")
+                    changed = True
+                for field in ANALYSIS_FIELDS:
+                    if field in crew_data and getattr(existing_crew, field) != crew_data[field]:
+                        setattr(existing_crew, field, crew_data[field])
+                        changed = True
                 if not existing_crew.is_active:
                     existing_crew.is_active = True
                     changed = True
@@ -191,6 +314,9 @@ class CrewDiscoveryService:
                 except Exception as e:
                     logger.error(f"Error creating crew {crew_data['name']}: {e}")
         
+        if on_progress:
+            on_progress(len(discovered_crews), len(discovered_crews))
+        
         # Deactivate crews not found on filesystem
         db_crews = db.query(Crew).all()
         discovered_folder_names = {c["folder_name"] for c in discovered_crews}
@@ -0,0 +1,258 @@
+# app/services/crew_packages.py
+"""
+Magasin local de packages de crews, adressés par leur contenu.
+
+Un package est une archive zip contenant à sa racine `crew_meta.json`
+(le manifeste), `<folder_name>_main.py` et éventuellement `requirements.txt`.
+Il est identifié par le SHA-256 de l'archive :
+
+    <store>/packages/<sha256>.zip      archives importées (immuables)
+    <store>/cache/<sha256>/            extraction unique, partagée par les exécutions
+    <store>/index.json                 folder_name -> version courante et versions connues
+"""
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from datetime import datetime
+from typing import Dict, Any, Optional, Iterator
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "crew_meta.json"
+REQUIREMENTS_NAME = "requirements.txt"
+# Horodatage fixe des entrées : deux builds du même dossier donnent le même hash
+_ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _atomic_write_json(path: str, data: Dict[str, Any]) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class CrewPackageStore:
+    """
+    Service pour construire, importer et charger des packages de crews versionnés.
+    """
+    def __init__(self, store_root_dir: Optional[str] = None):
+        store_root_dir = store_root_dir or os.getenv("CREW_PACKAGE_STORE", "static/crew_packages")
+        self.store_path = os.path.normpath(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", store_root_dir
+        ))
+        self.packages_path = os.path.join(self.store_path, "packages")
+        self.cache_path = os.path.join(self.store_path, "cache")
+        self.index_file = os.path.join(self.store_path, "index.json")
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------ build / import
+
+    def build_package(self, crew_folder_path: str, output_dir: str) -> str:
+        """
+        Construit une archive déterministe depuis un dossier de crew (format historique
+        de static/crews) et renvoie son chemin `<folder>-<version>-<hash12>.zip`.
+        """
+        folder_name = os.path.basename(os.path.normpath(crew_folder_path))
+        meta_file = os.path.join(crew_folder_path, MANIFEST_NAME)
+        main_file = os.path.join(crew_folder_path, f"{folder_name}_main.py")
+        if not os.path.exists(meta_file) or not os.path.exists(main_file):
+            raise FileNotFoundError(f"'{crew_folder_path}' needs {MANIFEST_NAME} and {folder_name}_main.py")
+
+        with open(meta_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest["folder_name"] = folder_name
+        manifest.setdefault("version", "1.0.0")
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            self._write_entry(archive, MANIFEST_NAME, json.dumps(manifest, indent=2, sort_keys=True).encode())
+            for root, dirs, files in os.walk(crew_folder_path):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for file_name in sorted(files):
+                    if file_name == MANIFEST_NAME or file_name.endswith((".pyc", ".pyo")):
+                        continue
+                    full_path = os.path.join(root, file_name)
+                    arcname = os.path.relpath(full_path, crew_folder_path).replace(os.sep, "/")
+                    with open(full_path, 'rb') as f:
+                        self._write_entry(archive, arcname, f.read())
+
+        data = buffer.getvalue()
+        package_hash = hashlib.sha256(data).hexdigest()
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, f"{folder_name}-{manifest['version']}-{package_hash[:12]}.zip")
+        with open(output_file, 'wb') as f:
+            f.write(data)
+        logger.info(f"Built crew package {output_file}")
+        return output_file
+
+    def import_package(self, archive_path: str) -> Dict[str, Any]:
+        """
+        Importe une archive dans le magasin (idempotent) et en fait la version courante du crew.
+        """
+        package_hash = _sha256_file(archive_path)
+        manifest = self._read_manifest_from(archive_path)
+        folder_name = manifest.get("folder_name")
+        if not folder_name:
+            raise ValueError(f"{MANIFEST_NAME} in '{archive_path}' has no folder_name")
+        for field in ("name", "description", "category"):
+            if field not in manifest:
+                raise ValueError(f"{MANIFEST_NAME} in '{archive_path}' is missing '{field}'")
+        with zipfile.ZipFile(archive_path) as archive:
+            if f"{folder_name}_main.py" not in archive.namelist():
+                raise ValueError(f"Package '{archive_path}' has no {folder_name}_main.py at its root")
+
+        os.makedirs(self.packages_path, exist_ok=True)
+        target = self.package_file(package_hash)
+        if not os.path.exists(target):
+            fd, tmp_path = tempfile.mkstemp(dir=self.packages_path, suffix=".tmp")
+            os.close(fd)
+            shutil.copyfile(archive_path, tmp_path)
+            os.replace(tmp_path, target)
+
+        version = str(manifest.get("version", "1.0.0"))
+        with self._lock:
+            index = self._load_index()
+            entry = index.setdefault(folder_name, {"versions": {}})
+            entry["versions"][version] = package_hash
+            entry["current"] = package_hash
+            entry["version"] = version
+            entry["imported_at"] = datetime.utcnow().isoformat()
+            _atomic_write_json(self.index_file, index)
+
+        logger.info(f"Imported crew package {folder_name} {version} ({package_hash[:12]})")
+        return {"folder_name": folder_name, "version": version, "hash": package_hash}
+
+    # ------------------------------------------------------------------ lookup
+
+    def package_file(self, package_hash: str) -> str:
+        return os.path.join(self.packages_path, f"{package_hash}.zip")
+
+    def current_package(self, folder_name: str) -> Optional[str]:
+        """Hash du package courant d'un crew, ou None si le crew n'est pas packagé."""
+        entry = self._load_index().get(folder_name)
+        return entry.get("current") if entry else None
+
+    def read_manifest(self, package_hash: str) -> Dict[str, Any]:
+        """Lit le manifeste directement dans l'archive, sans l'extraire."""
+        return self._read_manifest_from(self.package_file(package_hash))
+
+    def iter_manifests(self) -> Iterator[Dict[str, Any]]:
+        """Manifestes des versions courantes de tous les crews packagés."""
+        for folder_name, entry in self._load_index().items():
+            package_hash = entry.get("current")
+            try:
+                manifest = self.read_manifest(package_hash)
+            except Exception as e:
+                logger.error(f"Error reading crew package '{folder_name}' ({package_hash}): {e}")
+                continue
+            manifest["folder_name"] = folder_name
+            manifest["package_hash"] = package_hash
+            yield manifest
+
+    def read_file(self, package_hash: str, name: str) -> Optional[bytes]:
+        """Lit un fichier de l'archive sans l'extraire (None s'il n'existe pas)."""
+        with zipfile.ZipFile(self.package_file(package_hash)) as archive:
+            try:
+                return archive.read(name)
+            except KeyError:
+                return None
+
+    # ------------------------------------------------------------------ extraction
+
+    def extract(self, package_hash: str) -> str:
+        """
+        Extrait le package une seule fois dans cache/<hash>/ et renvoie ce dossier.
+        L'extraction se fait dans un dossier temporaire renommé atomiquement, donc
+        des exécutions concurrentes ne voient jamais un cache partiel.
+        """
+        target = os.path.join(self.cache_path, package_hash)
+        if os.path.isdir(target):
+            return target
+
+        os.makedirs(self.cache_path, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_path, prefix=f".{package_hash[:12]}-")
+        try:
+            with zipfile.ZipFile(self.package_file(package_hash)) as archive:
+                for member in archive.infolist():
+                    destination = os.path.realpath(os.path.join(tmp_dir, member.filename))
+                    if not destination.startswith(os.path.realpath(tmp_dir) + os.sep):
+                        raise ValueError(f"Unsafe path in crew package: {member.filename}")
+                archive.extractall(tmp_dir)
+            try:
+                os.replace(tmp_dir, target)
+            except OSError:
+                # Un autre processus a extrait le même hash entre-temps
+                if not os.path.isdir(target):
+                    raise
+        finally:
+            if os.path.isdir(tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        logger.info(f"Extracted crew package {package_hash[:12]} to {target}")
+        return target
+
+    # ------------------------------------------------------------------ internals
+
+    def _load_index(self) -> Dict[str, Any]:
+        if not os.path.exists(self.index_file):
+            return {}
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_manifest_from(self, archive_path: str) -> Dict[str, Any]:
+        with zipfile.ZipFile(archive_path) as archive:
+            return json.loads(archive.read(MANIFEST_NAME).decode('utf-8'))
+
+    @staticmethod
+    def _write_entry(archive: zipfile.ZipFile, arcname: str, data: bytes) -> None:
+        info = zipfile.ZipInfo(arcname, date_time=_ZIP_EPOCH)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        archive.writestr(info, data)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Gestion des packages de crews")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Construire une archive depuis un dossier de crew")
+    build_parser.add_argument("crew_folder")
+    build_parser.add_argument("--output-dir", default=".")
+    build_parser.add_argument("--import", dest="do_import", action="store_true", help="Importer l'archive construite")
+    import_parser = subparsers.add_parser("import", help="Importer une archive dans le magasin local")
+    import_parser.add_argument("archive")
+    subparsers.add_parser("list", help="Lister les crews packagés")
+    args = parser.parse_args()
+
+    store = CrewPackageStore()
+    if args.command == "build":
+        archive_file = store.build_package(args.crew_folder, args.output_dir)
+        print(archive_file)
+        if args.do_import:
+            print(json.dumps(store.import_package(archive_file)))
+    elif args.command == "import":
+        print(json.dumps(store.import_package(args.archive)))
+    else:
+        for manifest in store.iter_manifests():
+            print(f"{manifest['folder_name']}\t{manifest.get('version')}\t{manifest['package_hash']}")
@@ -0,0 +1,372 @@
+# app/services/execution_results.py
+"""
+Stockage sur disque des résultats d'exécution N8N volumineux.
+
+La réponse N8N est écrite par morceaux dans `<root>/<execution_id>.json` pendant
+qu'elle est relayée au client, sans être chargée en mémoire sur le chemin de la
+requête. Pour la consultation paginée, le fichier est indexé une fois :
+
+    <execution_id>.items.jsonl   un item par ligne
+    <execution_id>.offsets       position de début de chaque ligne (uint64)
+
+Une page ne lit ensuite que ses propres lignes. L'indexation lit le résultat en flux :
+la mémoire utilisée est bornée par la taille d'un item, pas par celle du fichier.
+"""
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from array import array
+from typing import Dict, Any, Optional, Iterator, List
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_RESULTS_CHUNK_SIZE = int(os.getenv("EXECUTION_RESULTS_CHUNK_SIZE", str(64 * 1024)))
+EXECUTION_ID_PATTERN = re.compile(rb'"executionId"\s*:\s*"?([A-Za-z0-9_-]+)"?')
+
+
+def iter_result_items(result: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Items d'un résultat N8N. Pour une exécution complète (`data.resultData.runData`),
+    un item par sortie de nœud : {"node", "run", "output", "json"}. Sinon, les
+    éléments de `data` si c'est une liste, ou `data` lui-même.
+    """
+    data = result.get("data", result) if isinstance(result, dict) else result
+    run_data = ((data or {}).get("resultData") or {}).get("runData") if isinstance(data, dict) else None
+    if isinstance(run_data, dict):
+        for node_name, runs in run_data.items():
+            for run_index, run in enumerate(runs or []):
+                for output_index, items in enumerate(((run or {}).get("data") or {}).get("main") or []):
+                    for item in items or []:
+                        yield {
+                            "node": node_name,
+                            "run": run_index,
+                            "output": output_index,
+                            "json": item.get("json", item) if isinstance(item, dict) else item,
+                        }
+    elif isinstance(data, list):
+        for item in data:
+            yield {"json": item}
+    elif data is not None:
+        yield {"json": data}
+
+
+class _JSONStream:
+    """
+    Lecture incrémentale d'un document JSON depuis un fichier texte. Les conteneurs
+    sont parcourus clé par clé / élément par élément ; seules les valeurs lues avec
+    `read_value` sont décodées (json.JSONDecoder.raw_decode sur un tampon glissant).
+    Après chaque clé ou élément, l'appelant doit lire ou sauter la valeur.
+    """
+    _decoder = json.JSONDecoder()
+    _whitespace = re.compile(r"[ \t\n\r]*")
+
+    def __init__(self, f, chunk_size: int = EXECUTION_RESULTS_CHUNK_SIZE):
+        self._file = f
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        """Ajoute un morceau au tampon (au moins la taille déjà en attente : coût linéaire)."""
+        if self._eof:
+            return False
+        pending = len(self._buffer) - self._pos
+        chunk = self._file.read(max(self._chunk_size, pending))
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> Optional[str]:
+        """Prochain caractère significatif (None en fin de fichier), sans le consommer."""
+        while True:
+            self._pos = self._whitespace.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected '{char}'")
+        self._pos += 1
+
+    def _separator(self, closing: str) -> bool:
+        """Consomme ',' (True : un autre élément suit) ou le caractère fermant (False)."""
+        char = self.peek()
+        self._pos += 1
+        if char == closing:
+            return False
+        if char != ",":
+            raise ValueError(f"Invalid JSON: expected ',' or '{closing}'")
+        return True
+
+    def read_value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # Un nombre peut être coupé en fin de tampon ("12" | "3")
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def skip_value(self) -> None:
+        char = self.peek()
+        if char == "{":
+            for _ in self.iter_object():
+                self.skip_value()
+        elif char == "[":
+            for _ in self.iter_array():
+                self.skip_value()
+        else:
+            self.read_value()
+
+    def iter_object(self) -> Iterator[str]:
+        self._expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            if not self._separator("}"):
+                return
+
+    def iter_array(self) -> Iterator[None]:
+        self._expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield None
+            if not self._separator("]"):
+                return
+
+
+def _stream_run_data(stream: _JSONStream) -> Iterator[Dict[str, Any]]:
+    """Items de `runData`, comme iter_result_items, sans charger l'objet."""
+    for node_name in stream.iter_object():
+        if stream.peek() != "[":
+            stream.skip_value()
+            continue
+        for run_index, _ in enumerate(stream.iter_array()):
+            if stream.peek() != "{":
+                stream.skip_value()
+                continue
+            for run_key in stream.iter_object():
+                if run_key != "data" or stream.peek() != "{":
+                    stream.skip_value()
+                    continue
+                for data_key in stream.iter_object():
+                    if data_key != "main" or stream.peek() != "[":
+                        stream.skip_value()
+                        continue
+                    for output_index, _ in enumerate(stream.iter_array()):
+                        if stream.peek() != "[":
+                            stream.skip_value()
+                            continue
+                        for _ in stream.iter_array():
+                            item = stream.read_value()
+                            yield {
+                                "node": node_name,
+                                "run": run_index,
+                                "output": output_index,
+                                "json": item.get("json", item) if isinstance(item, dict) else item,
+                            }
+
+
+def _stream_data_items(stream: _JSONStream) -> Iterator[Dict[str, Any]]:
+    """Items de la valeur `data` à la position courante (mêmes règles que iter_result_items)."""
+    char = stream.peek()
+    if char == "[":
+        for _ in stream.iter_array():
+            yield {"json": stream.read_value()}
+        return
+    if char != "{":
+        value = stream.read_value()
+        if value is not None:
+            yield {"json": value}
+        return
+
+    # Objet : les items viennent de resultData.runData. Sans runData, l'objet entier est
+    # l'unique item ; les autres clés ne sont gardées que tant que runData n'a pas été vu.
+    rest: Dict[str, Any] = {}
+    streamed = False
+    for key in stream.iter_object():
+        if streamed:
+            stream.skip_value()
+        elif key == "resultData" and stream.peek() == "{":
+            result_data: Dict[str, Any] = {}
+            for result_key in stream.iter_object():
+                if streamed:
+                    stream.skip_value()
+                elif result_key == "runData" and stream.peek() == "{":
+                    streamed = True
+                    yield from _stream_run_data(stream)
+                else:
+                    result_data[result_key] = stream.read_value()
+            rest[key] = result_data
+        else:
+            rest[key] = stream.read_value()
+    if not streamed:
+        yield {"json": rest}
+
+
+def iter_stored_result_items(path: str, meta: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Items d'un résultat stocké sur disque, lus en flux (voir iter_result_items).
+    `meta["n8n_execution_id"]` reçoit la clé `executionId` de premier niveau.
+    """
+    meta = meta if meta is not None else {}
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JSONStream(f)
+        if stream.peek() != "{":
+            yield from _stream_data_items(stream)
+            return
+        has_data = False
+        for key in stream.iter_object():
+            if key == "data":
+                has_data = True
+                yield from _stream_data_items(stream)
+            elif key == "executionId":
+                meta["n8n_execution_id"] = stream.read_value()
+            else:
+                stream.skip_value()
+    if not has_data:
+        # Pas de clé "data" : le résultat entier en tient lieu (second passage)
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from _stream_data_items(_JSONStream(f))
+
+
+class ExecutionResultStore:
+    """
+    Résultats d'exécution sur disque et pagination par items.
+    """
+    def __init__(self, results_root_dir: Optional[str] = None):
+        results_root_dir = results_root_dir or os.getenv("EXECUTION_RESULTS_DIR", "static/execution_results")
+        self.root_path = os.path.normpath(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", results_root_dir
+        ))
+        # Une seule indexation à la fois (un fichier ne doit être indexé qu'une fois)
+        self._index_lock = threading.Lock()
+
+    def result_file(self, execution_id: int) -> str:
+        return os.path.join(self.root_path, f"{execution_id}.json")
+
+    def _items_file(self, execution_id: int) -> str:
+        return os.path.join(self.root_path, f"{execution_id}.items.jsonl")
+
+    def _offsets_file(self, execution_id: int) -> str:
+        return os.path.join(self.root_path, f"{execution_id}.offsets")
+
+    def exists(self, execution_id: int) -> bool:
+        return os.path.exists(self.result_file(execution_id))
+
+    def open_writer(self, execution_id: int) -> "ResultWriter":
+        os.makedirs(self.root_path, exist_ok=True)
+        return ResultWriter(self.result_file(execution_id))
+
+    def build_index(self, execution_id: int) -> Dict[str, Any]:
+        """
+        Découpe le résultat stocké en items (JSON Lines + table des positions).
+        Idempotent ; renvoie {"total", "n8n_execution_id"}.
+        """
+        with self._index_lock:
+            offsets_file = self._offsets_file(execution_id)
+            if os.path.exists(offsets_file):
+                return {"total": os.path.getsize(offsets_file) // 8, "n8n_execution_id": None}
+
+            meta: Dict[str, Any] = {"n8n_execution_id": None}
+            offsets = array('Q')
+            items_tmp = self._items_file(execution_id) + ".tmp"
+            with open(items_tmp, 'wb') as out:
+                for item in iter_stored_result_items(self.result_file(execution_id), meta):
+                    offsets.append(out.tell())
+                    out.write(json.dumps(item, separators=(",", ":")).encode('utf-8') + b"\n")
+
+            os.replace(items_tmp, self._items_file(execution_id))
+            with open(offsets_file + ".tmp", 'wb') as f:
+                offsets.tofile(f)
+            os.replace(offsets_file + ".tmp", offsets_file)
+            logger.info(f"Indexed execution {execution_id} results: {len(offsets)} items")
+            return {"total": len(offsets), "n8n_execution_id": meta["n8n_execution_id"]}
+
+    def page(self, execution_id: int, page: int = 1, page_size: int = 50) -> Dict[str, Any]:
+        """Une page d'items ; ne lit que les lignes demandées."""
+        if not os.path.exists(self._offsets_file(execution_id)):
+            self.build_index(execution_id)
+
+        total = os.path.getsize(self._offsets_file(execution_id)) // 8
+        start = (page - 1) * page_size
+        items: List[Any] = []
+        if start < total:
+            count = min(page_size, total - start)
+            offsets = array('Q')
+            with open(self._offsets_file(execution_id), 'rb') as f:
+                f.seek(start * 8)
+                offsets.fromfile(f, count)
+            with open(self._items_file(execution_id), 'rb') as f:
+                f.seek(offsets[0])
+                for _ in range(count):
+                    items.append(json.loads(f.readline()))
+        return {
+            "items": items,
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "pages": (total + page_size - 1) // page_size,
+        }
+
+    def delete(self, execution_id: int) -> None:
+        for path in (self.result_file(execution_id), self._items_file(execution_id), self._offsets_file(execution_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class ResultWriter:
+    """
+    Écrit un résultat par morceaux dans un fichier temporaire, renommé à la fermeture.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        fd, self._tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        self._file = os.fdopen(fd, 'wb')
+        self.size = 0
+        self.n8n_execution_id: Optional[str] = None
+        self._head = b""
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self.size += len(chunk)
+        # L'ID d'exécution N8N est en tête de réponse : pas besoin de parser le reste
+        if self.n8n_execution_id is None and len(self._head) < 4096:
+            self._head += chunk[:4096]
+            match = EXECUTION_ID_PATTERN.search(self._head)
+            if match:
+                self.n8n_execution_id = match.group(1).decode()
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self._file.close()
+        if exc_type is None:
+            os.replace(self._tmp_path, self.path)
+        elif os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+execution_results = ExecutionResultStore()
@@ -0,0 +1,376 @@
+# app/services/execution_retention.py
+"""
+Rétention et archivage des exécutions de workflows.
+
+Chaque ligne de `workflow_executions` garde les `inputs`/`outputs` complets, et les
+résultats volumineux ont en plus un fichier dans `execution_results`. Passé le délai
+de rétention de l'utilisateur, un passage périodique archive les exécutions par lots :
+
+    <EXECUTION_ARCHIVE_DIR>/<date>/executions-<premier id>-<dernier id>.jsonl.gz
+        une ligne JSON par exécution (ligne complète)
+    <EXECUTION_ARCHIVE_DIR>/<date>/results/<execution_id>.json.gz
+        résultat sur disque compressé, le cas échéant
+
+puis vide `inputs`/`outputs` de la ligne, qui ne garde que le résumé (statut, dates,
+erreur tronquée) et la référence du fichier d'archive. Le détail reste consultable
+via `execution_archive.load_result`.
+
+Une exécution encore "running" sans ID N8N bien après le délai d'exécution ne sera
+jamais complétée (lancement interrompu, webhook jamais associé) : chaque passage la
+marque "failed" (abandonnée), ce qui la rend archivable comme les autres.
+
+Délai de rétention d'un utilisateur, par ordre de priorité :
+`users.execution_retention_days`, puis l'offre (`users.plan`, EXECUTION_RETENTION_PLANS
+"free=30,pro=180"), puis EXECUTION_RETENTION_DAYS. 0 conserve tout.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.database.database import SessionLocal
+from app.services.execution_results import execution_results
+from app.services.n8n_executor import N8N_EXECUTE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_RETENTION_ENABLED = os.getenv("EXECUTION_RETENTION_ENABLED", "true").lower() == "true"
+EXECUTION_RETENTION_INTERVAL = float(os.getenv("EXECUTION_RETENTION_INTERVAL", "3600"))
+EXECUTION_RETENTION_DAYS = int(os.getenv("EXECUTION_RETENTION_DAYS", "90"))
+EXECUTION_RETENTION_PLANS = os.getenv("EXECUTION_RETENTION_PLANS", "")
+EXECUTION_ARCHIVE_BATCH_SIZE = int(os.getenv("EXECUTION_ARCHIVE_BATCH_SIZE", "500"))
+EXECUTION_ARCHIVE_MAX_BATCHES = int(os.getenv("EXECUTION_ARCHIVE_MAX_BATCHES", "20"))
+# Âge (secondes) au-delà duquel une exécution "running" est considérée abandonnée
+EXECUTION_RETENTION_STALE_RUNNING = float(os.getenv("EXECUTION_RETENTION_STALE_RUNNING", str(2 * N8N_EXECUTE_TIMEOUT)))
+# Longueur du message d'erreur conservé dans la ligne résumé
+EXECUTION_ARCHIVE_ERROR_CHARS = 500
+
+
+def parse_retention_plans(value: Optional[str]) -> Dict[str, int]:
+    """"free=30,pro=180,enterprise=0" -> {"free": 30, "pro": 180, "enterprise": 0}"""
+    plans = {}
+    for entry in (part.strip() for part in (value or "").split(",")):
+        if not entry:
+            continue
+        plan, days = (part.strip() for part in entry.split("=", 1))
+        plans[plan] = int(days)
+    return plans
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+class ExecutionArchive:
+    """
+    Fichiers d'archive des exécutions (JSON lignes compressé, un fichier par lot).
+    """
+    def __init__(self, archive_root_dir: Optional[str] = None):
+        archive_root_dir = archive_root_dir or os.getenv("EXECUTION_ARCHIVE_DIR", "static/execution_archives")
+        self.root_path = os.path.normpath(os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "..", archive_root_dir
+        ))
+
+    def _path(self, relative_path: str) -> str:
+        return os.path.join(self.root_path, relative_path)
+
+    def write_batch(self, records: List[Dict[str, Any]]) -> Tuple[str, int]:
+        """
+        Écrit un lot (fichier temporaire puis renommage) ; les résultats sur disque sont
+        compressés à côté. Retourne (chemin relatif du lot, octets écrits).
+        """
+        day = datetime.utcnow().strftime("%Y-%m-%d")
+        relative_path = os.path.join(day, f"executions-{records[0]['id']}-{records[-1]['id']}.jsonl.gz")
+        os.makedirs(self._path(os.path.join(day, "results")), exist_ok=True)
+
+        written = 0
+        for record in records:
+            if not execution_results.exists(record["id"]):
+                continue
+            result_path = os.path.join(day, "results", f"{record['id']}.json.gz")
+            with open(execution_results.result_file(record["id"]), "rb") as source, \
+                    gzip.open(self._path(result_path) + ".tmp", "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(self._path(result_path) + ".tmp", self._path(result_path))
+            record["result_file"] = result_path
+            written += os.path.getsize(self._path(result_path))
+
+        with gzip.open(self._path(relative_path) + ".tmp", "wt", encoding="utf-8") as target:
+            for record in records:
+                target.write(json.dumps(record, ensure_ascii=False, default=str))
+                target.write("\n")
+        os.replace(self._path(relative_path) + ".tmp", self._path(relative_path))
+        written += os.path.getsize(self._path(relative_path))
+        return relative_path, written
+
+    def load(self, relative_path: str, execution_id: int) -> Optional[Dict[str, Any]]:
+        """Ligne archivée d'une exécution (lecture séquentielle du lot)."""
+        path = self._path(relative_path)
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as source:
+            for line in source:
+                record = json.loads(line)
+                if record.get("id") == execution_id:
+                    return record
+        return None
+
+    def load_result(self, relative_path: str, execution_id: int) -> Any:
+        """
+        Résultat d'une exécution archivée, au format lu par `iter_result_items` : la
+        réponse N8N stockée sur disque s'il y en avait une, sinon {"data": outputs}.
+        Chargé entièrement en mémoire (consultation rare).
+        """
+        record = self.load(relative_path, execution_id)
+        if record is None:
+            return None
+        if record.get("result_file"):
+            with gzip.open(self._path(record["result_file"]), "rt", encoding="utf-8") as source:
+                return json.load(source)
+        return {"data": record.get("outputs") or {}}
+
+
+class ExecutionRetention:
+    """
+    Archive périodiquement, par lots, les exécutions plus anciennes que la rétention
+    de leur utilisateur.
+    """
+    def __init__(self, interval: float = EXECUTION_RETENTION_INTERVAL,
+                 default_days: int = EXECUTION_RETENTION_DAYS,
+                 plans: Optional[Dict[str, int]] = None,
+                 batch_size: int = EXECUTION_ARCHIVE_BATCH_SIZE,
+                 archive: Optional[ExecutionArchive] = None):
+        self.interval = interval
+        self.default_days = default_days
+        self.plans = parse_retention_plans(EXECUTION_RETENTION_PLANS) if plans is None else plans
+        self.batch_size = batch_size
+        self.archive = archive or execution_archive
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+        self._stats = {"runs": 0, "abandoned": 0, "archived": 0, "batches": 0, "result_files": 0, "bytes_written": 0, "errors": 0}
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._last_error: Optional[str] = None
+
+    async def start(self) -> None:
+        if not EXECUTION_RETENTION_ENABLED:
+            logger.info("Execution retention disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"Execution retention started (every {self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._last_error = str(e)
+                logger.warning(f"Execution retention failed: {e}")
+
+    async def run_once(self, dry_run: bool = False,
+                       max_batches: int = EXECUTION_ARCHIVE_MAX_BATCHES) -> Dict[str, Any]:
+        """
+        Archive au plus `max_batches` lots ; avec `dry_run`, compte seulement les
+        exécutions à archiver.
+        """
+        async with self._run_lock:
+            started = time.monotonic()
+            report = {"dry_run": dry_run, "eligible": None, "abandoned": 0, "archived": 0, "batches": 0,
+                      "result_files": 0, "bytes_written": 0, "complete": True}
+            if not dry_run:
+                report["abandoned"] = await asyncio.to_thread(self._mark_abandoned)
+            if dry_run:
+                report["eligible"] = await asyncio.to_thread(self._count_eligible)
+            else:
+                for _ in range(max_batches):
+                    batch = await asyncio.to_thread(self._archive_batch)
+                    if batch is None:
+                        break
+                    report["archived"] += batch["archived"]
+                    report["result_files"] += batch["result_files"]
+                    report["bytes_written"] += batch["bytes_written"]
+                    report["batches"] += 1
+                else:
+                    report["complete"] = False
+
+            report["duration_seconds"] = round(time.monotonic() - started, 3)
+            report["finished_at"] = datetime.utcnow().isoformat()
+            self._stats["runs"] += 1
+            for key in ("abandoned", "archived", "batches", "result_files", "bytes_written"):
+                self._stats[key] += report[key]
+            self._last_report = report
+            if report["archived"]:
+                logger.info(
+                    f"Execution retention: {report['archived']} executions archived in {report['batches']} batches "
+                    f"({report['bytes_written']} bytes)"
+                )
+            return report
+
+    def _mark_abandoned(self) -> int:
+        """
+        Passe en "failed" les exécutions "running" sans ID N8N plus anciennes que
+        EXECUTION_RETENTION_STALE_RUNNING : ni la requête ni le tracker ne les compléteront.
+        """
+        from sqlalchemy import func
+        from app.models.workflow import WorkflowExecution
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            count = db.query(WorkflowExecution).filter(
+                WorkflowExecution.status == "running",
+                WorkflowExecution.n8n_execution_id.is_(None),
+                WorkflowExecution.archived_at.is_(None),
+                WorkflowExecution.started_at < now - timedelta(seconds=EXECUTION_RETENTION_STALE_RUNNING)
+            ).update({
+                WorkflowExecution.status: "failed",
+                WorkflowExecution.error_message: func.coalesce(
+                    WorkflowExecution.error_message, "Abandoned: never completed"
+                ),
+                WorkflowExecution.completed_at: now,
+            }, synchronize_session=False)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        if count:
+            logger.info(f"Execution retention: {count} abandoned running executions marked as failed")
+        return count
+
+    def _eligible_filter(self):
+        """
+        Condition SQLAlchemy (jointure avec `users`) : exécutions terminées (ou
+        "running" depuis plus de EXECUTION_RETENTION_STALE_RUNNING), non archivées,
+        plus anciennes que la rétention de leur utilisateur.
+        """
+        from sqlalchemy import and_, or_, false
+        from app.models.user import User
+        from app.models.workflow import WorkflowExecution
+
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            overrides = [
+                days for (days,) in db.query(User.execution_retention_days).filter(
+                    User.execution_retention_days.isnot(None)
+                ).distinct()
+            ]
+        finally:
+            db.close()
+
+        # Un groupe d'utilisateurs par délai : un seul passage sur la table, une borne par groupe
+        no_override = User.execution_retention_days.is_(None)
+        groups = [(User.execution_retention_days == days, days) for days in overrides]
+        groups += [(and_(no_override, User.plan == plan), days) for plan, days in self.plans.items()]
+        groups.append((and_(no_override, or_(User.plan.is_(None), User.plan.notin_(list(self.plans)))),
+                       self.default_days))
+        conditions = [
+            and_(condition, WorkflowExecution.started_at < now - timedelta(days=days))
+            for condition, days in groups if days > 0
+        ]
+        stale = now - timedelta(seconds=EXECUTION_RETENTION_STALE_RUNNING)
+        return and_(
+            WorkflowExecution.archived_at.is_(None),
+            # Une exécution suivie par N8N peut rester "running" : archivable une fois périmée
+            or_(WorkflowExecution.status != "running", WorkflowExecution.started_at < stale),
+            or_(*conditions) if conditions else false(),
+        )
+
+    def _count_eligible(self) -> int:
+        from app.models.user import User
+        from app.models.workflow import WorkflowExecution
+
+        condition = self._eligible_filter()
+        db = SessionLocal()
+        try:
+            return db.query(WorkflowExecution.id).join(
+                User, User.id == WorkflowExecution.user_id
+            ).filter(condition).count()
+        finally:
+            db.close()
+
+    def _archive_batch(self) -> Optional[Dict[str, int]]:
+        """
+        Un lot : écriture de l'archive, puis lignes réduites à leur résumé (un commit),
+        puis suppression des résultats sur disque. None quand il ne reste rien à archiver.
+        """
+        from app.models.user import User
+        from app.models.workflow import WorkflowExecution
+
+        condition = self._eligible_filter()
+        db = SessionLocal()
+        try:
+            executions = db.query(WorkflowExecution).join(
+                User, User.id == WorkflowExecution.user_id
+            ).filter(condition).order_by(WorkflowExecution.id).limit(self.batch_size).all()
+            if not executions:
+                return None
+
+            records = [{
+                "id": execution.id,
+                "workflow_id": execution.workflow_id,
+                "user_id": execution.user_id,
+                "n8n_execution_id": execution.n8n_execution_id,
+                "status": execution.status,
+                "inputs": execution.inputs,
+                "outputs": execution.outputs,
+                "error_message": execution.error_message,
+                "started_at": _isoformat(execution.started_at),
+                "completed_at": _isoformat(execution.completed_at),
+            } for execution in executions]
+            archive_file, bytes_written = self.archive.write_batch(records)
+
+            archived_at = datetime.utcnow()
+            for execution in executions:
+                execution.inputs = None
+                execution.outputs = None
+                if execution.error_message and len(execution.error_message) > EXECUTION_ARCHIVE_ERROR_CHARS:
+                    execution.error_message = execution.error_message[:EXECUTION_ARCHIVE_ERROR_CHARS]
+                execution.archived_at = archived_at
+                execution.archive_file = archive_file
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        result_files = [record["id"] for record in records if record.get("result_file")]
+        for execution_id in result_files:
+            execution_results.delete(execution_id)
+        return {"archived": len(records), "result_files": len(result_files), "bytes_written": bytes_written}
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": EXECUTION_RETENTION_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "default_days": self.default_days,
+            "plans": self.plans,
+            "batch_size": self.batch_size,
+            "archive_dir": self.archive.root_path,
+            "last_report": self._last_report,
+            "last_error": self._last_error,
+            **self._stats,
+        }
+
+
+execution_archive = ExecutionArchive()
+execution_retention = ExecutionRetention()
@@ -0,0 +1,365 @@
+# app/services/execution_tracker.py
+"""
+Suivi des exécutions N8N en arrière-plan.
+
+Les exécutions déclenchées dans N8N (webhooks, planifications) n'apparaissent pas
+dans `workflow_executions`, et celles lancées depuis l'API restent "running" si la
+réponse synchrone ne suffit pas. Le tracker interroge périodiquement l'API des
+exécutions N8N avec un curseur sur le dernier ID vu, puis met la table à jour par lots.
+Les IDs N8N n'étant uniques que par instance, un tracker suit un seul backend.
+"""
+import asyncio
+import logging
+import os
+from contextlib import suppress
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional, List, Set
+
+from sqlalchemy import func, cast, Integer
+
+from app.database.database import SessionLocal
+from app.services.n8n_backends import n8n_backends
+from app.services.n8n_health import n8n_health
+
+logger = logging.getLogger(__name__)
+
+EXECUTION_TRACKER_ENABLED = os.getenv("EXECUTION_TRACKER_ENABLED", "true").lower() == "true"
+EXECUTION_TRACKER_INTERVAL = float(os.getenv("EXECUTION_TRACKER_INTERVAL", "30"))
+EXECUTION_TRACKER_PAGE_SIZE = int(os.getenv("EXECUTION_TRACKER_PAGE_SIZE", "100"))
+EXECUTION_TRACKER_MAX_PAGES = int(os.getenv("EXECUTION_TRACKER_MAX_PAGES", "10"))
+# Écart maximal (secondes) entre le début d'une exécution lancée depuis l'application
+# et celui de l'exécution N8N qui lui est associée
+EXECUTION_TRACKER_CLAIM_WINDOW = float(os.getenv("EXECUTION_TRACKER_CLAIM_WINDOW", "120"))
+
+FINISHED_FAILED = ("error", "crashed", "canceled", "failed")
+UNFINISHED = ("running", "waiting", "new")
+# Mode N8N -> trigger des lignes créées par l'application pour ce type d'exécution
+CLAIMABLE_TRIGGERS = {"webhook": "webhook", "manual": "api", "integrated": "api"}
+
+
+def map_n8n_status(execution: Dict[str, Any]) -> str:
+    """Statut N8N -> statut de WorkflowExecution ("running", "success", "failed")."""
+    status = execution.get("status")
+    if status == "success":
+        return "success"
+    if status in FINISHED_FAILED:
+        return "failed"
+    if status in UNFINISHED:
+        return "running"
+    # Anciennes versions de N8N : pas de champ status
+    if execution.get("finished"):
+        return "success"
+    return "failed" if execution.get("stoppedAt") else "running"
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # Même convention que les colonnes existantes : UTC sans fuseau
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _error_message(execution: Dict[str, Any]) -> Optional[str]:
+    error = ((execution.get("data") or {}).get("resultData") or {}).get("error") or {}
+    return error.get("message")
+
+
+class ExecutionTracker:
+    """
+    Interroge l'API des exécutions d'un backend N8N et synchronise `workflow_executions`.
+    """
+    def __init__(self, backend_name: Optional[str] = None,
+                 interval: float = EXECUTION_TRACKER_INTERVAL,
+                 page_size: int = EXECUTION_TRACKER_PAGE_SIZE,
+                 max_pages: int = EXECUTION_TRACKER_MAX_PAGES):
+        self.interval = interval
+        self.page_size = page_size
+        self.max_pages = max_pages
+        self.backend = n8n_backends.get(backend_name)
+        self.executor = n8n_backends.executor(self.backend.name)
+        self.cursor: Optional[int] = None  # plus grand ID d'exécution N8N déjà traité
+        self._pending: Set[str] = set()    # exécutions connues mais pas encore terminées
+        self._state_loaded = False
+        self._task: Optional[asyncio.Task] = None
+        self._poll_lock = asyncio.Lock()
+        self._stats = {
+            "polls": 0,
+            "executions_seen": 0,
+            "rows_created": 0,
+            "rows_updated": 0,
+            "unattributed": 0,
+            "errors": 0,
+        }
+        self._last_poll_at: Optional[datetime] = None
+        self._last_error: Optional[str] = None
+
+    async def start(self) -> None:
+        if not EXECUTION_TRACKER_ENABLED:
+            logger.info("N8N execution tracker disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"N8N execution tracker started for {self.backend.name} (every {self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not n8n_backends.is_available(self.backend.name):
+                continue
+            if self.backend is n8n_backends.default and not n8n_health.is_available():
+                continue
+            try:
+                await self.poll_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._last_error = str(e)
+                logger.warning(f"N8N execution tracking failed for {self.backend.name}: {e}")
+
+    async def poll_once(self) -> Dict[str, int]:
+        """Un cycle de suivi : nouvelles exécutions + exécutions en cours, puis écriture en base."""
+        async with self._poll_lock:
+            if not self._state_loaded:
+                self.cursor, pending = await asyncio.to_thread(self._load_state)
+                self._pending.update(pending)
+                self._state_loaded = True
+
+            new_executions = await self._fetch_new()
+            seen = {str(execution["id"]) for execution in new_executions}
+            refreshed = await self._refresh_pending(self._pending - seen)
+            executions = new_executions + refreshed
+
+            # Le message d'erreur n'est présent qu'avec les données d'exécution
+            for execution in executions:
+                if map_n8n_status(execution) == "failed" and "data" not in execution:
+                    with suppress(Exception):
+                        detailed = await self.executor.get_execution(str(execution["id"]), include_data=True)
+                        execution["data"] = detailed.get("data")
+
+            summary = await asyncio.to_thread(self._apply, executions) if executions else {"created": 0, "updated": 0, "unattributed": 0}
+
+            for execution in executions:
+                execution_id = str(execution["id"])
+                if map_n8n_status(execution) == "running":
+                    self._pending.add(execution_id)
+                else:
+                    self._pending.discard(execution_id)
+            if new_executions:
+                self.cursor = max([self.cursor or 0] + [int(execution["id"]) for execution in new_executions])
+
+            self._stats["polls"] += 1
+            self._stats["executions_seen"] += len(executions)
+            self._stats["rows_created"] += summary["created"]
+            self._stats["rows_updated"] += summary["updated"]
+            self._stats["unattributed"] += summary["unattributed"]
+            self._last_poll_at = datetime.utcnow()
+            if summary["created"] or summary["updated"]:
+                logger.info(
+                    f"N8N executions tracked on {self.backend.name}: "
+                    f"{summary['created']} added, {summary['updated']} updated"
+                )
+            return summary
+
+    async def _fetch_new(self) -> List[Dict[str, Any]]:
+        """Pages d'exécutions plus récentes que le curseur (une seule page au premier passage)."""
+        collected = []
+        next_cursor = None
+        for page in range(self.max_pages):
+            result = await self.executor.list_executions(cursor=next_cursor, limit=self.page_size)
+            for execution in result.get("data", []):
+                if self.cursor is not None and int(execution["id"]) <= self.cursor:
+                    return collected
+                collected.append(execution)
+            next_cursor = result.get("nextCursor")
+            if not next_cursor or self.cursor is None:
+                return collected
+        logger.warning(f"N8N execution tracker stopped after {self.max_pages} pages, older executions are skipped")
+        return collected
+
+    async def _refresh_pending(self, execution_ids: Set[str]) -> List[Dict[str, Any]]:
+        ids = sorted(execution_ids, key=int)[:self.page_size]
+        results = await asyncio.gather(
+            *(self.executor.get_execution(execution_id) for execution_id in ids),
+            return_exceptions=True
+        )
+        refreshed = []
+        for execution_id, result in zip(ids, results):
+            if isinstance(result, Exception):
+                if getattr(result, "status", None) == 404:
+                    # Exécution purgée côté N8N : on ne la suit plus
+                    self._pending.discard(execution_id)
+                continue
+            if result:
+                refreshed.append(result)
+        return refreshed
+
+    def _load_state(self):
+        from app.models.workflow import Workflow, WorkflowExecution
+
+        db = SessionLocal()
+        try:
+            on_backend = n8n_backends.workflow_filter(self.backend.name)
+            numeric_id = cast(WorkflowExecution.n8n_execution_id, Integer)
+            cursor = db.query(func.max(numeric_id)).join(Workflow).filter(on_backend).scalar()
+            pending = [
+                row.n8n_execution_id for row in db.query(WorkflowExecution.n8n_execution_id).join(Workflow).filter(
+                    on_backend,
+                    WorkflowExecution.status == "running",
+                    WorkflowExecution.n8n_execution_id.isnot(None)
+                )
+            ]
+            return cursor, [execution_id for execution_id in pending if str(execution_id).isdigit()]
+        finally:
+            db.close()
+
+    def _apply(self, executions: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Crée ou met à jour les lignes workflow_executions en une seule transaction."""
+        from app.models.workflow import Workflow, WorkflowExecution
+        from app.models.team_instance import TeamInstance
+
+        summary = {"created": 0, "updated": 0, "unattributed": 0}
+        by_id = {str(execution["id"]): execution for execution in executions}
+
+        db = SessionLocal()
+        try:
+            on_backend = n8n_backends.workflow_filter(self.backend.name)
+            existing = {
+                row.n8n_execution_id: row for row in db.query(WorkflowExecution).join(Workflow).filter(
+                    on_backend,
+                    WorkflowExecution.n8n_execution_id.in_(list(by_id))
+                )
+            }
+
+            # Attribution des nouvelles exécutions : n8n_workflow_id -> workflow -> propriétaire
+            missing = [execution for execution_id, execution in by_id.items() if execution_id not in existing]
+            n8n_workflow_ids = {str(execution.get("workflowId")) for execution in missing if execution.get("workflowId")}
+            workflows = {}
+            owners: Dict[int, Set[int]] = {}
+            if n8n_workflow_ids:
+                workflows = dict(db.query(Workflow.n8n_workflow_id, Workflow.id).filter(
+                    on_backend,
+                    Workflow.n8n_workflow_id.in_(n8n_workflow_ids)
+                ).all())
+                for workflow_id, user_id in db.query(TeamInstance.workflow_id, TeamInstance.user_id).filter(
+                    TeamInstance.workflow_id.in_(list(workflows.values()))
+                ):
+                    owners.setdefault(workflow_id, set()).add(user_id)
+
+            # Exécutions lancées depuis l'application et encore sans ID N8N : webhook (qui n'en
+            # renvoie pas) ou appel API pas encore terminé. On associe la ligne existante au lieu
+            # d'en créer une seconde.
+            claimable = self._claimable_rows(db, missing, workflows)
+
+            for execution in sorted(missing, key=lambda e: int(e["id"])):
+                workflow_id = workflows.get(str(execution.get("workflowId")))
+                row = self._claim(claimable, workflow_id, execution)
+                if row is not None:
+                    status = map_n8n_status(execution)
+                    row.n8n_execution_id = str(execution["id"])
+                    row.status = status
+                    row.completed_at = _parse_timestamp(execution.get("stoppedAt")) if status != "running" else None
+                    row.error_message = _error_message(execution)
+                    summary["updated"] += 1
+                    continue
+                users = owners.get(workflow_id, set())
+                if workflow_id is None or len(users) != 1:
+                    # Workflow inconnu ou partagé : pas d'utilisateur unique à qui l'attribuer
+                    summary["unattributed"] += 1
+                    continue
+                status = map_n8n_status(execution)
+                db.add(WorkflowExecution(
+                    workflow_id=workflow_id,
+                    user_id=next(iter(users)),
+                    n8n_execution_id=str(execution["id"]),
+                    status=status,
+                    trigger=execution.get("mode"),
+                    started_at=_parse_timestamp(execution.get("startedAt")),
+                    completed_at=_parse_timestamp(execution.get("stoppedAt")) if status != "running" else None,
+                    error_message=_error_message(execution)
+                ))
+                summary["created"] += 1
+
+            for execution_id, row in existing.items():
+                execution = by_id[execution_id]
+                status = map_n8n_status(execution)
+                completed_at = _parse_timestamp(execution.get("stoppedAt")) if status != "running" else None
+                error_message = _error_message(execution) or row.error_message
+                if (row.status, row.completed_at, row.error_message) == (status, completed_at, error_message):
+                    continue
+                row.status = status
+                row.completed_at = completed_at or row.completed_at
+                row.error_message = error_message
+                summary["updated"] += 1
+
+            db.commit()
+            return summary
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _claimable_rows(db, missing: List[Dict[str, Any]], workflows: Dict[str, int]) -> Dict[tuple, List[Any]]:
+        """Lignes en cours sans ID N8N, par (workflow, trigger), sur la plage de dates des exécutions."""
+        from app.models.workflow import WorkflowExecution
+
+        triggers = {CLAIMABLE_TRIGGERS[e.get("mode")] for e in missing if e.get("mode") in CLAIMABLE_TRIGGERS}
+        started = [_parse_timestamp(e.get("startedAt")) for e in missing if e.get("mode") in CLAIMABLE_TRIGGERS]
+        started = [value for value in started if value is not None]
+        if not workflows or not triggers or not started:
+            return {}
+        window = timedelta(seconds=EXECUTION_TRACKER_CLAIM_WINDOW)
+        claimable: Dict[tuple, List[Any]] = {}
+        for row in db.query(WorkflowExecution).filter(
+            WorkflowExecution.workflow_id.in_(list(workflows.values())),
+            WorkflowExecution.n8n_execution_id.is_(None),
+            WorkflowExecution.status == "running",
+            WorkflowExecution.trigger.in_(triggers),
+            WorkflowExecution.started_at >= min(started) - window,
+            WorkflowExecution.started_at <= max(started) + window
+        ).order_by(WorkflowExecution.id):
+            claimable.setdefault((row.workflow_id, row.trigger), []).append(row)
+        return claimable
+
+    @staticmethod
+    def _claim(claimable: Dict[tuple, List[Any]], workflow_id: Optional[int], execution: Dict[str, Any]):
+        """Plus ancienne ligne du même workflow et du même trigger, démarrée près de l'exécution N8N."""
+        trigger = CLAIMABLE_TRIGGERS.get(execution.get("mode"))
+        started_at = _parse_timestamp(execution.get("startedAt"))
+        rows = claimable.get((workflow_id, trigger))
+        if not rows or started_at is None:
+            return None
+        for index, row in enumerate(rows):
+            if row.started_at is not None and abs((row.started_at - started_at).total_seconds()) <= EXECUTION_TRACKER_CLAIM_WINDOW:
+                return rows.pop(index)
+        return None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "enabled": EXECUTION_TRACKER_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "cursor": self.cursor,
+            "pending": len(self._pending),
+            "last_poll_at": self._last_poll_at.isoformat() if self._last_poll_at else None,
+            "last_error": self._last_error,
+            **self._stats,
+        }
+
+
+# Un tracker par backend N8N
+execution_trackers: Dict[str, ExecutionTracker] = {name: ExecutionTracker(name) for name in n8n_backends.backends}
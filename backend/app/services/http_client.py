@@ -0,0 +1,128 @@
+# app/services/http_client.py
+"""
+Session aiohttp partagée (pool de connexions keep-alive) pour tout le trafic
+HTTP sortant : API N8N et tests d'intégrations.
+
+La session est créée dans le `lifespan` de l'application et fermée à l'arrêt.
+"""
+import logging
+import os
+import time
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPClientPool:
+    """
+    Détient une `aiohttp.ClientSession` longue durée et ses statistiques.
+    """
+    def __init__(self):
+        self.limit = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+        self.limit_per_host = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "30"))
+        self.keepalive_timeout = float(os.getenv("HTTP_POOL_KEEPALIVE_TIMEOUT", "30"))
+        self.dns_cache_ttl = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+        self.total_timeout = float(os.getenv("HTTP_TIMEOUT_TOTAL", "60"))
+        self.connect_timeout = float(os.getenv("HTTP_TIMEOUT_CONNECT", "5"))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._connector: Optional[aiohttp.TCPConnector] = None
+        self._started_at: Optional[float] = None
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "sessions_created": 0,
+        }
+
+    async def start(self) -> None:
+        """Crée la session partagée (idempotent)."""
+        if self._session is None or self._session.closed:
+            self._create_session()
+            logger.info(
+                f"HTTP pool started (limit={self.limit}, per_host={self.limit_per_host}, "
+                f"dns_ttl={self.dns_cache_ttl}s, timeout={self.total_timeout}s)"
+            )
+
+    async def close(self) -> None:
+        """Ferme la session partagée et ses connexions."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP pool closed")
+        self._session = None
+        self._connector = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Session partagée. Hors `lifespan` (scripts, benchmarks), elle est créée à la
+        première utilisation ; `await start()` reste la voie normale.
+        """
+        if self._session is None or self._session.closed:
+            self._create_session()
+        return self._session
+
+    def _create_session(self) -> None:
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=aiohttp.ClientTimeout(total=self.total_timeout, connect=self.connect_timeout),
+            trace_configs=[self._trace_config()],
+        )
+        self._started_at = time.monotonic()
+        self._stats["sessions_created"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Statistiques du pool : configuration, connexions ouvertes et compteurs."""
+        connector = self._connector
+        open_connections = 0
+        idle_connections = 0
+        if connector is not None and not connector.closed:
+            # Attributs internes d'aiohttp : pas d'API publique pour ces compteurs
+            open_connections = len(getattr(connector, "_acquired", ()))
+            idle_connections = sum(len(conns) for conns in getattr(connector, "_conns", {}).values())
+        return {
+            "active": self._session is not None and not self._session.closed,
+            "uptime_seconds": round(time.monotonic() - self._started_at, 1) if self._started_at else None,
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "dns_cache_ttl": self.dns_cache_ttl,
+            "timeout_total": self.total_timeout,
+            "timeout_connect": self.connect_timeout,
+            "connections_in_use": open_connections,
+            "connections_idle": idle_connections,
+            **self._stats,
+        }
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_end(session, context, params):
+            self._stats["requests"] += 1
+
+        async def on_request_exception(session, context, params):
+            self._stats["requests"] += 1
+            self._stats["errors"] += 1
+
+        async def on_connection_create_end(session, context, params):
+            self._stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self._stats["connections_reused"] += 1
+
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+
+http_pool = HTTPClientPool()
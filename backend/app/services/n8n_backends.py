@@ -0,0 +1,279 @@
+# app/services/n8n_backends.py
+"""
+Registre des instances N8N (backends) entre lesquelles les workflows clonés sont répartis.
+
+Les backends sont déclarés dans N8N_BACKENDS ("nom=url,nom=url") ; sans cette
+variable, un seul backend "default" pointe sur N8N_API_URL. Chaque backend a sa file
+de dispatch des exécutions (N8N_DISPATCH_*, surchargeables par backend avec le suffixe
+_<NOM>). Chaque clone est placé
+à sa création, par hachage cohérent de l'utilisateur ou sur le backend le moins
+chargé (N8N_PLACEMENT), et le nom du backend est enregistré dans
+`workflows.n8n_backend`. Les appels suivants (exécution, activation, suppression)
+sont envoyés à ce backend. Les lignes sans backend appartiennent au backend par défaut.
+"""
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Any, Optional, List, Tuple
+
+from app.services.n8n_executor import (
+    N8NExecutorService, DEFAULT_N8N_API_URL, BULK_CLONE_CONCURRENCY, N8N_DISPATCH_RATE, N8N_DISPATCH_CONCURRENCY,
+    get_breaker, get_dispatcher
+)
+from app.services.resilience import DispatchQueue
+
+logger = logging.getLogger(__name__)
+
+N8N_PLACEMENT = os.getenv("N8N_PLACEMENT", "hash")  # "hash" ou "least_load"
+N8N_HASH_REPLICAS = int(os.getenv("N8N_HASH_REPLICAS", "100"))
+
+
+class N8NBackend:
+    """
+    Une instance N8N : nom stable (stocké en base), URL d'API et clé d'API.
+    """
+    def __init__(self, name: str, api_url: str, api_key: Optional[str] = None,
+                 dispatch_rate: float = N8N_DISPATCH_RATE, dispatch_concurrency: int = N8N_DISPATCH_CONCURRENCY):
+        self.name = name
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.dispatch_rate = dispatch_rate
+        self.dispatch_concurrency = dispatch_concurrency
+
+    @property
+    def dispatcher(self) -> DispatchQueue:
+        return get_dispatcher(self.api_url, self.dispatch_rate, self.dispatch_concurrency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "api_url": self.api_url,
+            "breaker": get_breaker(self.api_url).snapshot(),
+            "dispatch": self.dispatcher.snapshot(),
+        }
+
+
+def _backend_env(prefix: str, name: str) -> Optional[str]:
+    """Variable `<prefix>_<NOM>` propre à un backend (NOM en majuscules, séparateurs -> "_")."""
+    return os.getenv(prefix + "_" + re.sub(r"[^A-Za-z0-9]+", "_", name).upper())
+
+
+def parse_backends(value: Optional[str]) -> List[N8NBackend]:
+    """
+    "n8n-a=http://a:5678/api/v1,n8n-b=http://b:5678/api/v1" -> backends.
+    La clé d'API d'un backend est lue dans N8N_API_KEY_<NOM>, sinon N8N_API_KEY ;
+    débit et concurrence des exécutions dans N8N_DISPATCH_RATE_<NOM> et
+    N8N_DISPATCH_CONCURRENCY_<NOM>, sinon les valeurs globales.
+    """
+    backends = []
+    for index, entry in enumerate(part.strip() for part in (value or "").split(",")):
+        if not entry:
+            continue
+        # Une URL seule (sans "nom=") reçoit un nom d'après sa position
+        if "=" in entry.split("://")[0]:
+            name, api_url = (part.strip() for part in entry.split("=", 1))
+        else:
+            name, api_url = f"n8n-{index + 1}", entry
+        backends.append(N8NBackend(
+            name, api_url, _backend_env("N8N_API_KEY", name) or os.getenv("N8N_API_KEY"),
+            dispatch_rate=float(_backend_env("N8N_DISPATCH_RATE", name) or N8N_DISPATCH_RATE),
+            dispatch_concurrency=int(_backend_env("N8N_DISPATCH_CONCURRENCY", name) or N8N_DISPATCH_CONCURRENCY),
+        ))
+    return backends
+
+
+class N8NBackendRegistry:
+    """
+    Backends N8N connus, placement des nouveaux clones et executors par backend.
+    """
+    def __init__(self, backends: List[N8NBackend], placement: str = N8N_PLACEMENT,
+                 replicas: int = N8N_HASH_REPLICAS):
+        if not backends:
+            raise ValueError("At least one N8N backend is required")
+        if placement not in ("hash", "least_load"):
+            raise ValueError(f"Unknown N8N placement strategy: {placement}")
+        self.backends: Dict[str, N8NBackend] = {backend.name: backend for backend in backends}
+        self.default = backends[0]
+        self.placement = placement
+        self._executors: Dict[str, N8NExecutorService] = {}
+        # Files de dispatch créées dès maintenant, avec les réglages de chaque backend : deux
+        # backends sur une même URL avec des réglages différents échouent au démarrage
+        for backend in backends:
+            backend.dispatcher
+
+        # Anneau de hachage cohérent : `replicas` points virtuels par backend
+        ring = sorted(
+            (self._hash(f"{backend.name}#{replica}"), backend.name)
+            for backend in backends for replica in range(replicas)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_names = [name for _, name in ring]
+
+        # Nombre de clones par backend, chargé une fois depuis la base puis tenu à jour
+        self._loads: Optional[Dict[str, int]] = None
+        self._loads_lock = threading.Lock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def get(self, name: Optional[str]) -> N8NBackend:
+        """Backend d'un workflow ; None (lignes antérieures au sharding) -> backend par défaut."""
+        if name is None:
+            return self.default
+        backend = self.backends.get(name)
+        if backend is None:
+            raise KeyError(f"Unknown N8N backend '{name}'")
+        return backend
+
+    def executor(self, name: Optional[str] = None) -> N8NExecutorService:
+        """Executor (mis en cache) qui parle au backend `name`."""
+        backend = self.get(name)
+        executor = self._executors.get(backend.name)
+        if executor is None:
+            executor = self._executors[backend.name] = N8NExecutorService(
+                n8n_api_url=backend.api_url, n8n_api_key=backend.api_key, dispatcher=backend.dispatcher
+            )
+        return executor
+
+    def executor_for(self, workflow) -> N8NExecutorService:
+        """Executor du backend sur lequel vit une ligne Workflow."""
+        return self.executor(getattr(workflow, "n8n_backend", None))
+
+    def is_available(self, name: str) -> bool:
+        """Faux quand le disjoncteur du backend est ouvert."""
+        return get_breaker(self.backends[name].api_url).snapshot()["state"] != "open"
+
+    def place(self, key: str) -> N8NBackend:
+        """
+        Choisit le backend d'un nouveau clone. `key` (l'utilisateur) rend le placement
+        par hachage stable. Les backends dont le disjoncteur est ouvert sont évités
+        tant qu'un autre backend est disponible.
+        """
+        if len(self.backends) == 1:
+            backend = self.default
+        elif self.placement == "least_load":
+            backend = self._place_least_load()
+        else:
+            backend = self._place_hash(key)
+        with self._loads_lock:
+            if self._loads is not None:
+                self._loads[backend.name] = self._loads.get(backend.name, 0) + 1
+        return backend
+
+    def _place_hash(self, key: str) -> N8NBackend:
+        start = bisect.bisect(self._ring_hashes, self._hash(str(key))) % len(self._ring_hashes)
+        first = self._ring_names[start]
+        tried = set()
+        # Parcours de l'anneau dans le sens horaire jusqu'à un backend disponible
+        for offset in range(len(self._ring_names)):
+            name = self._ring_names[(start + offset) % len(self._ring_names)]
+            if name in tried:
+                continue
+            if self.is_available(name):
+                return self.backends[name]
+            tried.add(name)
+            if len(tried) == len(self.backends):
+                break
+        return self.backends[first]
+
+    def _place_least_load(self) -> N8NBackend:
+        loads = self.loads()
+        candidates = [name for name in self.backends if self.is_available(name)] or list(self.backends)
+        return self.backends[min(candidates, key=lambda name: loads.get(name, 0))]
+
+    def loads(self) -> Dict[str, int]:
+        """Nombre de workflows clonés par backend (une requête groupée au premier appel)."""
+        with self._loads_lock:
+            if self._loads is None:
+                self._loads = self._count_clones()
+            return dict(self._loads)
+
+    def release(self, name: Optional[str]) -> None:
+        """Un clone a été supprimé (ou n'a pas pu être créé) sur ce backend."""
+        backend = self.get(name)
+        with self._loads_lock:
+            if self._loads is not None and self._loads.get(backend.name, 0) > 0:
+                self._loads[backend.name] -= 1
+
+    def _count_clones(self) -> Dict[str, int]:
+        from sqlalchemy import func
+        from app.database.database import SessionLocal
+        from app.models.workflow import Workflow
+
+        counts = {name: 0 for name in self.backends}
+        db = SessionLocal()
+        try:
+            rows = db.query(Workflow.n8n_backend, func.count(Workflow.id)).filter(
+                Workflow.category == "Cloned"
+            ).group_by(Workflow.n8n_backend)
+            for name, count in rows:
+                counts[name or self.default.name] = counts.get(name or self.default.name, 0) + count
+        finally:
+            db.close()
+        return counts
+
+    def workflow_filter(self, name: str):
+        """Condition SQLAlchemy : workflows hébergés sur le backend `name`."""
+        from sqlalchemy import or_
+        from app.models.workflow import Workflow
+
+        if name == self.default.name:
+            return or_(Workflow.n8n_backend == name, Workflow.n8n_backend.is_(None))
+        return Workflow.n8n_backend == name
+
+    async def clone_workflows_bulk(self, template_path: str, clone_requests: List[Dict[str, Any]],
+                                   concurrency: int = BULK_CLONE_CONCURRENCY) -> List[Dict[str, Any]]:
+        """
+        Clonage en masse réparti : chaque demande est placée sur un backend, puis chaque
+        backend traite son lot en parallèle des autres (concurrence bornée par backend).
+        Résultats dans l'ordre des demandes, avec la clé "backend".
+        """
+        groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = defaultdict(list)
+        for index, request in enumerate(clone_requests):
+            groups[self.place(str(request["user_id"])).name].append((index, request))
+
+        async def clone_group(name: str, entries: List[Tuple[int, Dict[str, Any]]]):
+            results = await self.executor(name).clone_workflows_bulk(
+                template_path, [request for _, request in entries], concurrency
+            )
+            return [(index, {**result, "backend": name}) for (index, _), result in zip(entries, results)]
+
+        ordered: List[Optional[Dict[str, Any]]] = [None] * len(clone_requests)
+        for group in await asyncio.gather(*(clone_group(name, entries) for name, entries in groups.items())):
+            for index, result in group:
+                if not result["success"]:
+                    self.release(result["backend"])
+                ordered[index] = result
+        return ordered
+
+    def dispatch_status(self) -> Dict[str, Dict[str, Any]]:
+        """Files de dispatch des exécutions par backend (profondeur, attentes, refus)."""
+        return {name: backend.dispatcher.snapshot() for name, backend in self.backends.items()}
+
+    def status_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Caches de statut des workflows par backend (succès, regroupements, chargements)."""
+        return {name: self.executor(name).status_cache.stats() for name in self.backends}
+
+    def status(self) -> Dict[str, Any]:
+        with self._loads_lock:
+            loads = dict(self._loads) if self._loads is not None else None
+        return {
+            "placement": self.placement,
+            "default": self.default.name,
+            "backends": [
+                {**backend.to_dict(), "clones": loads.get(name) if loads is not None else None}
+                for name, backend in self.backends.items()
+            ],
+        }
+
+
+n8n_backends = N8NBackendRegistry(
+    parse_backends(os.getenv("N8N_BACKENDS"))
+    or [N8NBackend("default", DEFAULT_N8N_API_URL, os.getenv("N8N_API_KEY"))]
+)
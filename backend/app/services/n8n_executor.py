@@ -3,27 +3,180 @@ import json
 import logging
 import asyncio
 import aiohttp
+import time
 import uuid
-from typing import Dict, Any, Optional, List, Tuple
+import hashlib
+from contextlib import asynccontextmanager
+from urllib.parse import quote
+from typing import Dict, Any, Optional, List, Tuple, Iterator, AsyncIterator
 from sqlalchemy.orm import Session
 
+from app.services.http_client import http_pool
+from app.services.cache import CoalescingCache, MISSING
+from app.services.resilience import (
+    CircuitBreaker, CircuitOpenError, RetryPolicy, DispatchQueue, DispatchRejectedError
+)
+from app.services.workflow_templates import CompiledTemplate, load_template, credential_values
+
 logger = logging.getLogger(__name__)
 
+DEFAULT_N8N_API_URL = os.getenv("N8N_API_URL", "http://localhost:5678/api/v1")
+
+# Délais par appel (toutes tentatives comprises) ; l'exécution d'un workflow est plus longue
+N8N_REQUEST_TIMEOUT = float(os.getenv("N8N_REQUEST_TIMEOUT", "15"))
+N8N_EXECUTE_TIMEOUT = float(os.getenv("N8N_EXECUTE_TIMEOUT", "120"))
+N8N_RETRY_POLICY = RetryPolicy(
+    max_attempts=int(os.getenv("N8N_RETRY_ATTEMPTS", "3")),
+    base_delay=float(os.getenv("N8N_RETRY_BASE_DELAY", "0.2")),
+    max_delay=float(os.getenv("N8N_RETRY_MAX_DELAY", "2.0")),
+)
+N8N_BREAKER_FAILURE_THRESHOLD = int(os.getenv("N8N_BREAKER_FAILURE_THRESHOLD", "5"))
+N8N_BREAKER_RECOVERY_TIMEOUT = float(os.getenv("N8N_BREAKER_RECOVERY_TIMEOUT", "30"))
+
+# File de dispatch des exécutions, par instance N8N : débit (seau à jetons), exécutions
+# simultanées et attente bornée. 0 : pas de limite
+N8N_DISPATCH_RATE = float(os.getenv("N8N_DISPATCH_RATE", "20"))
+N8N_DISPATCH_BURST = int(os.getenv("N8N_DISPATCH_BURST", "40"))
+N8N_DISPATCH_CONCURRENCY = int(os.getenv("N8N_DISPATCH_CONCURRENCY", "16"))
+N8N_DISPATCH_MAX_WAIT = float(os.getenv("N8N_DISPATCH_MAX_WAIT", "30"))
+N8N_DISPATCH_MAX_QUEUE = int(os.getenv("N8N_DISPATCH_MAX_QUEUE", "1000"))
+
+# Statut des workflows (interrogé en boucle par l'interface) : cache court et regroupement des appels
+N8N_STATUS_CACHE_TTL = float(os.getenv("N8N_STATUS_CACHE_TTL", "5"))
+N8N_STATUS_CACHE_SIZE = int(os.getenv("N8N_STATUS_CACHE_SIZE", "10000"))
+N8N_STATUS_PAGE_SIZE = int(os.getenv("N8N_STATUS_PAGE_SIZE", "250"))
+# En dessous de ce nombre de statuts absents du cache, un GET par workflow plutôt que la liste complète
+N8N_STATUS_LIST_THRESHOLD = int(os.getenv("N8N_STATUS_LIST_THRESHOLD", "25"))
+# Listes de workflows sans pinData (paramètre excludePinnedData, versions récentes de N8N)
+N8N_LIST_EXCLUDE_PINNED_DATA = os.getenv("N8N_LIST_EXCLUDE_PINNED_DATA", "false").lower() == "true"
+
+# Créations/activations N8N simultanées lors d'un clonage en masse
+BULK_CLONE_CONCURRENCY = int(os.getenv("BULK_CLONE_CONCURRENCY", "8"))
+
+# Réponse d'un webhook N8N en mode "onReceived" : l'exécution continue en arrière-plan
+WEBHOOK_STARTED_MESSAGE = "Workflow was started"
+
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE")
+RETRYABLE_STATUSES = (429, 502, 503, 504)
+
+# Dossier de workflow -> ID N8N (source de vérité : workflows.n8n_workflow_id)
+_workflow_id_cache: Dict[str, str] = {}
+_install_locks: Dict[str, asyncio.Lock] = {}
+
+# Un disjoncteur par instance N8N, partagé par tous les N8NExecutorService
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(n8n_api_url: str) -> CircuitBreaker:
+    breaker = _breakers.get(n8n_api_url)
+    if breaker is None:
+        breaker = _breakers[n8n_api_url] = CircuitBreaker(
+            n8n_api_url,
+            failure_threshold=N8N_BREAKER_FAILURE_THRESHOLD,
+            recovery_timeout=N8N_BREAKER_RECOVERY_TIMEOUT,
+        )
+    return breaker
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """État des disjoncteurs N8N, par URL d'API."""
+    return {url: breaker.snapshot() for url, breaker in _breakers.items()}
+
+
+# Une file de dispatch des exécutions par instance N8N, comme les disjoncteurs
+_dispatchers: Dict[str, DispatchQueue] = {}
+
+
+def get_dispatcher(n8n_api_url: str, rate: Optional[float] = None,
+                   concurrency: Optional[int] = None) -> DispatchQueue:
+    """
+    File de l'instance, créée au premier appel (`rate` / `concurrency` ou valeurs par
+    défaut). Sans réglage explicite, la file existante est renvoyée telle quelle ; un
+    réglage différent de celui de la file existante lève ValueError (deux files pour
+    une même instance ne respecteraient plus ses limites).
+    """
+    dispatcher = _dispatchers.get(n8n_api_url)
+    if dispatcher is None:
+        return _dispatchers.setdefault(n8n_api_url, DispatchQueue(
+            n8n_api_url,
+            rate=N8N_DISPATCH_RATE if rate is None else rate,
+            burst=N8N_DISPATCH_BURST,
+            concurrency=N8N_DISPATCH_CONCURRENCY if concurrency is None else concurrency,
+            max_wait=N8N_DISPATCH_MAX_WAIT,
+            max_queue=N8N_DISPATCH_MAX_QUEUE,
+        ))
+    if (rate is not None and rate != dispatcher.rate) or (concurrency is not None and concurrency != dispatcher.concurrency):
+        raise ValueError(
+            f"Dispatch queue for {n8n_api_url} already exists with rate={dispatcher.rate}, "
+            f"concurrency={dispatcher.concurrency} (requested rate={rate}, concurrency={concurrency})"
+        )
+    return dispatcher
+
+
+def workflow_definition_hash(definition: Dict[str, Any]) -> str:
+    """Hash SHA-256 d'une définition de workflow, indépendant de l'ordre des clés."""
+    canonical = json.dumps(definition, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def find_webhook_path(workflow: Dict[str, Any]) -> Optional[str]:
+    """
+    Chemin du premier nœud Webhook POST actif d'un workflow (rendu), ou None.
+    Les webhooks GET ne sont pas utilisés pour déclencher une exécution.
+    """
+    for node in workflow.get("nodes", []):
+        if node.get("type") != "n8n-nodes-base.webhook" or node.get("disabled"):
+            continue
+        parameters = node.get("parameters") or {}
+        path = str(parameters.get("path") or node.get("webhookId") or "").strip("/")
+        # N8N utilise GET par défaut quand httpMethod est absent
+        if path and parameters.get("httpMethod", "GET") == "POST":
+            return path
+    return None
+
+
+class N8NAPIError(Exception):
+    """
+    Erreur renvoyée par l'API N8N (statut HTTP inattendu).
+    """
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class N8NUnavailableError(N8NAPIError):
+    """
+    N8N est injoignable : disjoncteur ouvert, délai dépassé ou erreurs réseau répétées.
+    """
+    def __init__(self, message: str, status: int = 503, retry_after: Optional[float] = None):
+        super().__init__(message, status)
+        self.retry_after = retry_after
+
+
 class N8NExecutorService:
     """
     Service pour exécuter des workflows N8N via l'API N8N locale.
+    Toutes les requêtes passent par la session aiohttp partagée (`http_pool`).
     """
     def __init__(self, 
                  workflows_root_dir: str = "static/workflows",
-                 n8n_api_url: str = "http://localhost:5678/api/v1"):
+                 n8n_api_url: str = DEFAULT_N8N_API_URL,
+                 n8n_api_key: Optional[str] = None,
+                 dispatcher: Optional[DispatchQueue] = None):
         self.workflows_base_path = os.path.join(
             os.path.dirname(os.path.abspath(__file__)), "..", workflows_root_dir
         )
         self.workflows_base_path = os.path.normpath(self.workflows_base_path)
         self.n8n_api_url = n8n_api_url
+        # Les webhooks sont servis à la racine de N8N, pas sous /api/v1
+        self.webhook_base_url = f"{n8n_api_url.rstrip('/').removesuffix('/api/v1')}/webhook"
+        # Les exécutions (API, webhook, streaming) passent par la file de l'instance
+        self.dispatcher = dispatcher or get_dispatcher(n8n_api_url)
+        # ID N8N -> statut réduit (None : workflow absent de N8N)
+        self.status_cache = CoalescingCache(f"n8n-status:{n8n_api_url}", N8N_STATUS_CACHE_TTL, N8N_STATUS_CACHE_SIZE)
         
         # Configuration de l'authentification N8N
-        self.n8n_api_key = os.getenv("N8N_API_KEY")
+        self.n8n_api_key = n8n_api_key or os.getenv("N8N_API_KEY")
         self.n8n_auth_user = os.getenv("N8N_BASIC_AUTH_USER")
         self.n8n_auth_password = os.getenv("N8N_BASIC_AUTH_PASSWORD")
         
@@ -32,31 +185,133 @@ class N8NExecutorService:
         logger.info(f"N8N API Key configured: {'Yes' if self.n8n_api_key else 'No'}")
         logger.info(f"N8N Basic Auth configured: {'Yes' if self.n8n_auth_user else 'No'}")
 
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.n8n_api_key:
+            headers["X-N8N-API-KEY"] = self.n8n_api_key
+        return headers
+
+    def _auth(self) -> Optional[aiohttp.BasicAuth]:
+        if self.n8n_auth_user and self.n8n_auth_password:
+            return aiohttp.BasicAuth(self.n8n_auth_user, self.n8n_auth_password)
+        return None
+
+    async def _request(self, method: str, path: str,
+                       expected_status: Tuple[int, ...] = (200,),
+                       json_body: Optional[Dict[str, Any]] = None,
+                       idempotent: Optional[bool] = None,
+                       timeout: Optional[float] = None,
+                       url: Optional[str] = None) -> Any:
+        """
+        Envoie une requête à l'API N8N sur la session partagée.
+        Renvoie le JSON de la réponse (None si la réponse est vide, le texte brut
+        si ce n'est pas du JSON). `url` remplace `n8n_api_url + path` (webhooks).
+
+        `timeout` est un délai global pour l'appel, tentatives comprises. Les appels
+        idempotents (GET/PUT/DELETE par défaut) sont retentés avec backoff exponentiel
+        et jitter sur erreur réseau, timeout ou 429/502/503/504 ; les autres ne sont
+        retentés que si la connexion n'a pas pu être établie. Le disjoncteur de
+        l'instance N8N fait échouer l'appel immédiatement quand il est ouvert.
+
+        Raises:
+            N8NUnavailableError: disjoncteur ouvert, délai dépassé ou N8N injoignable.
+            N8NAPIError: si le statut n'est pas dans `expected_status`.
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        breaker = get_breaker(self.n8n_api_url)
+        deadline = time.monotonic() + (timeout or N8N_REQUEST_TIMEOUT)
+        attempt = 0
+
+        while True:
+            attempt += 1
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                raise N8NUnavailableError(f"N8N unavailable ({method} {path}): {e}", retry_after=e.retry_after)
+
+            remaining = deadline - time.monotonic()
+            retryable = False
+            recorded = False
+            try:
+                async with http_pool.session.request(
+                    method,
+                    url or f"{self.n8n_api_url}{path}",
+                    json=json_body,
+                    headers=self._headers(),
+                    auth=self._auth(),
+                    timeout=aiohttp.ClientTimeout(total=remaining, connect=min(remaining, http_pool.connect_timeout))
+                ) as response:
+                    recorded = True
+                    if response.status >= 500:
+                        breaker.record_failure(f"HTTP {response.status}")
+                    else:
+                        breaker.record_success()
+                    if response.status in expected_status:
+                        if response.status == 204 or response.content_length == 0:
+                            return None
+                        body = await response.text()
+                        if not body:
+                            return None
+                        try:
+                            return json.loads(body)
+                        except ValueError:
+                            return body
+                    error_msg = await response.text()
+                    error = N8NAPIError(f"{method} {path} returned {response.status}: {error_msg}", response.status)
+                    retryable = idempotent and response.status in RETRYABLE_STATUSES
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure(f"{type(e).__name__}: {e}")
+                error = N8NUnavailableError(
+                    f"{method} {path} failed: {type(e).__name__}: {e}",
+                    status=504 if isinstance(e, asyncio.TimeoutError) else 503,
+                )
+                # Connexion refusée : la requête n'est jamais partie, on peut retenter un POST
+                retryable = idempotent or isinstance(e, aiohttp.ClientConnectorError)
+            except BaseException:
+                # Annulation ou erreur locale avant la réponse : l'essai half_open ne doit pas rester pris
+                if not recorded:
+                    breaker.release()
+                raise
+
+            if not retryable or attempt >= N8N_RETRY_POLICY.max_attempts:
+                raise error
+            delay = N8N_RETRY_POLICY.delay(attempt)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            logger.warning(f"N8N {method} {path} attempt {attempt} failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def _execution_slot(self):
+        """
+        Place dans la file de dispatch de l'instance, le temps d'une exécution.
+
+        Raises:
+            N8NUnavailableError: (429) file pleine ou attente supérieure à N8N_DISPATCH_MAX_WAIT.
+        """
+        try:
+            await self.dispatcher.acquire()
+        except DispatchRejectedError as e:
+            logger.warning(f"N8N execution rejected by the dispatch queue: {e}")
+            raise N8NUnavailableError(f"Too many N8N executions: {e}", status=429, retry_after=e.retry_after)
+        try:
+            yield
+        finally:
+            self.dispatcher.release()
+
     async def check_n8n_health(self) -> bool:
-        """Vérifie si N8N est accessible."""
+        """Vérifie si N8N est accessible (une seule entrée demandée)."""
         try:
-            headers = {}
-            if self.n8n_api_key:
-                headers["X-N8N-API-KEY"] = self.n8n_api_key
-            
-            auth = None
-            if self.n8n_auth_user and self.n8n_auth_password:
-                auth = aiohttp.BasicAuth(self.n8n_auth_user, self.n8n_auth_password)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"{self.n8n_api_url}/workflows",
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    return response.status == 200
+            await self._request("GET", "/workflows?limit=1")
+            return True
         except Exception as e:
             logger.error(f"N8N health check failed: {e}")
             return False
 
-    async def install_workflow(self, folder_name: str) -> Dict[str, Any]:
+    def load_definition(self, folder_name: str) -> Tuple[Dict[str, Any], List[str]]:
         """
-        Installe un workflow dans N8N depuis le dossier local.
+        Définition N8N d'un workflow du catalogue (depuis le dossier local) et ses tags.
         """
         workflow_path = os.path.join(self.workflows_base_path, folder_name)
         workflow_file = os.path.join(workflow_path, "workflow.json")
@@ -74,63 +329,174 @@ class N8NExecutorService:
             with open(meta_file, 'r', encoding='utf-8') as f:
                 meta_data = json.load(f)
 
-        # Préparer le workflow pour N8N
-        workflow_payload = {
+        # Champs acceptés par la création comme par la mise à jour N8N
+        definition = {
             "name": meta_data.get("name", folder_name),
             "nodes": workflow_data.get("nodes", []),
             "connections": workflow_data.get("connections", {}),
-            "active": False,  # Commence inactif
             "settings": workflow_data.get("settings", {}),
-            "tags": meta_data.get("tags", [])
         }
+        return definition, meta_data.get("tags", [])
 
-        # Installer dans N8N via API
+    async def install_workflow(self, folder_name: str) -> Dict[str, Any]:
+        """
+        Installe un workflow dans N8N depuis le dossier local.
+        Un workflow N8N du même nom (installation dont l'ID a été perdu) est repris
+        et mis à jour au lieu d'en créer un doublon.
+        """
+        definition, tags = await asyncio.to_thread(self.load_definition, folder_name)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows",
-                    json=workflow_payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 201:
-                        result = await response.json()
-                        logger.info(f"Workflow installed successfully: {result['id']}")
-                        return {
-                            "success": True,
-                            "workflow_id": result["id"],
-                            "name": result["name"]
-                        }
-                    else:
-                        error_msg = await response.text()
-                        raise Exception(f"Failed to install workflow: {error_msg}")
+            result = await self._install_definition(definition, tags)
+            return {
+                "success": True,
+                "workflow_id": result["id"],
+                "name": result["name"],
+                "definition_hash": workflow_definition_hash(definition)
+            }
         except Exception as e:
             logger.error(f"Error installing workflow '{folder_name}': {e}")
             raise
 
-    async def execute_workflow(self, folder_name: str, inputs: Dict[str, Any], user_credentials: Dict[str, Any] = None) -> Dict[str, Any]:
+    async def _install_definition(self, definition: Dict[str, Any], tags: List[str]) -> Dict[str, Any]:
+        existing = await self._find_workflow_by_name(definition["name"])
+        if existing:
+            result = await self._request("PUT", f"/workflows/{existing['id']}", json_body=definition)
+            logger.info(f"Workflow '{definition['name']}' already in N8N, reused: {result['id']}")
+            return result
+
+        # Installer dans N8N via API
+        workflow_payload = {**definition, "active": False, "tags": tags}  # Commence inactif
+        result = await self._request("POST", "/workflows", expected_status=(200, 201), json_body=workflow_payload)
+        logger.info(f"Workflow installed successfully: {result['id']}")
+        return result
+
+    async def _find_workflow_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Plus ancien workflow N8N portant exactement ce nom, ou None."""
+        result = await self._request("GET", f"/workflows?name={quote(name)}&limit=250") or {}
+        matches = [workflow for workflow in result.get("data", []) if workflow.get("name") == name]
+        return min(matches, key=lambda workflow: str(workflow.get("createdAt", ""))) if matches else None
+
+    async def resolve_workflow_id(self, folder_name: str) -> str:
         """
-        Exécute un workflow N8N avec les inputs et credentials utilisateur.
+        Renvoie l'ID N8N du workflow d'un dossier, en l'installant à la première utilisation.
+
+        L'association dossier -> ID est stockée dans `workflows.n8n_workflow_id` et gardée
+        en mémoire. Un verrou par dossier garantit qu'une seule installation a lieu quand
+        plusieurs premières exécutions arrivent en même temps. Au premier appel du
+        processus, une définition locale modifiée depuis l'installation est envoyée à N8N.
         """
-        workflow_path = os.path.join(self.workflows_base_path, folder_name)
-        meta_file = os.path.join(workflow_path, "workflow_meta.json")
+        workflow_id = _workflow_id_cache.get(folder_name)
+        if workflow_id:
+            return workflow_id
+
+        lock = _install_locks.setdefault(folder_name, asyncio.Lock())
+        async with lock:
+            workflow_id = _workflow_id_cache.get(folder_name)
+            if workflow_id:
+                return workflow_id
+            return (await self._sync_definition(folder_name))["workflow_id"]
+
+    async def sync_workflow_definition(self, folder_name: str) -> Dict[str, Any]:
+        """
+        Aligne N8N sur la définition locale d'un workflow du catalogue.
 
-        # Charger les métadonnées pour récupérer l'ID du workflow
-        if not os.path.exists(meta_file):
-            raise FileNotFoundError(f"Workflow metadata not found: {meta_file}")
+        Le hash de la définition installée est stocké dans `workflows.n8n_definition_hash` :
+        aucun appel N8N si rien n'a changé, un PUT si la définition a changé, une
+        installation si le workflow n'existe pas (ou plus) dans N8N.
+        Renvoie {"folder_name", "workflow_id", "action": "unchanged" | "updated" | "installed"}.
+        """
+        lock = _install_locks.setdefault(folder_name, asyncio.Lock())
+        async with lock:
+            return await self._sync_definition(folder_name)
 
-        with open(meta_file, 'r', encoding='utf-8') as f:
-            meta_data = json.load(f)
+    async def _sync_definition(self, folder_name: str) -> Dict[str, Any]:
+        definition, tags = await asyncio.to_thread(self.load_definition, folder_name)
+        definition_hash = workflow_definition_hash(definition)
+        workflow_id, installed_hash = await asyncio.to_thread(self._load_installation, folder_name)
 
-        workflow_id = meta_data.get("n8n_workflow_id")
+        action = "unchanged"
+        if workflow_id and installed_hash != definition_hash:
+            try:
+                await self._request("PUT", f"/workflows/{workflow_id}", json_body=definition)
+                action = "updated"
+                logger.info(f"Workflow '{folder_name}' definition changed, N8N workflow {workflow_id} updated")
+            except N8NAPIError as e:
+                if e.status != 404:
+                    raise
+                # Supprimé dans N8N entre-temps : réinstallation
+                workflow_id = None
         if not workflow_id:
-            # Installer le workflow s'il n'existe pas encore
-            install_result = await self.install_workflow(folder_name)
-            workflow_id = install_result["workflow_id"]
-            
-            # Mettre à jour les métadonnées
-            meta_data["n8n_workflow_id"] = workflow_id
-            with open(meta_file, 'w', encoding='utf-8') as f:
-                json.dump(meta_data, f, indent=2)
+            result = await self._install_definition(definition, tags)
+            workflow_id = str(result["id"])
+            action = "installed"
+
+        if action != "unchanged":
+            await asyncio.to_thread(self._store_workflow_id, folder_name, workflow_id, definition_hash)
+        _workflow_id_cache[folder_name] = workflow_id
+        return {"folder_name": folder_name, "workflow_id": workflow_id, "action": action}
+
+    def forget_workflow_id(self, folder_name: str) -> None:
+        """Oublie l'ID N8N d'un dossier (workflow supprimé côté N8N) : il sera réinstallé."""
+        _workflow_id_cache.pop(folder_name, None)
+        self._store_workflow_id(folder_name, None)
+
+    def _load_installation(self, folder_name: str) -> Tuple[Optional[str], Optional[str]]:
+        """(ID N8N, hash de la définition installée) d'un dossier."""
+        from app.database.database import SessionLocal
+        from app.models.workflow import Workflow
+
+        db = SessionLocal()
+        try:
+            row = db.query(Workflow.n8n_workflow_id, Workflow.n8n_definition_hash).filter(
+                Workflow.folder_name == folder_name
+            ).first()
+            if row and row.n8n_workflow_id:
+                return row.n8n_workflow_id, row.n8n_definition_hash
+        finally:
+            db.close()
+
+        # Ancien emplacement : reprise de l'ID écrit dans workflow_meta.json
+        meta_file = os.path.join(self.workflows_base_path, folder_name, "workflow_meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                legacy_id = json.load(f).get("n8n_workflow_id")
+            if legacy_id:
+                self._store_workflow_id(folder_name, str(legacy_id))
+                return str(legacy_id), None
+        return None, None
+
+    def _store_workflow_id(self, folder_name: str, workflow_id: Optional[str],
+                           definition_hash: Optional[str] = None) -> None:
+        from app.database.database import SessionLocal
+        from app.models.workflow import Workflow
+
+        db = SessionLocal()
+        try:
+            updated = db.query(Workflow).filter(Workflow.folder_name == folder_name).update(
+                {Workflow.n8n_workflow_id: workflow_id, Workflow.n8n_definition_hash: definition_hash},
+                synchronize_session=False
+            )
+            db.commit()
+            if not updated and workflow_id:
+                logger.warning(f"No workflow row for folder '{folder_name}', N8N ID {workflow_id} kept in memory only")
+        finally:
+            db.close()
+
+    @staticmethod
+    def execution_payload(workflow_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Corps de la requête d'exécution d'un workflow du catalogue."""
+        return {
+            "workflowData": {"id": workflow_id},
+            "startNodes": [],
+            "destinationNode": None,
+            **inputs
+        }
+
+    async def execute_workflow(self, folder_name: str, inputs: Dict[str, Any], user_credentials: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Exécute un workflow N8N avec les inputs et credentials utilisateur.
+        """
+        workflow_id = await self.resolve_workflow_id(folder_name)
 
         # Configurer les credentials si fournis
         if user_credentials:
@@ -138,31 +504,20 @@ class N8NExecutorService:
 
         # Exécuter le workflow
         try:
-            async with aiohttp.ClientSession() as session:
-                execution_payload = {
-                    "workflowData": {"id": workflow_id},
-                    "startNodes": [],
-                    "destinationNode": None,
-                    **inputs
-                }
-                
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows/{workflow_id}/execute",
-                    json=execution_payload,
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Workflow executed successfully: {workflow_id}")
-                        return {
-                            "success": True,
-                            "execution_id": result.get("executionId"),
-                            "data": result.get("data", {})
-                        }
-                    else:
-                        error_msg = await response.text()
-                        raise Exception(f"Workflow execution failed: {error_msg}")
+            execution_payload = self.execution_payload(workflow_id, inputs)
+            async with self._execution_slot():
+                result = await self._request("POST", f"/workflows/{workflow_id}/execute", json_body=execution_payload,
+                                             timeout=N8N_EXECUTE_TIMEOUT)
+            logger.info(f"Workflow executed successfully: {workflow_id}")
+            return {
+                "success": True,
+                "execution_id": result.get("executionId"),
+                "data": result.get("data", {})
+            }
         except Exception as e:
+            if isinstance(e, N8NAPIError) and e.status == 404:
+                # Workflow supprimé dans N8N : il sera réinstallé à la prochaine exécution
+                await asyncio.to_thread(self.forget_workflow_id, folder_name)
             logger.error(f"Error executing workflow '{folder_name}': {e}")
             raise
 
@@ -176,126 +531,122 @@ class N8NExecutorService:
             credential_map: Mapping des services vers IDs des credentials
             
         Returns:
-            Tuple[workflow_id, webhook_url]
+            Tuple[workflow_id, webhook_url] (webhook_url est None sans nœud Webhook POST)
         """
         try:
-            # Charger le template
-            with open(template_path, 'r', encoding='utf-8') as f:
-                template_data = json.load(f)
-            
-            # Générer un ID unique pour ce workflow utilisateur
-            workflow_id = str(uuid.uuid4())
-            webhook_id = str(uuid.uuid4())
-            
-            # Cloner et personnaliser le template
-            cloned_workflow = self._personalize_template(
-                template_data, user_id, workflow_id, webhook_id, credential_map
-            )
-            
-            # Créer le workflow via l'API N8N
-            headers = {"Content-Type": "application/json"}
-            
-            # Ajouter l'authentification appropriée
-            if self.n8n_api_key:
-                headers["X-N8N-API-KEY"] = self.n8n_api_key
-            
-            auth = None
-            if self.n8n_auth_user and self.n8n_auth_password:
-                auth = aiohttp.BasicAuth(self.n8n_auth_user, self.n8n_auth_password)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows",
-                    json=cloned_workflow,
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status not in [200, 201]:
-                        error_msg = await response.text()
-                        raise Exception(f"Failed to create workflow: {error_msg}")
-                    
-                    result = await response.json()
-                    n8n_workflow_id = result["id"]
-                    logger.info(f"Workflow created successfully with ID: {n8n_workflow_id}")
-            
-            # Activer le workflow (optionnel - on continue même si ça échoue)
-            try:
-                await self._activate_workflow(n8n_workflow_id)
-                logger.info(f"Workflow {n8n_workflow_id} activated successfully")
-            except Exception as activation_error:
-                logger.warning(f"Failed to activate workflow {n8n_workflow_id}: {activation_error}")
-                # On continue quand même car le workflow est créé
-            
-            # Construire l'URL du webhook
-            webhook_url = f"{self.n8n_api_url.replace('/api/v1', '')}/webhook/gmail-to-drive-{workflow_id}"
-            
-            logger.info(f"Workflow cloned successfully: {n8n_workflow_id} for user {user_id}")
-            return n8n_workflow_id, webhook_url
-            
+            # Template compilé une fois, puis mis en cache
+            template = load_template(template_path)
+            return await self._create_clone(template, user_id, credential_map)
         except Exception as e:
             logger.error(f"Error cloning workflow: {e}")
             raise
-    
-    def _personalize_template(self, template: Dict[str, Any], user_id: str, workflow_id: str, 
-                            webhook_id: str, credential_map: Dict[str, str]) -> Dict[str, Any]:
+
+    async def clone_workflows_bulk(self, template_path: str, clone_requests: List[Dict[str, Any]],
+                                   concurrency: int = BULK_CLONE_CONCURRENCY) -> List[Dict[str, Any]]:
         """
-        Personnalise un template avec les données utilisateur.
+        Clone un template pour plusieurs utilisateurs.
+
+        Le template est compilé une seule fois ; les créations et activations
+        N8N tournent en parallèle, au plus `concurrency` à la fois.
+
+        Args:
+            template_path: Chemin vers le template JSON
+            clone_requests: [{"user_id": ..., "credentials": {service: cred_id}}, ...]
+
+        Returns:
+            Un résultat par demande, dans le même ordre :
+            {"user_id", "success", "workflow_id", "webhook_url", "error"}
         """
-        # Convertir le template en string pour faire les remplacements
-        template_str = json.dumps(template)
-        
-        # Remplacer les placeholders
-        template_str = template_str.replace("{{WORKFLOW_ID}}", workflow_id)
-        template_str = template_str.replace("{{WEBHOOK_ID}}", webhook_id)
-        template_str = template_str.replace("{{USER_ID}}", user_id)
-        
-        # Remplacer les credentials
-        for service, cred_id in credential_map.items():
-            if service == "gmail":
-                template_str = template_str.replace("{{CREDENTIAL_ID_GMAIL}}", str(cred_id))
-            elif service == "google_drive":
-                template_str = template_str.replace("{{CREDENTIAL_ID_GOOGLE_DRIVE}}", str(cred_id))
-        
-        # Reconvertir en dict
-        personalized = json.loads(template_str)
-        
+        template = load_template(template_path)
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        async def clone_one(request: Dict[str, Any]) -> Dict[str, Any]:
+            user_id = str(request["user_id"])
+            async with semaphore:
+                try:
+                    workflow_id, webhook_url = await self._create_clone(
+                        template, user_id, request.get("credentials", {})
+                    )
+                    return {"user_id": user_id, "success": True, "workflow_id": workflow_id,
+                            "webhook_url": webhook_url, "error": None}
+                except Exception as e:
+                    logger.error(f"Error cloning workflow for user {user_id}: {e}")
+                    return {"user_id": user_id, "success": False, "workflow_id": None,
+                            "webhook_url": None, "error": str(e)}
+
+        return await asyncio.gather(*(clone_one(request) for request in clone_requests))
+
+    async def _create_clone(self, template: CompiledTemplate, user_id: str,
+                            credential_map: Dict[str, str]) -> Tuple[int, Optional[str]]:
+        """
+        Personnalise le template, crée le workflow dans N8N puis l'active.
+        Renvoie (ID N8N, URL du webhook POST ou None si le workflow n'en a pas).
+        """
+        # Générer un ID unique pour ce workflow utilisateur
+        workflow_id = str(uuid.uuid4())
+        webhook_id = str(uuid.uuid4())
+
+        # Cloner et personnaliser le template
+        cloned_workflow = self._personalize_template(
+            template, user_id, workflow_id, webhook_id, credential_map
+        )
+
+        # Créer le workflow via l'API N8N
+        result = await self._request("POST", "/workflows", expected_status=(200, 201), json_body=cloned_workflow)
+        n8n_workflow_id = result["id"]
+        logger.info(f"Workflow created successfully with ID: {n8n_workflow_id}")
+
+        # Activer le workflow (optionnel - on continue même si ça échoue)
+        try:
+            await self._activate_workflow(n8n_workflow_id)
+            logger.info(f"Workflow {n8n_workflow_id} activated successfully")
+        except Exception as activation_error:
+            logger.warning(f"Failed to activate workflow {n8n_workflow_id}: {activation_error}")
+            # On continue quand même car le workflow est créé
+
+        # URL du webhook de déclenchement, d'après le nœud Webhook du workflow rendu
+        webhook_path = find_webhook_path(cloned_workflow)
+        webhook_url = f"{self.webhook_base_url}/{webhook_path}" if webhook_path else None
+
+        logger.info(f"Workflow cloned successfully: {n8n_workflow_id} for user {user_id}")
+        return n8n_workflow_id, webhook_url
+
+    def _personalize_template(self, template: CompiledTemplate, user_id: str, workflow_id: str,
+                              webhook_id: str, credential_map: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Personnalise un template compilé avec les données utilisateur, en une passe.
+        Chaque service du mapping remplit son placeholder CREDENTIAL_ID_<SERVICE>.
+        """
+        values = {
+            "WORKFLOW_ID": workflow_id,
+            "WEBHOOK_ID": webhook_id,
+            "USER_ID": user_id,
+            **credential_values(credential_map)
+        }
+        missing = template.missing(values)
+        if missing:
+            logger.warning(f"Template placeholders without value for user {user_id}: {', '.join(missing)}")
+
+        personalized = template.render(values)
+
         # Ajouter un nom unique
-        personalized["name"] = f"{template['name']} - User {user_id}"
-        
+        personalized["name"] = f"{template.source['name']} - User {user_id}"
+
         # Supprimer les champs en lecture seule que N8N assigne automatiquement
         read_only_fields = ["id", "active", "createdAt", "updatedAt"]
         for field in read_only_fields:
             if field in personalized:
                 del personalized[field]
-        
+
         return personalized
-    
+
     async def _activate_workflow(self, workflow_id: int) -> None:
         """
         Active un workflow.
         """
         try:
-            headers = {"Content-Type": "application/json"}
-            
-            # Ajouter l'authentification appropriée
-            if self.n8n_api_key:
-                headers["X-N8N-API-KEY"] = self.n8n_api_key
-            
-            auth = None
-            if self.n8n_auth_user and self.n8n_auth_password:
-                auth = aiohttp.BasicAuth(self.n8n_auth_user, self.n8n_auth_password)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows/{workflow_id}/activate",
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status not in [200, 204]:
-                        error_msg = await response.text()
-                        raise Exception(f"Failed to activate workflow: {error_msg}")
-                    
-                    logger.info(f"Workflow {workflow_id} activated successfully")
+            await self._request("POST", f"/workflows/{workflow_id}/activate", expected_status=(200, 204), idempotent=True)
+            logger.info(f"Workflow {workflow_id} activated successfully")
         except Exception as e:
             logger.error(f"Error activating workflow {workflow_id}: {e}")
             raise
@@ -305,43 +656,111 @@ class N8NExecutorService:
         Exécute un workflow par son ID.
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows/{workflow_id}/execute",
-                    json={"data": {}},
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logger.info(f"Workflow {workflow_id} executed successfully")
-                        return {
-                            "success": True,
-                            "execution_id": result.get("executionId"),
-                            "data": result.get("data", {})
-                        }
-                    else:
-                        error_msg = await response.text()
-                        raise Exception(f"Workflow execution failed: {error_msg}")
+            async with self._execution_slot():
+                result = await self._request("POST", f"/workflows/{workflow_id}/execute", json_body={"data": {}},
+                                             timeout=N8N_EXECUTE_TIMEOUT)
+            logger.info(f"Workflow {workflow_id} executed successfully")
+            return {
+                "success": True,
+                "execution_id": result.get("executionId"),
+                "data": result.get("data", {})
+            }
         except Exception as e:
             logger.error(f"Error executing workflow {workflow_id}: {e}")
             raise
 
+    async def trigger_webhook(self, webhook_url: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Déclenche un workflow par son webhook (POST), plus léger que l'API d'exécution.
+
+        Un webhook en mode "onReceived" répond dès la réception : l'exécution continue
+        dans N8N et `pending` vaut True (le tracker d'exécutions la complétera).
+        Sinon la réponse contient le résultat du workflow. N8N ne renvoie pas d'ID
+        d'exécution sur un webhook.
+        """
+        async with self._execution_slot():
+            result = await self._request("POST", webhook_url, expected_status=(200,), json_body=payload or {},
+                                         timeout=N8N_EXECUTE_TIMEOUT, url=webhook_url)
+        pending = isinstance(result, dict) and result.get("message") == WEBHOOK_STARTED_MESSAGE
+        logger.info(f"Workflow webhook triggered: {webhook_url}{' (running in background)' if pending else ''}")
+        return {
+            "success": True,
+            "execution_id": None,
+            "pending": pending,
+            "trigger": "webhook",
+            "data": {} if pending else (result if result is not None else {})
+        }
+
+    async def execute_instance(self, workflow_id: int, webhook_url: Optional[str] = None,
+                               payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Exécute un workflow cloné : par son webhook s'il en a un, sinon (ou si le
+        webhook n'est pas enregistré, workflow désactivé) par l'API d'exécution.
+        """
+        if webhook_url:
+            try:
+                return await self.trigger_webhook(webhook_url, payload)
+            except N8NAPIError as e:
+                if e.status != 404:
+                    raise
+                logger.info(f"Webhook not registered for workflow {workflow_id}, using the execution API")
+        return await self.execute_workflow_by_id(workflow_id)
+
+    async def stream_execution(self, workflow_id: str, payload: Optional[Dict[str, Any]] = None,
+                               chunk_size: int = 64 * 1024) -> AsyncIterator[bytes]:
+        """
+        Exécute un workflow et renvoie le corps de la réponse N8N par morceaux,
+        sans le charger en mémoire. Pas de retry (exécution non idempotente) ;
+        le disjoncteur et le délai d'exécution s'appliquent. La place dans la file
+        de dispatch est gardée jusqu'au dernier morceau.
+        """
+        async with self._execution_slot():
+            breaker = get_breaker(self.n8n_api_url)
+            path = f"/workflows/{workflow_id}/execute"
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                raise N8NUnavailableError(f"N8N unavailable (POST {path}): {e}", retry_after=e.retry_after)
+
+            recorded = False
+            try:
+                async with http_pool.session.post(
+                    f"{self.n8n_api_url}{path}",
+                    json=payload if payload is not None else {"data": {}},
+                    headers=self._headers(),
+                    auth=self._auth(),
+                    timeout=aiohttp.ClientTimeout(total=N8N_EXECUTE_TIMEOUT, connect=http_pool.connect_timeout)
+                ) as response:
+                    recorded = True
+                    if response.status >= 500:
+                        breaker.record_failure(f"HTTP {response.status}")
+                    else:
+                        breaker.record_success()
+                    if response.status != 200:
+                        error_msg = await response.text()
+                        raise N8NAPIError(f"POST {path} returned {response.status}: {error_msg}", response.status)
+                    async for chunk in response.content.iter_chunked(chunk_size):
+                        yield chunk
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                breaker.record_failure(f"{type(e).__name__}: {e}")
+                raise N8NUnavailableError(
+                    f"POST {path} failed: {type(e).__name__}: {e}",
+                    status=504 if isinstance(e, asyncio.TimeoutError) else 503,
+                )
+            except BaseException:
+                if not recorded:
+                    breaker.release()
+                raise
+
     async def toggle_workflow(self, workflow_id: int, active: bool) -> None:
         """
         Active ou désactive un workflow.
         """
         try:
             action = "activate" if active else "deactivate"
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.n8n_api_url}/workflows/{workflow_id}/{action}",
-                    headers={"Content-Type": "application/json"}
-                ) as response:
-                    if response.status not in [200, 204]:
-                        error_msg = await response.text()
-                        raise Exception(f"Failed to {action} workflow: {error_msg}")
-                    
-                    logger.info(f"Workflow {workflow_id} {action}d successfully")
+            await self._request("POST", f"/workflows/{workflow_id}/{action}", expected_status=(200, 204), idempotent=True)
+            self.status_cache.invalidate(str(workflow_id))
+            logger.info(f"Workflow {workflow_id} {action}d successfully")
         except Exception as e:
             logger.error(f"Error toggling workflow {workflow_id}: {e}")
             raise
@@ -351,29 +770,47 @@ class N8NExecutorService:
         Supprime un workflow dans N8N.
         """
         try:
-            headers = {}
-            if self.n8n_api_key:
-                headers["X-N8N-API-KEY"] = self.n8n_api_key
-            
-            auth = None
-            if self.n8n_auth_user and self.n8n_auth_password:
-                auth = aiohttp.BasicAuth(self.n8n_auth_user, self.n8n_auth_password)
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.delete(
-                    f"{self.n8n_api_url}/workflows/{workflow_id}",
-                    headers=headers,
-                    auth=auth
-                ) as response:
-                    if response.status not in [200, 204]:
-                        error_msg = await response.text()
-                        raise Exception(f"Failed to delete workflow: {error_msg}")
-                    
-                    logger.info(f"Workflow {workflow_id} deleted successfully from N8N")
+            await self._request("DELETE", f"/workflows/{workflow_id}", expected_status=(200, 204))
+            self.status_cache.invalidate(str(workflow_id))
+            logger.info(f"Workflow {workflow_id} deleted successfully from N8N")
         except Exception as e:
             logger.error(f"Error deleting workflow {workflow_id}: {e}")
             raise
 
+    async def list_workflows(self, cursor: Optional[str] = None, limit: int = 250,
+                             active: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Liste une page de workflows N8N (sans les nœuds à exploiter ici).
+        Renvoie {"data": [...], "nextCursor": ...}.
+        """
+        query = f"/workflows?limit={limit}"
+        if cursor:
+            query += f"&cursor={cursor}"
+        if active is not None:
+            query += f"&active={'true' if active else 'false'}"
+        if N8N_LIST_EXCLUDE_PINNED_DATA:
+            query += "&excludePinnedData=true"
+        return await self._request("GET", query) or {"data": [], "nextCursor": None}
+
+    async def list_executions(self, cursor: Optional[str] = None, limit: int = 100,
+                              workflow_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Liste une page d'exécutions N8N, des plus récentes aux plus anciennes.
+        Renvoie {"data": [...], "nextCursor": ...}.
+        """
+        query = f"/executions?limit={limit}&includeData=false"
+        if cursor:
+            query += f"&cursor={cursor}"
+        if workflow_id:
+            query += f"&workflowId={workflow_id}"
+        return await self._request("GET", query) or {"data": [], "nextCursor": None}
+
+    async def get_execution(self, execution_id: str, include_data: bool = False) -> Dict[str, Any]:
+        """Récupère une exécution N8N (avec ses données si `include_data`)."""
+        return await self._request(
+            "GET", f"/executions/{execution_id}?includeData={'true' if include_data else 'false'}"
+        )
+
     async def _configure_credentials(self, workflow_id: str, user_credentials: Dict[str, Any]):
         """
         Configure les credentials pour un workflow spécifique.
@@ -382,21 +819,87 @@ class N8NExecutorService:
         # Peut utiliser l'API N8N credentials ou des variables d'environnement
         pass
 
-    async def get_workflow_status(self, workflow_id: str) -> Dict[str, Any]:
+    @staticmethod
+    def _status_summary(workflow: Dict[str, Any]) -> Dict[str, Any]:
+        """Statut réduit d'un workflow N8N (sans nœuds ni connexions)."""
+        return {
+            "id": str(workflow["id"]),
+            "name": workflow.get("name"),
+            "active": bool(workflow.get("active")),
+            "updatedAt": workflow.get("updatedAt"),
+        }
+
+    async def get_workflow_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
         """
-        Récupère le statut d'un workflow.
+        Récupère le statut d'un workflow (None s'il n'existe plus dans N8N).
+        Mis en cache N8N_STATUS_CACHE_TTL secondes ; les demandes simultanées
+        partagent un seul appel.
         """
+        workflow_id = str(workflow_id)
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.n8n_api_url}/workflows/{workflow_id}") as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        raise Exception(f"Failed to get workflow status: {response.status}")
+            return await self.status_cache.get_or_load(workflow_id, lambda: self._fetch_status(workflow_id))
         except Exception as e:
             logger.error(f"Error getting workflow status: {e}")
             raise
 
+    async def _fetch_status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Statut lu dans N8N et mis en cache (None si le workflow n'existe plus), sauf si
+        le workflow a été activé, désactivé ou supprimé pendant la lecture.
+        """
+        generation = self.status_cache.generation()
+        try:
+            summary = self._status_summary(await self._request("GET", f"/workflows/{workflow_id}"))
+        except N8NAPIError as e:
+            if e.status != 404:
+                raise
+            summary = None
+        self.status_cache.set(workflow_id, summary, generation)
+        return summary
+
+    async def get_workflow_statuses(self, workflow_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Statuts de plusieurs workflows. S'il en manque peu dans le cache (au plus
+        N8N_STATUS_LIST_THRESHOLD), un GET par workflow, regroupé avec les lectures
+        simultanées du même ID. Sinon, la liste des workflows du backend (un appel par
+        page de N8N_STATUS_PAGE_SIZE) rafraîchit le cache pour tous ; les listes
+        simultanées sont regroupées. None : workflow absent de N8N.
+        """
+        statuses = {str(workflow_id): self.status_cache.get(str(workflow_id)) for workflow_id in workflow_ids}
+        missing = [workflow_id for workflow_id, workflow_status in statuses.items() if workflow_status is MISSING]
+        if not missing:
+            return statuses
+
+        if len(missing) <= N8N_STATUS_LIST_THRESHOLD:
+            fetched = await asyncio.gather(*(
+                self.status_cache.coalesce(workflow_id, lambda workflow_id=workflow_id: self._fetch_status(workflow_id))
+                for workflow_id in missing
+            ))
+            statuses.update(zip(missing, fetched))
+            return statuses
+
+        generation = self.status_cache.generation()
+        listed = await self.status_cache.coalesce("__list__", self._list_statuses)
+        for workflow_id in missing:
+            statuses[workflow_id] = listed.get(workflow_id)
+            if workflow_id not in listed:
+                self.status_cache.set(workflow_id, None, generation)
+        return statuses
+
+    async def _list_statuses(self) -> Dict[str, Dict[str, Any]]:
+        listed: Dict[str, Dict[str, Any]] = {}
+        generation = self.status_cache.generation()
+        cursor = None
+        while True:
+            page = await self.list_workflows(cursor=cursor, limit=N8N_STATUS_PAGE_SIZE)
+            for workflow in page.get("data", []):
+                summary = self._status_summary(workflow)
+                listed[summary["id"]] = summary
+                self.status_cache.set(summary["id"], summary, generation)
+            cursor = page.get("nextCursor")
+            if not cursor:
+                return listed
+
 class N8NDiscoveryService:
     """
     Service pour découvrir et synchroniser les workflows N8N.
@@ -411,45 +914,71 @@ class N8NDiscoveryService:
         """
         Scanne et découvre les workflows N8N disponibles.
         """
-        discovered_workflows = []
+        discovered_workflows = list(self.iter_workflows())
+        logger.info(f"Total N8N workflows discovered: {len(discovered_workflows)}")
+        return discovered_workflows
+
+    def count_workflow_folders(self) -> int:
+        """
+        Compte les dossiers de workflows sans lire leur contenu (pour la progression).
+        """
+        if not os.path.exists(self.workflows_base_path):
+            return 0
+        with os.scandir(self.workflows_base_path) as entries:
+            return sum(1 for entry in entries if entry.is_dir() and not entry.name.startswith('__'))
+
+    def iter_workflows(self) -> Iterator[Dict[str, Any]]:
+        """
+        Générateur : produit les métadonnées d'un workflow à la fois, sans
+        construire la liste complète du catalogue en mémoire.
+        """
         if not os.path.exists(self.workflows_base_path):
             logger.warning(f"Workflows path does not exist: {self.workflows_base_path}")
-            return []
-
-        for folder_name in os.listdir(self.workflows_base_path):
-            workflow_folder_path = os.path.join(self.workflows_base_path, folder_name)
-            if os.path.isdir(workflow_folder_path) and not folder_name.startswith('__'):
-                workflow_file = os.path.join(workflow_folder_path, "workflow.json")
-                meta_file = os.path.join(workflow_folder_path, "workflow_meta.json")
-                
-                if os.path.exists(workflow_file):
-                    try:
-                        # Charger les métadonnées
-                        meta = {"name": folder_name, "description": "", "category": "automation"}
-                        if os.path.exists(meta_file):
-                            with open(meta_file, 'r', encoding='utf-8') as f:
-                                meta.update(json.load(f))
-                        
-                        # Analyser le workflow pour extraire des infos
-                        with open(workflow_file, 'r', encoding='utf-8') as f:
-                            workflow_data = json.load(f)
-                            
-                        meta.update({
-                            "folder_name": folder_name,
-                            "type": "n8n_workflow",
-                            "node_count": len(workflow_data.get("nodes", [])),
-                            "integrations": self._extract_integrations(workflow_data),
-                            "is_active": True
-                        })
-                        
-                        discovered_workflows.append(meta)
-                        logger.info(f"Discovered N8N workflow: {meta['name']} (folder: {folder_name})")
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing workflow '{folder_name}': {e}")
+            return
 
-        logger.info(f"Total N8N workflows discovered: {len(discovered_workflows)}")
-        return discovered_workflows
+        with os.scandir(self.workflows_base_path) as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.name.startswith('__'):
+                    continue
+                meta = self._load_workflow_meta(entry.name, entry.path)
+                if meta is not None:
+                    yield meta
+
+    def _load_workflow_meta(self, folder_name: str, workflow_folder_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Charge les métadonnées d'un dossier de workflow, ou None s'il n'est pas valide.
+        """
+        workflow_file = os.path.join(workflow_folder_path, "workflow.json")
+        meta_file = os.path.join(workflow_folder_path, "workflow_meta.json")
+
+        if not os.path.exists(workflow_file):
+            return None
+
+        try:
+            # Charger les métadonnées
+            meta = {"name": folder_name, "description": "", "category": "automation"}
+            if os.path.exists(meta_file):
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    meta.update(json.load(f))
+
+            # Analyser le workflow pour extraire des infos
+            with open(workflow_file, 'r', encoding='utf-8') as f:
+                workflow_data = json.load(f)
+
+            meta.update({
+                "folder_name": folder_name,
+                "type": "n8n_workflow",
+                "node_count": len(workflow_data.get("nodes", [])),
+                "integrations": self._extract_integrations(workflow_data),
+                "is_active": True
+            })
+
+            logger.info(f"Discovered N8N workflow: {meta['name']} (folder: {folder_name})")
+            return meta
+
+        except Exception as e:
+            logger.error(f"Error processing workflow '{folder_name}': {e}")
+            return None
 
     def _extract_integrations(self, workflow_data: Dict[str, Any]) -> List[str]:
         """
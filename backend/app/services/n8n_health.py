@@ -0,0 +1,126 @@
+# app/services/n8n_health.py
+"""
+Sonde de santé N8N en arrière-plan.
+
+Une tâche interroge périodiquement l'endpoint léger `/healthz` de N8N et garde
+le résultat en cache avec un TTL : le chemin d'exécution lit ce cache au lieu
+de faire un aller-retour vers N8N avant chaque exécution.
+"""
+import asyncio
+import logging
+import os
+import time
+from contextlib import suppress
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+import aiohttp
+
+from app.services.http_client import http_pool
+from app.services.n8n_executor import DEFAULT_N8N_API_URL
+from app.services.n8n_backends import n8n_backends
+
+logger = logging.getLogger(__name__)
+
+N8N_HEALTH_INTERVAL = float(os.getenv("N8N_HEALTH_INTERVAL", "15"))
+N8N_HEALTH_TTL = float(os.getenv("N8N_HEALTH_TTL", "45"))
+N8N_HEALTH_TIMEOUT = float(os.getenv("N8N_HEALTH_TIMEOUT", "3"))
+N8N_HEALTH_PATH = os.getenv("N8N_HEALTH_PATH", "/healthz")
+
+
+class N8NHealthProber:
+    """
+    Garde en cache l'état de santé d'une instance N8N.
+    """
+    def __init__(self, n8n_api_url: str = DEFAULT_N8N_API_URL,
+                 interval: float = N8N_HEALTH_INTERVAL, ttl: float = N8N_HEALTH_TTL):
+        # /healthz est servi à la racine de N8N, pas sous /api/v1
+        self.health_url = f"{n8n_api_url.rstrip('/').removesuffix('/api/v1')}{N8N_HEALTH_PATH}"
+        self.interval = interval
+        self.ttl = ttl
+        self._healthy: Optional[bool] = None
+        self._checked_at: Optional[float] = None
+        self._checked_at_utc: Optional[datetime] = None
+        self._latency_ms: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._probe_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        """Lance la boucle de sonde (idempotent)."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"N8N health prober started ({self.health_url}, every {self.interval}s, ttl {self.ttl}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.interval)
+
+    async def probe(self) -> bool:
+        """Interroge N8N maintenant et met le cache à jour."""
+        async with self._probe_lock:
+            started = time.monotonic()
+            try:
+                async with http_pool.session.get(
+                    self.health_url,
+                    timeout=aiohttp.ClientTimeout(total=N8N_HEALTH_TIMEOUT)
+                ) as response:
+                    healthy = response.status == 200
+                    error = None if healthy else f"HTTP {response.status}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                healthy = False
+                error = f"{type(e).__name__}: {e}"
+
+            if healthy != self._healthy:
+                if healthy:
+                    logger.info(f"N8N is healthy ({self.health_url})")
+                else:
+                    logger.warning(f"N8N health probe failed ({self.health_url}): {error}")
+            self._healthy = healthy
+            self._last_error = error
+            self._latency_ms = round((time.monotonic() - started) * 1000, 1)
+            self._checked_at = time.monotonic()
+            self._checked_at_utc = datetime.utcnow()
+            return healthy
+
+    @property
+    def is_fresh(self) -> bool:
+        return self._checked_at is not None and time.monotonic() - self._checked_at <= self.ttl
+
+    def is_available(self) -> bool:
+        """
+        Lecture du cache, sans appel réseau. Un état inconnu ou expiré ne bloque pas
+        l'exécution : les retries et le disjoncteur de l'appel N8N prennent le relais.
+        """
+        if not self.is_fresh:
+            return True
+        return bool(self._healthy)
+
+    def status(self) -> Dict[str, Any]:
+        if self._checked_at is None:
+            state = "unknown"
+        elif not self.is_fresh:
+            state = "stale"
+        else:
+            state = "healthy" if self._healthy else "unhealthy"
+        return {
+            "state": state,
+            "url": self.health_url,
+            "checked_at": self._checked_at_utc.isoformat() if self._checked_at_utc else None,
+            "latency_ms": self._latency_ms,
+            "last_error": self._last_error,
+            "interval": self.interval,
+            "ttl": self.ttl,
+        }
+
+
+# Instance N8N par défaut (catalogue et workflows antérieurs au sharding)
+n8n_health = N8NHealthProber(n8n_backends.default.api_url)
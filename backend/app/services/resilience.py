@@ -0,0 +1,265 @@
+# app/services/resilience.py
+"""
+Primitives de résilience pour les appels sortants : backoff exponentiel avec
+jitter, disjoncteur (circuit breaker) et file de dispatch à débit limité.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """
+    Levée quand le disjoncteur est ouvert : l'appel échoue immédiatement.
+    """
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class RetryPolicy:
+    """
+    Backoff exponentiel avec "full jitter" : le délai avant la tentative n est
+    tiré uniformément dans [0, min(max_delay, base_delay * 2**n)].
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """Délai avant la tentative suivante (`attempt` commence à 1)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class CircuitBreaker:
+    """
+    Disjoncteur à trois états :
+    - closed : les appels passent, les échecs consécutifs sont comptés ;
+    - open : après `failure_threshold` échecs, les appels échouent immédiatement
+      pendant `recovery_timeout` secondes ;
+    - half_open : un appel d'essai passe ; succès -> closed, échec -> open. Un essai
+      sans réponse au bout de `trial_timeout` secondes (recovery_timeout par défaut)
+      est considéré perdu et rouvre le disjoncteur.
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, recovery_timeout: float = 30.0,
+                 trial_timeout: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.trial_timeout = recovery_timeout if trial_timeout is None else trial_timeout
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._half_open_in_flight = False
+        self._trial_started_at: Optional[float] = None
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+        self._last_failure: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        now = time.monotonic()
+        if self._state == "open" and now - self._opened_at >= self.recovery_timeout:
+            self._state = "half_open"
+            self._half_open_in_flight = False
+        elif (self._state == "half_open" and self._half_open_in_flight
+              and now - self._trial_started_at >= self.trial_timeout):
+            logger.warning(f"Circuit '{self.name}' trial call got no answer in {self.trial_timeout}s, reopening")
+            self._stats["opened"] += 1
+            self._state = "open"
+            self._opened_at = now
+            self._half_open_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """À appeler avant chaque tentative ; lève CircuitOpenError si l'appel est refusé."""
+        state = self.state
+        if state == "open":
+            self._stats["rejected"] += 1
+            raise CircuitOpenError(self.name, self.recovery_timeout - (time.monotonic() - self._opened_at))
+        if state == "half_open":
+            if self._half_open_in_flight:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._half_open_in_flight = True
+            self._trial_started_at = time.monotonic()
+
+    def release(self) -> None:
+        """
+        Appel terminé sans verdict (annulation, erreur locale) : libère la place
+        d'essai du mode half_open sans compter ni succès ni échec.
+        """
+        self._half_open_in_flight = False
+
+    def record_success(self) -> None:
+        self._stats["successes"] += 1
+        self._consecutive_failures = 0
+        self._half_open_in_flight = False
+        if self._state != "closed":
+            logger.info(f"Circuit '{self.name}' closed")
+        self._state = "closed"
+
+    def record_failure(self, error: Optional[str] = None) -> None:
+        self._stats["failures"] += 1
+        self._consecutive_failures += 1
+        self._last_failure = error
+        was_half_open = self._state == "half_open"
+        self._half_open_in_flight = False
+        if was_half_open or self._consecutive_failures >= self.failure_threshold:
+            if self._state != "open":
+                self._stats["opened"] += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self._consecutive_failures} failures: {error}")
+            self._state = "open"
+            self._opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_timeout": self.recovery_timeout,
+            "retry_after": round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == "open" else 0.0,
+            "last_failure": self._last_failure,
+            **self._stats,
+        }
+
+
+class DispatchRejectedError(Exception):
+    """
+    Levée quand la file de dispatch refuse un appel : file pleine ou attente trop longue.
+    """
+    def __init__(self, name: str, reason: str, retry_after: float):
+        super().__init__(f"Dispatch queue '{name}' rejected the call: {reason}")
+        self.name = name
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Seau à jetons : `rate` jetons par seconde, au plus `burst` en réserve.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """Prend un jeton ; sinon renvoie le délai avant le prochain jeton (0.0 si pris)."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class DispatchQueue:
+    """
+    File d'attente devant une ressource partagée : au plus `concurrency` appels en
+    cours et `rate` départs par seconde (seau à jetons, rafales de `burst`). Les appels
+    en excès attendent dans l'ordre d'arrivée, au plus `max_wait` secondes ; au-delà de
+    `max_queue` appels en attente, les suivants sont refusés immédiatement.
+    `rate` ou `concurrency` à 0 : pas de limite.
+    """
+    def __init__(self, name: str, rate: float = 0.0, burst: int = 1, concurrency: int = 0,
+                 max_wait: float = 30.0, max_queue: int = 1000, wait_samples: int = 1000):
+        self.name = name
+        self.rate = rate
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self._bucket = TokenBucket(rate, burst) if rate > 0 else None
+        self._semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+        # Un seul appel à la fois attend jeton et place : les autres patientent derrière (FIFO)
+        self._gate = asyncio.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._waits = deque(maxlen=wait_samples)
+        self._stats = {"dispatched": 0, "queued": 0, "rejected_queue_full": 0, "rejected_timeout": 0}
+
+    async def acquire(self) -> None:
+        """Attend une place et un jeton. Lève DispatchRejectedError si la file est pleine ou trop lente."""
+        if self._queued >= self.max_queue:
+            self._stats["rejected_queue_full"] += 1
+            raise DispatchRejectedError(self.name, f"{self._queued} calls already queued", self._retry_after())
+        queued_at = time.monotonic()
+        self._queued += 1
+        try:
+            async with asyncio.timeout(self.max_wait):
+                await self._wait_turn()
+        except TimeoutError:
+            self._stats["rejected_timeout"] += 1
+            raise DispatchRejectedError(self.name, f"no slot within {self.max_wait}s", self._retry_after())
+        finally:
+            self._queued -= 1
+        waited = time.monotonic() - queued_at
+        if waited > 0.001:
+            self._stats["queued"] += 1
+        self._waits.append(waited)
+        self._in_flight += 1
+        self._stats["dispatched"] += 1
+
+    async def _wait_turn(self) -> None:
+        async with self._gate:
+            if self._semaphore is not None:
+                await self._semaphore.acquire()
+            try:
+                while self._bucket is not None:
+                    delay = self._bucket.take()
+                    if not delay:
+                        break
+                    await asyncio.sleep(delay)
+            except BaseException:
+                if self._semaphore is not None:
+                    self._semaphore.release()
+                raise
+
+    def release(self) -> None:
+        self._in_flight -= 1
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _retry_after(self) -> float:
+        if self.rate > 0:
+            return round(max(1.0, self._queued / self.rate), 1)
+        return self.max_wait
+
+    def snapshot(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(fraction: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(fraction * len(waits)))] * 1000, 1)
+
+        return {
+            "rate": self.rate,
+            "burst": self._bucket.burst if self._bucket is not None else None,
+            "concurrency": self.concurrency,
+            "max_wait": self.max_wait,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "wait_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "max": percentile(1.0)},
+            **self._stats,
+        }
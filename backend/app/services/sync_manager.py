@@ -0,0 +1,259 @@
+# app/services/sync_manager.py
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from app.database.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Phases exécutées pour chaque type de synchronisation
+SYNC_KINDS = {
+    "all": ["crews", "workflows"],
+    "crews": ["crews"],
+    "workflows": ["workflows"],
+}
+
+
+class SyncJob:
+    """
+    Une synchronisation du catalogue (crews et/ou workflows) et sa progression.
+    """
+    def __init__(self, kind: str, trigger: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.trigger = trigger
+        self.phases = list(SYNC_KINDS[kind])
+        # "queued", "running", "completed", "partial" (au moins une phase en erreur), "failed"
+        self.status = "queued"
+        self.current_phase: Optional[str] = None
+        self.phase_progress = {phase: {"processed": 0, "total": None} for phase in self.phases}
+        self.phase_results: Dict[str, Dict[str, Any]] = {}
+        self.errors: List[str] = []
+        self.joined_requests = 0
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started_monotonic: Optional[float] = None
+        self._finished_monotonic: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def covers(self, kind: str) -> bool:
+        """Indique si ce job synchronise déjà tout ce que demande `kind`."""
+        return set(SYNC_KINDS[kind]) <= set(self.phases)
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    @property
+    def duration_seconds(self) -> Optional[float]:
+        if self._started_monotonic is None:
+            return None
+        end = self._finished_monotonic if self._finished_monotonic is not None else time.monotonic()
+        return round(end - self._started_monotonic, 3)
+
+    def report_progress(self, phase: str, processed: int, total: int) -> None:
+        """Callback appelé depuis le thread de synchronisation."""
+        self.phase_progress[phase] = {"processed": processed, "total": total}
+
+    def progress_percent(self) -> float:
+        if self.status == "completed":
+            return 100.0
+        done = 0.0
+        for phase in self.phases:
+            progress = self.phase_progress[phase]
+            if phase in self.phase_results:
+                done += 1
+            elif progress["total"]:
+                done += progress["processed"] / progress["total"]
+        return round(100.0 * done / len(self.phases), 1)
+
+    def result(self) -> Dict[str, Any]:
+        """Résultat au format historique de UnifiedDiscoveryService.auto_sync_all."""
+        result = dict(self.phase_results)
+        result["errors"] = list(self.errors)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "trigger": self.trigger,
+            "status": self.status,
+            "current_phase": self.current_phase,
+            "progress_percent": self.progress_percent(),
+            "phases": {
+                phase: {
+                    **self.phase_progress[phase],
+                    "result": self.phase_results.get(phase)
+                }
+                for phase in self.phases
+            },
+            "errors": list(self.errors),
+            "joined_requests": self.joined_requests,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "duration_seconds": self.duration_seconds,
+        }
+
+
+class SyncJobManager:
+    """
+    Exécute les synchronisations du catalogue hors du chemin des requêtes.
+
+    Une seule synchronisation tourne à la fois. Une demande identique (ou couverte
+    par un job déjà en file ou en cours) rejoint ce job au lieu d'en créer un nouveau.
+    """
+    def __init__(self, history_size: int = 20):
+        self._run_lock = asyncio.Lock()
+        self._jobs: Dict[str, SyncJob] = {}
+        self._active: List[SyncJob] = []
+        self._history: deque = deque(maxlen=history_size)
+
+    def submit(self, kind: str = "all", trigger: str = "manual") -> SyncJob:
+        """Planifie une synchronisation, ou renvoie le job actif qui la couvre déjà."""
+        if kind not in SYNC_KINDS:
+            raise ValueError(f"Unknown sync kind: {kind}")
+
+        for job in self._active:
+            if job.is_active and job.covers(kind):
+                job.joined_requests += 1
+                logger.info(f"Sync request '{kind}' ({trigger}) joined running job {job.id}")
+                return job
+
+        job = SyncJob(kind, trigger)
+        self._jobs[job.id] = job
+        self._active.append(job)
+        job.task = asyncio.create_task(self._run(job))
+        logger.info(f"Sync job {job.id} queued (kind={kind}, trigger={trigger})")
+        return job
+
+    async def wait(self, job: SyncJob) -> SyncJob:
+        """Attend la fin d'un job (sans l'annuler si l'appelant abandonne)."""
+        if job.task is not None:
+            await asyncio.shield(job.task)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[SyncJob]:
+        return self._jobs.get(job_id)
+
+    @property
+    def last_job(self) -> Optional[SyncJob]:
+        if self._active:
+            return self._active[0]
+        return self._history[-1] if self._history else None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "running": [job.to_dict() for job in self._active if job.status == "running"],
+            "queued": [job.to_dict() for job in self._active if job.status == "queued"],
+            "history": [job.to_dict() for job in reversed(self._history)],
+        }
+
+    async def shutdown(self) -> None:
+        """Annule les jobs en attente ou en cours à l'arrêt de l'application."""
+        for job in list(self._active):
+            if job.task is not None and not job.task.done():
+                job.task.cancel()
+        for job in list(self._active):
+            if job.task is not None:
+                try:
+                    await job.task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _run(self, job: SyncJob) -> None:
+        try:
+            async with self._run_lock:
+                job.status = "running"
+                job.started_at = datetime.utcnow()
+                job._started_monotonic = time.monotonic()
+                logger.info(f"Sync job {job.id} started (kind={job.kind})")
+
+                await asyncio.to_thread(self._run_phases, job)
+                if "workflows" in job.phase_results:
+                    await self._push_workflow_definitions(job)
+
+                if not job.errors and not self._row_errors(job.phase_results):
+                    job.status = "completed"
+                elif job.phase_results:
+                    job.status = "partial"
+                else:
+                    job.status = "failed"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.errors.append("cancelled")
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.errors.append(str(e))
+            logger.error(f"Sync job {job.id} failed: {e}")
+        finally:
+            job.current_phase = None
+            job.finished_at = datetime.utcnow()
+            if job._started_monotonic is not None:
+                job._finished_monotonic = time.monotonic()
+            if job in self._active:
+                self._active.remove(job)
+            self._history.append(job)
+            # Ne garder en mémoire que les jobs encore référencés par l'historique
+            kept = {j.id for j in self._history} | {j.id for j in self._active}
+            self._jobs = {job_id: j for job_id, j in self._jobs.items() if job_id in kept}
+            logger.info(f"Sync job {job.id} {job.status} in {job.duration_seconds}s")
+
+    @classmethod
+    def _row_errors(cls, results: Dict[str, Any]) -> int:
+        """Lignes en échec comptées dans les résultats des phases (clés "errors", sous-résultats compris)."""
+        count = 0
+        for key, value in results.items():
+            if isinstance(value, dict):
+                count += cls._row_errors(value)
+            elif key == "errors" and isinstance(value, int):
+                count += value
+        return count
+
+    async def _push_workflow_definitions(self, job: SyncJob) -> None:
+        """Met à jour dans N8N les workflows installés dont la définition a changé."""
+        from app.services.unified_discovery import UnifiedDiscoveryService, WORKFLOW_SYNC_N8N_UPDATES
+
+        if not WORKFLOW_SYNC_N8N_UPDATES:
+            return
+        try:
+            job.phase_results["workflows"]["n8n"] = await UnifiedDiscoveryService().sync_installed_definitions()
+        except Exception as e:
+            job.errors.append(f"workflows (n8n): {e}")
+            logger.error(f"Sync job {job.id} N8N definition update failed: {e}")
+
+    def _run_phases(self, job: SyncJob) -> None:
+        """Exécute les phases du job dans un thread, avec sa propre session DB."""
+        from app.services.unified_discovery import UnifiedDiscoveryService, WORKFLOW_SYNC_MODE
+
+        unified_discovery = UnifiedDiscoveryService()
+        db = SessionLocal()
+        try:
+            for phase in job.phases:
+                job.current_phase = phase
+                on_progress = lambda processed, total, phase=phase: job.report_progress(phase, processed, total)
+                try:
+                    if phase == "crews":
+                        result = unified_discovery.crew_discovery.sync_crews_with_database(db, on_progress=on_progress)
+                    elif WORKFLOW_SYNC_MODE == "streaming":
+                        result = unified_discovery.sync_n8n_workflows_streaming(db, on_progress=on_progress)
+                    else:
+                        result = unified_discovery.sync_n8n_workflows(db, on_progress=on_progress)
+                    job.phase_results[phase] = result
+                except Exception as e:
+                    db.rollback()
+                    job.errors.append(f"{phase}: {e}")
+                    logger.error(f"Sync job {job.id} phase '{phase}' failed: {e}")
+        finally:
+            db.close()
+
+
+sync_manager = SyncJobManager()
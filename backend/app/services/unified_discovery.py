@@ -1,8 +1,9 @@
 # app/services/unified_discovery.py
 import os
 import json
+import asyncio
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from sqlalchemy.orm import Session
 
 from app.services.crew_executor import CrewDiscoveryService
@@ -10,6 +11,13 @@ from app.services.n8n_executor import N8NDiscoveryService
 
 logger = logging.getLogger(__name__)
 
+# Synchronisation des workflows : "streaming" (lots bornés en mémoire) ou "full" (liste complète)
+WORKFLOW_SYNC_MODE = os.getenv("WORKFLOW_SYNC_MODE", "streaming")
+WORKFLOW_SYNC_BATCH_SIZE = int(os.getenv("WORKFLOW_SYNC_BATCH_SIZE", "200"))
+# Après la synchronisation, envoyer à N8N les définitions modifiées des workflows déjà installés
+WORKFLOW_SYNC_N8N_UPDATES = os.getenv("WORKFLOW_SYNC_N8N_UPDATES", "true").lower() == "true"
+WORKFLOW_SYNC_N8N_CONCURRENCY = int(os.getenv("WORKFLOW_SYNC_N8N_CONCURRENCY", "4"))
+
 class UnifiedDiscoveryService:
     """
     Service unifié pour découvrir automatiquement les crews ET les workflows N8N.
@@ -45,9 +53,11 @@ class UnifiedDiscoveryService:
         
         return results
     
-    def sync_n8n_workflows(self, db: Session) -> Dict[str, int]:
+    def sync_n8n_workflows(self, db: Session,
+                           on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
         """
         Synchronise les workflows N8N avec la base de données.
+        `on_progress(processed, total)` est appelé après chaque workflow traité.
         """
         from app.models.workflow import Workflow
         
@@ -55,7 +65,9 @@ class UnifiedDiscoveryService:
         added_count = 0
         updated_count = 0
         
-        for workflow_data in discovered_workflows:
+        for index, workflow_data in enumerate(discovered_workflows, start=1):
+            if on_progress:
+                on_progress(index - 1, len(discovered_workflows))
             try:
                 existing = db.query(Workflow).filter(
                     Workflow.folder_name == workflow_data["folder_name"],
@@ -63,32 +75,13 @@ class UnifiedDiscoveryService:
                 ).first()
                 
                 if existing:
-                    # Mettre à jour si nécessaire (exclure les champs auto-gérés)
-                    excluded_fields = {'created_at', 'updated_at', 'id'}
-                    changed = False
-                    for key, value in workflow_data.items():
-                        if key not in excluded_fields and hasattr(existing, key) and getattr(existing, key) != value:
-                            setattr(existing, key, value)
-                            changed = True
-                    
-                    if changed:
+                    if self._apply_workflow_updates(existing, workflow_data):
                         db.commit()
                         db.refresh(existing)
                         updated_count += 1
                         logger.info(f"Updated N8N workflow: {existing.name}")
                 else:
-                    # Créer nouveau workflow
-                    new_workflow = Workflow(
-                        name=workflow_data["name"],
-                        description=workflow_data["description"],
-                        folder_name=workflow_data["folder_name"],
-                        category=workflow_data["category"],
-                        type="n8n_workflow",
-                        node_count=workflow_data.get("node_count", 0),
-                        integrations=workflow_data.get("integrations", []),
-                        required_credentials=workflow_data.get("required_credentials", []),
-                        is_active=True
-                    )
+                    new_workflow = self._build_workflow(workflow_data)
                     db.add(new_workflow)
                     db.commit()
                     db.refresh(new_workflow)
@@ -98,4 +91,208 @@ class UnifiedDiscoveryService:
             except Exception as e:
                 logger.error(f"Error syncing workflow {workflow_data.get('folder_name', 'unknown')}: {e}")
         
-        return {"added": added_count, "updated": updated_count, "total": len(discovered_workflows)}
\ No newline at end of file
+        if on_progress:
+            on_progress(len(discovered_workflows), len(discovered_workflows))
+        
+        return {"added": added_count, "updated": updated_count, "total": len(discovered_workflows)}
+
+    def sync_n8n_workflows_streaming(self, db: Session,
+                                     batch_size: Optional[int] = None,
+                                     on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        Synchronise les workflows N8N par lots de taille fixe, en consommant la
+        découverte comme un générateur : un commit par lot, puis la session est
+        vidée, de sorte que la mémoire reste bornée quelle que soit la taille du catalogue.
+        """
+        batch_size = batch_size or WORKFLOW_SYNC_BATCH_SIZE
+        # Comptage des dossiers seulement (noms), pour la progression
+        total_expected = self.n8n_discovery.count_workflow_folders() if on_progress else 0
+        counts = {"added": 0, "updated": 0, "total": 0, "batches": 0, "errors": 0}
+        
+        batch: List[Dict[str, Any]] = []
+        for workflow_data in self.n8n_discovery.iter_workflows():
+            batch.append(workflow_data)
+            if len(batch) >= batch_size:
+                self._upsert_workflow_batch(db, batch, counts)
+                batch = []
+                if on_progress:
+                    on_progress(counts["total"], max(total_expected, counts["total"]))
+        
+        if batch:
+            self._upsert_workflow_batch(db, batch, counts)
+        
+        if on_progress:
+            on_progress(counts["total"], counts["total"])
+        
+        logger.info(f"Streaming workflow sync: {counts['total']} workflows in {counts['batches']} batches")
+        return counts
+    
+    def _upsert_workflow_batch(self, db: Session, batch: List[Dict[str, Any]], counts: Dict[str, int]) -> None:
+        """
+        Insère ou met à jour un lot de workflows avec une seule requête de lecture et un seul commit.
+        Un workflow invalide est ignoré seul ; si le commit du lot échoue, le lot est
+        repris workflow par workflow pour ne perdre que les lignes en erreur.
+        """
+        from app.models.workflow import Workflow
+        
+        folder_names = [workflow_data.get("folder_name") for workflow_data in batch]
+        try:
+            existing_by_folder = {
+                workflow.folder_name: workflow
+                for workflow in db.query(Workflow).filter(
+                    Workflow.folder_name.in_(folder_names),
+                    Workflow.type == "n8n_workflow"
+                )
+            }
+            
+            added = updated = 0
+            for folder_name, workflow_data in zip(folder_names, batch):
+                existing = None
+                try:
+                    existing = existing_by_folder.get(folder_name)
+                    if existing:
+                        if self._apply_workflow_updates(existing, workflow_data):
+                            updated += 1
+                    else:
+                        db.add(self._build_workflow(workflow_data))
+                        added += 1
+                except Exception as e:
+                    counts["errors"] += 1
+                    logger.error(f"Error syncing workflow {folder_name or 'unknown'}: {e}")
+                    # Annuler les modifications partielles de la ligne en erreur
+                    if existing is not None:
+                        db.expire(existing)
+            
+            db.commit()
+            counts["added"] += added
+            counts["updated"] += updated
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Workflow batch ({folder_names[0]} .. {folder_names[-1]}) failed, retrying one by one: {e}")
+            db.expunge_all()
+            self._upsert_workflows_one_by_one(db, batch, counts)
+        finally:
+            # Libérer les objets du lot : la session ne garde rien entre deux lots
+            db.expunge_all()
+            counts["total"] += len(batch)
+            counts["batches"] += 1
+    
+    def _upsert_workflows_one_by_one(self, db: Session, batch: List[Dict[str, Any]], counts: Dict[str, int]) -> None:
+        """Reprise d'un lot en échec : un commit par workflow, seules les lignes fautives sont perdues."""
+        from app.models.workflow import Workflow
+        
+        for workflow_data in batch:
+            try:
+                existing = db.query(Workflow).filter(
+                    Workflow.folder_name == workflow_data["folder_name"],
+                    Workflow.type == "n8n_workflow"
+                ).first()
+                if existing:
+                    if self._apply_workflow_updates(existing, workflow_data):
+                        db.commit()
+                        counts["updated"] += 1
+                else:
+                    db.add(self._build_workflow(workflow_data))
+                    db.commit()
+                    counts["added"] += 1
+            except Exception as e:
+                db.rollback()
+                counts["errors"] += 1
+                logger.error(f"Error syncing workflow {workflow_data.get('folder_name', 'unknown')}: {e}")
+    
+    async def sync_installed_definitions(self) -> Dict[str, int]:
+        """
+        Envoie à N8N les définitions modifiées des workflows du catalogue déjà installés.
+        Les hashes sont comparés localement : seuls les workflows changés donnent lieu
+        à un appel N8N (une mise à jour chacun). Les workflows jamais exécutés restent
+        installés à la demande.
+        """
+        from app.services.n8n_backends import n8n_backends
+        from app.services.n8n_executor import workflow_definition_hash
+
+        executor = n8n_backends.executor()
+        installed = await asyncio.to_thread(self._installed_catalog_workflows)
+
+        def changed_folders() -> List[str]:
+            changed = []
+            for folder_name, definition_hash in installed:
+                try:
+                    definition, _ = executor.load_definition(folder_name)
+                except FileNotFoundError:
+                    continue
+                if workflow_definition_hash(definition) != definition_hash:
+                    changed.append(folder_name)
+            return changed
+
+        changed = await asyncio.to_thread(changed_folders)
+        counts = {"installed": len(installed), "unchanged": len(installed) - len(changed),
+                  "updated": 0, "reinstalled": 0, "errors": 0}
+        semaphore = asyncio.Semaphore(WORKFLOW_SYNC_N8N_CONCURRENCY)
+
+        async def push(folder_name: str) -> None:
+            async with semaphore:
+                try:
+                    result = await executor.sync_workflow_definition(folder_name)
+                    if result["action"] == "updated":
+                        counts["updated"] += 1
+                    elif result["action"] == "installed":
+                        counts["reinstalled"] += 1
+                    else:
+                        counts["unchanged"] += 1
+                except Exception as e:
+                    counts["errors"] += 1
+                    logger.error(f"Error updating N8N workflow '{folder_name}': {e}")
+
+        await asyncio.gather(*(push(folder_name) for folder_name in changed))
+        if changed:
+            logger.info(f"N8N workflow definitions: {counts['updated']} updated, {counts['reinstalled']} reinstalled")
+        return counts
+
+    def _installed_catalog_workflows(self) -> List[tuple]:
+        """(dossier, hash installé) des workflows du catalogue présents dans N8N."""
+        from app.database.database import SessionLocal
+        from app.models.workflow import Workflow
+
+        db = SessionLocal()
+        try:
+            return [
+                (row.folder_name, row.n8n_definition_hash) for row in db.query(
+                    Workflow.folder_name, Workflow.n8n_definition_hash
+                ).filter(
+                    Workflow.type == "n8n_workflow",
+                    Workflow.category != "Cloned",
+                    Workflow.n8n_workflow_id.isnot(None)
+                )
+            ]
+        finally:
+            db.close()
+
+    def _apply_workflow_updates(self, existing, workflow_data: Dict[str, Any]) -> bool:
+        """
+        Met à jour un workflow existant si nécessaire (exclure les champs auto-gérés).
+        """
+        excluded_fields = {'created_at', 'updated_at', 'id'}
+        changed = False
+        for key, value in workflow_data.items():
+            if key not in excluded_fields and hasattr(existing, key) and getattr(existing, key) != value:
+                setattr(existing, key, value)
+                changed = True
+        return changed
+    
+    def _build_workflow(self, workflow_data: Dict[str, Any]):
+        """
+        Construit un nouveau Workflow à partir des métadonnées découvertes.
+        """
+        from app.models.workflow import Workflow
+        
+        return Workflow(
+            name=workflow_data["name"],
+            description=workflow_data["description"],
+            folder_name=workflow_data["folder_name"],
+            category=workflow_data["category"],
+            type="n8n_workflow",
+            node_count=workflow_data.get("node_count", 0),
+            integrations=workflow_data.get("integrations", []),
+            required_credentials=workflow_data.get("required_credentials", []),
+            is_active=True
+        )
@@ -0,0 +1,259 @@
+# app/services/workflow_reconciler.py
+"""
+Réconciliation périodique entre les workflows N8N et la table `workflows`.
+
+Les suppressions N8N qui échouent et les clonages interrompus laissent des workflows
+orphelins d'un côté ou de l'autre. Un passage liste les workflows N8N page par page
+(identifiant, nom, état seulement), charge les lignes du backend en une requête,
+puis compare les deux ensembles :
+
+    orphelins N8N      workflow géré par l'application (nom de clone ou de workflow
+                       du catalogue) sans ligne en base : désactivé ou supprimé par lots
+    manquants dans N8N ligne dont le workflow N8N n'existe plus : l'association des
+                       workflows du catalogue est oubliée (réinstallation à la demande),
+                       les clones sont signalés
+    écarts d'état      `is_active` différent de l'état N8N (signalés)
+
+Les workflows N8N récents (clonage en cours, ligne pas encore écrite) et ceux qui ne
+sont pas gérés par l'application ne sont jamais modifiés.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List
+
+from app.database.database import SessionLocal
+from app.services.n8n_backends import n8n_backends
+from app.services.execution_tracker import _parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_ENABLED = os.getenv("RECONCILE_ENABLED", "true").lower() == "true"
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "3600"))
+RECONCILE_ORPHAN_ACTION = os.getenv("RECONCILE_ORPHAN_ACTION", "deactivate")  # "deactivate", "delete" ou "report"
+RECONCILE_PAGE_SIZE = int(os.getenv("RECONCILE_PAGE_SIZE", "250"))
+RECONCILE_BATCH_SIZE = int(os.getenv("RECONCILE_BATCH_SIZE", "20"))
+RECONCILE_GRACE_SECONDS = float(os.getenv("RECONCILE_GRACE_SECONDS", "900"))
+RECONCILE_MAX_ACTIONS = int(os.getenv("RECONCILE_MAX_ACTIONS", "500"))
+# Au-delà de cette part d'orphelins, la base ne correspond probablement pas à ce N8N : rien n'est modifié
+RECONCILE_MAX_ORPHAN_RATIO = float(os.getenv("RECONCILE_MAX_ORPHAN_RATIO", "0.5"))
+
+# Nom donné aux clones par N8NExecutorService._personalize_template
+CLONE_NAME_PATTERN = re.compile(r" - User \d+$")
+
+
+class WorkflowReconciler:
+    """
+    Compare les workflows d'un backend N8N avec la table `workflows` et corrige les écarts.
+    """
+    def __init__(self, backend_name: Optional[str] = None,
+                 interval: float = RECONCILE_INTERVAL,
+                 orphan_action: str = RECONCILE_ORPHAN_ACTION):
+        if orphan_action not in ("deactivate", "delete", "report"):
+            raise ValueError(f"Unknown orphan action: {orphan_action}")
+        self.backend = n8n_backends.get(backend_name)
+        self.executor = n8n_backends.executor(self.backend.name)
+        self.interval = interval
+        self.orphan_action = orphan_action
+        self._task: Optional[asyncio.Task] = None
+        self._run_lock = asyncio.Lock()
+        self._stats = {"runs": 0, "deactivated": 0, "deleted": 0, "mappings_cleared": 0, "errors": 0}
+        self._last_report: Optional[Dict[str, Any]] = None
+        self._last_error: Optional[str] = None
+
+    async def start(self) -> None:
+        if not RECONCILE_ENABLED:
+            logger.info("N8N workflow reconciliation disabled")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"N8N workflow reconciliation started for {self.backend.name} (every {self.interval}s)")
+
+    async def stop(self) -> None:
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+        self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if not n8n_backends.is_available(self.backend.name):
+                continue
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                self._last_error = str(e)
+                logger.warning(f"N8N workflow reconciliation failed for {self.backend.name}: {e}")
+
+    async def run_once(self, dry_run: bool = False) -> Dict[str, Any]:
+        """Un passage complet ; avec `dry_run`, les écarts sont mesurés sans rien modifier."""
+        async with self._run_lock:
+            started = time.monotonic()
+            remote = await self._list_remote()
+            rows, catalog_names = await asyncio.to_thread(self._load_rows)
+
+            known_ids = {row["n8n_workflow_id"] for row in rows}
+            grace_limit = time.time() - RECONCILE_GRACE_SECONDS
+            orphans, unmanaged, recent = [], 0, 0
+            for workflow_id, workflow in remote.items():
+                if workflow_id in known_ids:
+                    continue
+                name = workflow.get("name") or ""
+                if not (CLONE_NAME_PATTERN.search(name) or name in catalog_names):
+                    unmanaged += 1
+                    continue
+                created_at = _parse_timestamp(workflow.get("createdAt"))
+                if created_at is not None and created_at.replace(tzinfo=timezone.utc).timestamp() > grace_limit:
+                    recent += 1
+                    continue
+                orphans.append(workflow)
+
+            missing = [row for row in rows if row["n8n_workflow_id"] not in remote]
+            active_mismatch = sum(
+                1 for row in rows
+                if row["n8n_workflow_id"] in remote and row["category"] == "Cloned"
+                and bool(row["is_active"]) != bool(remote[row["n8n_workflow_id"]].get("active"))
+            )
+
+            report = {
+                "backend": self.backend.name,
+                "dry_run": dry_run,
+                "n8n_workflows": len(remote),
+                "db_workflows": len(rows),
+                "orphans_in_n8n": len(orphans),
+                "orphans_recent": recent,
+                "unmanaged_in_n8n": unmanaged,
+                "missing_in_n8n": len(missing),
+                "missing_clones": sum(1 for row in missing if row["category"] == "Cloned"),
+                "active_mismatch": active_mismatch,
+                "deactivated": 0,
+                "deleted": 0,
+                "mappings_cleared": 0,
+                "action_errors": 0,
+                "skipped_reason": None,
+            }
+
+            managed = len(orphans) + len(known_ids & set(remote))
+            if not dry_run and self.orphan_action != "report" and orphans:
+                if managed and len(orphans) / managed > RECONCILE_MAX_ORPHAN_RATIO:
+                    report["skipped_reason"] = (
+                        f"{len(orphans)} orphans out of {managed} managed workflows exceeds "
+                        f"RECONCILE_MAX_ORPHAN_RATIO={RECONCILE_MAX_ORPHAN_RATIO}"
+                    )
+                    logger.warning(f"N8N reconciliation on {self.backend.name} left orphans untouched: {report['skipped_reason']}")
+                else:
+                    await self._handle_orphans(orphans[:RECONCILE_MAX_ACTIONS], report)
+
+            if not dry_run:
+                catalog_missing = [row["folder_name"] for row in missing if row["category"] != "Cloned"]
+                if catalog_missing:
+                    await asyncio.to_thread(self._clear_mappings, catalog_missing)
+                    report["mappings_cleared"] = len(catalog_missing)
+
+            report["duration_seconds"] = round(time.monotonic() - started, 3)
+            report["finished_at"] = datetime.utcnow().isoformat()
+            self._stats["runs"] += 1
+            self._stats["deactivated"] += report["deactivated"]
+            self._stats["deleted"] += report["deleted"]
+            self._stats["mappings_cleared"] += report["mappings_cleared"]
+            self._last_report = report
+            if orphans or missing or active_mismatch:
+                logger.info(
+                    f"N8N reconciliation on {self.backend.name}: {len(orphans)} orphans "
+                    f"({report['deactivated']} deactivated, {report['deleted']} deleted), "
+                    f"{len(missing)} missing in N8N, {active_mismatch} active mismatches"
+                )
+            return report
+
+    async def _list_remote(self) -> Dict[str, Dict[str, Any]]:
+        """Tous les workflows du backend, page par page, réduits à id/nom/état/création."""
+        remote: Dict[str, Dict[str, Any]] = {}
+        cursor = None
+        while True:
+            page = await self.executor.list_workflows(cursor=cursor, limit=RECONCILE_PAGE_SIZE)
+            for workflow in page.get("data", []):
+                remote[str(workflow["id"])] = {
+                    "id": str(workflow["id"]),
+                    "name": workflow.get("name"),
+                    "active": workflow.get("active"),
+                    "createdAt": workflow.get("createdAt"),
+                }
+            cursor = page.get("nextCursor")
+            if not cursor:
+                return remote
+
+    def _load_rows(self):
+        """Lignes du backend ayant un ID N8N, et noms des workflows du catalogue (une requête)."""
+        from app.models.workflow import Workflow
+
+        db = SessionLocal()
+        try:
+            rows, catalog_names = [], set()
+            for row in db.query(
+                Workflow.folder_name, Workflow.name, Workflow.category, Workflow.is_active, Workflow.n8n_workflow_id
+            ).filter(n8n_backends.workflow_filter(self.backend.name), Workflow.n8n_workflow_id.isnot(None)):
+                rows.append({
+                    "folder_name": row.folder_name,
+                    "category": row.category,
+                    "is_active": row.is_active,
+                    "n8n_workflow_id": str(row.n8n_workflow_id),
+                })
+                if row.category != "Cloned":
+                    catalog_names.add(row.name)
+            return rows, catalog_names
+        finally:
+            db.close()
+
+    async def _handle_orphans(self, orphans: List[Dict[str, Any]], report: Dict[str, Any]) -> None:
+        """Désactive ou supprime les orphelins par lots de RECONCILE_BATCH_SIZE appels parallèles."""
+        async def handle(workflow: Dict[str, Any]) -> Optional[str]:
+            try:
+                if self.orphan_action == "delete":
+                    await self.executor.delete_workflow(workflow["id"])
+                    return "deleted"
+                if workflow.get("active"):
+                    await self.executor.toggle_workflow(workflow["id"], False)
+                    return "deactivated"
+                return None
+            except Exception as e:
+                if getattr(e, "status", None) == 404:
+                    return None
+                logger.warning(f"N8N reconciliation could not handle orphan {workflow['id']}: {e}")
+                return "error"
+
+        for start in range(0, len(orphans), RECONCILE_BATCH_SIZE):
+            batch = orphans[start:start + RECONCILE_BATCH_SIZE]
+            for outcome in await asyncio.gather(*(handle(workflow) for workflow in batch)):
+                if outcome == "error":
+                    report["action_errors"] += 1
+                elif outcome:
+                    report[outcome] += 1
+
+    def _clear_mappings(self, folder_names: List[str]) -> None:
+        for folder_name in folder_names:
+            self.executor.forget_workflow_id(folder_name)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.name,
+            "enabled": RECONCILE_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "orphan_action": self.orphan_action,
+            "last_report": self._last_report,
+            "last_error": self._last_error,
+            **self._stats,
+        }
+
+
+# Un passage de réconciliation par backend N8N
+workflow_reconcilers: Dict[str, WorkflowReconciler] = {
+    name: WorkflowReconciler(name) for name in n8n_backends.backends
+}
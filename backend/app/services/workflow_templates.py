@@ -0,0 +1,134 @@
+# app/services/workflow_templates.py
+"""
+Templates de workflows N8N compilés.
+
+Un template est parsé une seule fois : la compilation repère l'emplacement de chaque
+`{{PLACEHOLDER}}` (identifiant en majuscules) dans les chaînes du JSON. Le rendu ne
+reconstruit que les conteneurs situés sur le chemin d'un placeholder et partage le
+reste de la structure, sans sérialiser ni reparser le template.
+
+Les expressions N8N (`{{ $json.x }}`, `={{$now}}`) ne sont pas des placeholders.
+"""
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, Any, List, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_PATTERN = re.compile(r"\{\{([A-Z][A-Z0-9_]*)\}\}")
+CREDENTIAL_PREFIX = "CREDENTIAL_ID_"
+
+JSONPath = Tuple[Union[str, int], ...]
+
+
+def credential_placeholder(service: str) -> str:
+    """
+    Nom du placeholder de credential d'un service, quelle que soit l'écriture du service :
+    "gmail" -> CREDENTIAL_ID_GMAIL, "googleDrive" / "google-drive" -> CREDENTIAL_ID_GOOGLE_DRIVE.
+    """
+    snake = re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", service)
+    return CREDENTIAL_PREFIX + re.sub(r"[^A-Za-z0-9]+", "_", snake).upper()
+
+
+class _StringSlot:
+    __slots__ = ("parts",)
+
+    def __init__(self, parts: List[str]):
+        # re.split avec un groupe : littéraux aux indices pairs, noms aux indices impairs
+        self.parts = parts
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self.parts
+        if len(parts) == 3 and not parts[0] and not parts[2]:
+            return values.get(parts[1], "{{" + parts[1] + "}}")
+        return "".join(
+            part if index % 2 == 0 else values.get(part, "{{" + part + "}}")
+            for index, part in enumerate(parts)
+        )
+
+
+class _ContainerSlot:
+    __slots__ = ("node", "children")
+
+    def __init__(self, node: Union[Dict, List], children: Dict[Union[str, int], Any]):
+        self.node = node
+        self.children = children
+
+    def render(self, values: Dict[str, str]) -> Union[Dict, List]:
+        copy = dict(self.node) if isinstance(self.node, dict) else list(self.node)
+        for key, slot in self.children.items():
+            copy[key] = slot.render(values)
+        return copy
+
+
+def _compile(node: Any, path: JSONPath, locations: List[Tuple[JSONPath, str]]):
+    if isinstance(node, str):
+        parts = PLACEHOLDER_PATTERN.split(node)
+        if len(parts) == 1:
+            return None
+        locations.extend((path, name) for name in parts[1::2])
+        return _StringSlot(parts)
+    if isinstance(node, dict):
+        items = node.items()
+    elif isinstance(node, list):
+        items = enumerate(node)
+    else:
+        return None
+    children = {}
+    for key, value in items:
+        slot = _compile(value, path + (key,), locations)
+        if slot is not None:
+            children[key] = slot
+    return _ContainerSlot(node, children) if children else None
+
+
+class CompiledTemplate:
+    """
+    Template parsé une fois, avec l'emplacement de tous ses placeholders.
+    """
+    def __init__(self, source: Dict[str, Any]):
+        self.source = source
+        self.locations: List[Tuple[JSONPath, str]] = []
+        self._root = _compile(source, (), self.locations)
+        self.placeholders = sorted({name for _, name in self.locations})
+
+    def render(self, values: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Rend le template en une passe. Les placeholders sans valeur restent tels quels.
+        Les sous-structures sans placeholder sont partagées avec le template source :
+        le résultat ne doit pas être modifié en profondeur.
+        """
+        if self._root is None:
+            return dict(self.source)
+        return self._root.render(values)
+
+    def missing(self, values: Dict[str, str]) -> List[str]:
+        return [name for name in self.placeholders if name not in values]
+
+
+def credential_values(credential_map: Dict[str, Any]) -> Dict[str, str]:
+    """Valeurs des placeholders CREDENTIAL_ID_* depuis un mapping service -> ID de credential."""
+    return {credential_placeholder(service): str(cred_id) for service, cred_id in credential_map.items()
+            if cred_id is not None}
+
+
+_cache: Dict[str, Tuple[float, CompiledTemplate]] = {}
+_cache_lock = threading.Lock()
+
+
+def load_template(template_path: str) -> CompiledTemplate:
+    """Template compilé, mis en cache jusqu'à modification du fichier."""
+    mtime = os.path.getmtime(template_path)
+    with _cache_lock:
+        cached = _cache.get(template_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(template_path, 'r', encoding='utf-8') as f:
+        compiled = CompiledTemplate(json.load(f))
+    with _cache_lock:
+        _cache[template_path] = (mtime, compiled)
+    logger.info(f"Compiled workflow template {template_path} ({len(compiled.locations)} placeholders)")
+    return compiled
@@ -0,0 +1,179 @@
+"""
+Benchmark de débit des routers workflows contre le faux N8N.
+
+Démarre `benchmarks.fake_n8n` en local, puis envoie des requêtes authentifiées aux
+vrais routers FastAPI (en ASGI, sans serveur HTTP) pour trois scénarios :
+
+    clone    POST  /store/workflows/{template}/clone     (un utilisateur par clone)
+    execute  POST  /workflows/instances/{id}/execute
+    toggle   PATCH /workflows/instances/{id}
+
+et affiche débit, taux d'erreur et latences p50/p95/p99. La base SQLite est créée
+dans un dossier temporaire.
+
+Usage (depuis backend/) :
+    python -m benchmarks.executor_throughput --requests 500 --concurrency 20 --latency-ms 15 --jitter-ms 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name: str, requests: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    """Envoie les requêtes avec au plus `concurrency` en vol ; mesure chaque latence."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+
+    async def send(request: Dict[str, Any]) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(request["method"], request["url"], json=request.get("json"))
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(request) for request in requests))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "scenario": name,
+        "requests": len(requests),
+        "seconds": elapsed,
+        "throughput": len(requests) / elapsed if elapsed else 0.0,
+        "errors": errors,
+        "statuses": statuses,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def benchmark(args) -> List[Dict[str, Any]]:
+    import httpx
+    from benchmarks.fake_n8n import FakeN8NConfig, start_fake_n8n
+
+    fake, runner = await start_fake_n8n(port=args.port, config=FakeN8NConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+        execute_latency_ms=args.execute_latency_ms, seed=42,
+    ))
+
+    # Imports après la configuration : les routers créent leurs services à l'import
+    from app.main import app
+    from app.database.database import Base, engine, SessionLocal
+    from app.core.security import create_access_token
+    from app.models.user import User
+    from app.models.workflow import Workflow
+    from app.services.http_client import http_pool
+
+    Base.metadata.create_all(bind=engine)
+    await http_pool.start()
+
+    db = SessionLocal()
+    # Authentification par token uniquement : le mot de passe n'est jamais vérifié
+    hashed_password = "!benchmark"
+    users = [
+        User(username=f"bench_{index}", email=f"bench_{index}@example.com", hashed_password=hashed_password)
+        for index in range(args.requests)
+    ]
+    db.add_all(users)
+    db.commit()
+    user_ids = [user.id for user in users]
+    db.close()
+    token = create_access_token({"sub": "bench_0"})
+
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                 headers={"Authorization": f"Bearer {token}"}, timeout=60) as client:
+        # Le clonage prépare aussi les instances des scénarios execute et toggle
+        clone_requests = [
+            {"method": "POST", "url": f"/store/workflows/{args.template}/clone", "json": {"userId": str(user_id)}}
+            for user_id in user_ids
+        ]
+        clone_result = await run_scenario(client, "clone", clone_requests, args.concurrency)
+        if "clone" in args.scenarios:
+            results.append(clone_result)
+
+        db = SessionLocal()
+        instance_ids = [row.id for row in db.query(Workflow.id).filter(Workflow.category == "Cloned")]
+        db.close()
+        if not instance_ids:
+            raise RuntimeError(f"No clone succeeded, statuses: {clone_result['statuses']}")
+
+        if "execute" in args.scenarios:
+            execute_requests = [
+                {"method": "POST", "url": f"/workflows/instances/{instance_ids[index % len(instance_ids)]}/execute"}
+                for index in range(args.requests)
+            ]
+            results.append(await run_scenario(client, "execute", execute_requests, args.concurrency))
+
+        if "toggle" in args.scenarios:
+            toggle_requests = [
+                {"method": "PATCH", "url": f"/workflows/instances/{instance_ids[index % len(instance_ids)]}",
+                 "json": {"active": index % 2 == 0}}
+                for index in range(args.requests)
+            ]
+            results.append(await run_scenario(client, "toggle", toggle_requests, args.concurrency))
+
+    await http_pool.close()
+    await runner.cleanup()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--scenarios", nargs="+", default=["clone", "execute", "toggle"],
+                        choices=["clone", "execute", "toggle"])
+    parser.add_argument("--template", default="simple_test")
+    parser.add_argument("--port", type=int, default=5798)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--execute-latency-ms", type=float, default=None)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    # Base SQLite et fichiers générés dans un dossier jetable
+    work_dir = tempfile.mkdtemp(prefix="divert_bench_")
+    os.environ["N8N_API_URL"] = f"http://127.0.0.1:{args.port}/api/v1"
+    os.environ["EXECUTION_TRACKER_ENABLED"] = "false"
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(work_dir)
+
+    try:
+        results = asyncio.run(benchmark(args))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'scenario':>10} {'requests':>9} {'req/s':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for result in results:
+        print(
+            f"{result['scenario']:>10} {result['requests']:>9} {result['throughput']:>9.1f} {result['errors']:>7} "
+            f"{result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} {result['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
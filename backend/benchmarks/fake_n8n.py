@@ -0,0 +1,314 @@
+"""
+Serveur N8N de substitution pour les tests de charge et le développement local.
+
+Implémente, en mémoire, les endpoints de l'API N8N utilisés par le backend :
+workflows (CRUD, activate, deactivate, execute), executions (liste paginée par
+curseur, détail), webhooks des workflows actifs et /healthz. La latence et les pannes sont configurables au
+démarrage ou à chaud via /__fake/config ; /__fake/stats donne les compteurs.
+
+Usage (depuis backend/) :
+    python -m benchmarks.fake_n8n --port 5678 --latency-ms 20 --jitter-ms 10 --failure-rate 0.01
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from aiohttp import web
+
+
+class FakeN8NConfig:
+    """
+    Latence simulée (moyenne + jitter uniforme) et injection de pannes.
+    `failure_rate` s'applique aux routes de l'API (pas à /healthz ni /__fake).
+    """
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, failure_rate: float = 0.0,
+                 failure_status: int = 503, execute_latency_ms: Optional[float] = None,
+                 items_per_execution: int = 1, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.execute_latency_ms = execute_latency_ms
+        self.items_per_execution = items_per_execution
+        self.random = random.Random(seed)
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for key in ("latency_ms", "jitter_ms", "failure_rate", "failure_status",
+                    "execute_latency_ms", "items_per_execution"):
+            if key in values:
+                setattr(self, key, values[key])
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "failure_rate": self.failure_rate,
+            "failure_status": self.failure_status,
+            "execute_latency_ms": self.execute_latency_ms,
+            "items_per_execution": self.items_per_execution,
+        }
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class FakeN8N:
+    """
+    État en mémoire du faux N8N et application aiohttp correspondante.
+    """
+    def __init__(self, config: Optional[FakeN8NConfig] = None, api_key: Optional[str] = None):
+        self.config = config or FakeN8NConfig()
+        self.api_key = api_key
+        self.workflows: Dict[str, Dict[str, Any]] = {}
+        self.executions: Dict[int, Dict[str, Any]] = {}
+        self._workflow_ids = itertools.count(1)
+        self._execution_ids = itertools.count(1)
+        self.stats = Counter()
+
+    # ------------------------------------------------------------------ middleware
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        if request.path.startswith("/__fake") or request.path == "/healthz":
+            return await handler(request)
+
+        resource = request.match_info.route.resource
+        self.stats[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+        config = self.config
+        latency = config.latency_ms
+        if config.execute_latency_ms is not None and request.path.endswith("/execute"):
+            latency = config.execute_latency_ms
+        delay = max(0.0, latency + config.random.uniform(-config.jitter_ms, config.jitter_ms))
+        if delay:
+            await asyncio.sleep(delay / 1000)
+
+        if self.api_key and request.headers.get("X-N8N-API-KEY") != self.api_key:
+            return web.json_response({"message": "unauthorized"}, status=401)
+        if config.failure_rate and config.random.random() < config.failure_rate:
+            self.stats["injected_failures"] += 1
+            return web.json_response({"message": "injected failure"}, status=config.failure_status)
+        return await handler(request)
+
+    def make_app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware], client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/healthz", self.healthz)
+        app.router.add_get("/api/v1/workflows", self.list_workflows)
+        app.router.add_post("/api/v1/workflows", self.create_workflow)
+        app.router.add_get("/api/v1/workflows/{id}", self.get_workflow)
+        app.router.add_put("/api/v1/workflows/{id}", self.update_workflow)
+        app.router.add_delete("/api/v1/workflows/{id}", self.delete_workflow)
+        app.router.add_post("/api/v1/workflows/{id}/activate", self.activate)
+        app.router.add_post("/api/v1/workflows/{id}/deactivate", self.deactivate)
+        app.router.add_post("/api/v1/workflows/{id}/execute", self.execute)
+        app.router.add_get("/api/v1/executions", self.list_executions)
+        app.router.add_get("/api/v1/executions/{id}", self.get_execution)
+        app.router.add_route("*", "/webhook/{path:.*}", self.webhook)
+        app.router.add_get("/__fake/config", self.get_config)
+        app.router.add_post("/__fake/config", self.set_config)
+        app.router.add_get("/__fake/stats", self.get_stats)
+        return app
+
+    # ------------------------------------------------------------------ helpers
+
+    def _workflow_or_404(self, request: web.Request) -> Dict[str, Any]:
+        workflow = self.workflows.get(request.match_info["id"])
+        if workflow is None:
+            raise web.HTTPNotFound(text=json.dumps({"message": "Not Found"}), content_type="application/json")
+        return workflow
+
+    @staticmethod
+    def _page(items, request: web.Request, key):
+        """Pagination par curseur : éléments triés par clé décroissante, curseur = dernière clé vue."""
+        limit = int(request.query.get("limit", "100"))
+        cursor = request.query.get("cursor")
+        if cursor is not None:
+            items = [item for item in items if key(item) < int(cursor)]
+        page = items[:limit]
+        next_cursor = str(key(page[-1])) if len(items) > limit else None
+        return page, next_cursor
+
+    # ------------------------------------------------------------------ workflows
+
+    async def healthz(self, request: web.Request):
+        return web.json_response({"status": "ok"})
+
+    async def list_workflows(self, request: web.Request):
+        workflows = sorted(self.workflows.values(), key=lambda w: int(w["id"]), reverse=True)
+        if "active" in request.query:
+            active = request.query["active"] == "true"
+            workflows = [w for w in workflows if w["active"] == active]
+        if "name" in request.query:
+            workflows = [w for w in workflows if w.get("name") == request.query["name"]]
+        page, next_cursor = self._page(workflows, request, lambda w: int(w["id"]))
+        return web.json_response({"data": page, "nextCursor": next_cursor})
+
+    async def create_workflow(self, request: web.Request):
+        body = await request.json()
+        workflow_id = str(next(self._workflow_ids))
+        now = _now()
+        workflow = {**body, "id": workflow_id, "active": False, "createdAt": now, "updatedAt": now}
+        self.workflows[workflow_id] = workflow
+        return web.json_response(workflow, status=201)
+
+    async def get_workflow(self, request: web.Request):
+        return web.json_response(self._workflow_or_404(request))
+
+    async def update_workflow(self, request: web.Request):
+        workflow = self._workflow_or_404(request)
+        body = await request.json()
+        workflow.update({key: value for key, value in body.items() if key not in ("id", "active", "createdAt")})
+        workflow["updatedAt"] = _now()
+        return web.json_response(workflow)
+
+    async def delete_workflow(self, request: web.Request):
+        workflow = self._workflow_or_404(request)
+        del self.workflows[workflow["id"]]
+        return web.json_response(workflow)
+
+    async def activate(self, request: web.Request):
+        workflow = self._workflow_or_404(request)
+        workflow["active"] = True
+        return web.json_response(workflow)
+
+    async def deactivate(self, request: web.Request):
+        workflow = self._workflow_or_404(request)
+        workflow["active"] = False
+        return web.json_response(workflow)
+
+    async def execute(self, request: web.Request):
+        workflow = self._workflow_or_404(request)
+        body = await request.json() if request.can_read_body else {}
+        execution = self._record_execution(workflow, mode="manual", inputs=body)
+        return web.json_response({"executionId": str(execution["id"]), "data": execution["data"]})
+
+    def _find_webhook(self, method: str, path: str) -> Optional[tuple]:
+        """(workflow, nœud) du webhook enregistré pour ce chemin : seuls les workflows actifs en ont."""
+        for workflow in self.workflows.values():
+            if not workflow["active"]:
+                continue
+            for node in workflow.get("nodes", []):
+                parameters = node.get("parameters") or {}
+                if (node.get("type") == "n8n-nodes-base.webhook"
+                        and str(parameters.get("path", "")).strip("/") == path.strip("/")
+                        and parameters.get("httpMethod", "GET") == method):
+                    return workflow, node
+        return None
+
+    async def webhook(self, request: web.Request):
+        found = self._find_webhook(request.method, request.match_info["path"])
+        if found is None:
+            return web.json_response({"message": "The requested webhook is not registered."}, status=404)
+        workflow, node = found
+        body = await request.json() if request.can_read_body else {}
+        execution = self._record_execution(workflow, mode="webhook", inputs=body)
+        # Mode par défaut de N8N : réponse immédiate, exécution en arrière-plan
+        if (node.get("parameters") or {}).get("responseMode", "onReceived") == "onReceived":
+            return web.json_response({"message": "Workflow was started"})
+        run_data = execution["data"]["resultData"]["runData"]
+        items = next(iter(run_data.values()))[0]["data"]["main"][0]
+        return web.json_response(items[-1]["json"] if items else {})
+
+    def _record_execution(self, workflow: Dict[str, Any], mode: str, inputs: Any) -> Dict[str, Any]:
+        execution_id = next(self._execution_ids)
+        node_name = (workflow.get("nodes") or [{"name": "Start"}])[-1].get("name", "Start")
+        items = [{"json": {"index": index, "inputs": inputs}} for index in range(self.config.items_per_execution)]
+        now = _now()
+        execution = {
+            "id": execution_id,
+            "workflowId": workflow["id"],
+            "mode": mode,
+            "status": "success",
+            "finished": True,
+            "startedAt": now,
+            "stoppedAt": now,
+            "data": {"resultData": {"runData": {node_name: [{"data": {"main": [items]}}]}}},
+        }
+        self.executions[execution_id] = execution
+        return execution
+
+    # ------------------------------------------------------------------ executions
+
+    @staticmethod
+    def _execution_view(execution: Dict[str, Any], include_data: bool) -> Dict[str, Any]:
+        view = {key: value for key, value in execution.items() if key != "data"}
+        view["id"] = str(execution["id"])
+        if include_data:
+            view["data"] = execution["data"]
+        return view
+
+    async def list_executions(self, request: web.Request):
+        executions = sorted(self.executions.values(), key=lambda e: e["id"], reverse=True)
+        if "workflowId" in request.query:
+            executions = [e for e in executions if e["workflowId"] == request.query["workflowId"]]
+        page, next_cursor = self._page(executions, request, lambda e: e["id"])
+        include_data = request.query.get("includeData") == "true"
+        return web.json_response({
+            "data": [self._execution_view(e, include_data) for e in page],
+            "nextCursor": next_cursor
+        })
+
+    async def get_execution(self, request: web.Request):
+        execution = self.executions.get(int(request.match_info["id"]))
+        if execution is None:
+            raise web.HTTPNotFound(text=json.dumps({"message": "Not Found"}), content_type="application/json")
+        return web.json_response(self._execution_view(execution, request.query.get("includeData") == "true"))
+
+    # ------------------------------------------------------------------ contrôle
+
+    async def get_config(self, request: web.Request):
+        return web.json_response(self.config.to_dict())
+
+    async def set_config(self, request: web.Request):
+        self.config.update(await request.json())
+        return web.json_response(self.config.to_dict())
+
+    async def get_stats(self, request: web.Request):
+        return web.json_response({
+            "workflows": len(self.workflows),
+            "executions": len(self.executions),
+            "requests": dict(self.stats),
+        })
+
+
+async def start_fake_n8n(host: str = "127.0.0.1", port: int = 5678,
+                         config: Optional[FakeN8NConfig] = None) -> tuple:
+    """Démarre le faux N8N dans la boucle courante ; renvoie (fake, runner)."""
+    fake = FakeN8N(config)
+    runner = web.AppRunner(fake.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return fake, runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5678)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--execute-latency-ms", type=float, default=None)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--items-per-execution", type=int, default=1)
+    parser.add_argument("--api-key", default=None, help="Exiger ce header X-N8N-API-KEY")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeN8NConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, failure_rate=args.failure_rate,
+        failure_status=args.failure_status, execute_latency_ms=args.execute_latency_ms,
+        items_per_execution=args.items_per_execution, seed=args.seed,
+    )
+    fake = FakeN8N(config, api_key=args.api_key)
+    print(f"Fake N8N listening on http://{args.host}:{args.port} ({config.to_dict()})")
+    web.run_app(fake.make_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark mémoire de la synchronisation des workflows N8N.
+
+Génère un catalogue synthétique de templates, puis compare le pic mémoire
+(tracemalloc) de la synchronisation "full" (liste complète) et "streaming"
+(lots de taille fixe) pour des catalogues de tailles croissantes.
+
+Usage (depuis backend/) :
+    python -m benchmarks.sync_memory --sizes 500 2000 8000 --batch-size 200
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import Base
+from app.models.user import User, UserIntegration  # noqa: F401 - enregistrement des tables
+from app.models.crew import Crew  # noqa: F401
+from app.models.team_instance import TeamInstance  # noqa: F401
+from app.models.workflow import Workflow, WorkflowExecution  # noqa: F401
+from app.services.n8n_executor import N8NDiscoveryService
+from app.services.unified_discovery import UnifiedDiscoveryService
+
+NODE_TYPES = [
+    "n8n-nodes-base.gmail",
+    "n8n-nodes-base.telegram",
+    "n8n-nodes-base.slack",
+    "n8n-nodes-base.httpRequest",
+    "n8n-nodes-base.googleSheets",
+    "n8n-nodes-base.set",
+]
+
+
+def generate_catalog(root: str, size: int, nodes_per_workflow: int = 25) -> None:
+    """Écrit `size` dossiers de templates (workflow.json + workflow_meta.json)."""
+    for index in range(size):
+        folder = os.path.join(root, f"template_{index:06d}")
+        os.makedirs(folder)
+        nodes = [
+            {
+                "id": f"node-{index}-{n}",
+                "name": f"Node {n}",
+                "type": NODE_TYPES[n % len(NODE_TYPES)],
+                "parameters": {"text": "x" * 200},
+                "position": [n * 220, 300],
+            }
+            for n in range(nodes_per_workflow)
+        ]
+        with open(os.path.join(folder, "workflow.json"), "w", encoding="utf-8") as f:
+            json.dump({"name": f"Template {index}", "nodes": nodes, "connections": {}}, f)
+        with open(os.path.join(folder, "workflow_meta.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "name": f"Template {index}",
+                "description": "Synthetic template " + "d" * 300,
+                "category": "Benchmark",
+                "tags": ["bench", "synthetic"],
+                "required_credentials": ["gmail", "telegram"],
+            }, f)
+
+
+def measure(catalog_root: str, mode: str, batch_size: int) -> dict:
+    """Synchronise le catalogue dans une base vierge et mesure pic mémoire et durée."""
+    db_dir = tempfile.mkdtemp(prefix="divert_bench_db_")
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'bench.db')}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+    discovery = UnifiedDiscoveryService()
+    discovery.n8n_discovery = N8NDiscoveryService(workflows_root_dir=catalog_root)
+
+    try:
+        gc.collect()
+        tracemalloc.start()
+        started = time.perf_counter()
+        if mode == "streaming":
+            result = discovery.sync_n8n_workflows_streaming(db, batch_size=batch_size)
+        else:
+            result = discovery.sync_n8n_workflows(db)
+        duration = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+        engine.dispose()
+        shutil.rmtree(db_dir, ignore_errors=True)
+
+    return {"peak_mb": peak / (1024 * 1024), "seconds": duration, "total": result["total"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000, 8000])
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--modes", nargs="+", default=["full", "streaming"], choices=["full", "streaming"])
+    args = parser.parse_args()
+
+    # Les logs par workflow fausseraient la mesure
+    import logging
+    logging.disable(logging.INFO)
+
+    print(f"{'templates':>10} {'mode':>10} {'peak MB':>10} {'seconds':>10}")
+    for size in args.sizes:
+        catalog_root = tempfile.mkdtemp(prefix="divert_bench_catalog_")
+        try:
+            generate_catalog(catalog_root, size)
+            for mode in args.modes:
+                stats = measure(catalog_root, mode, args.batch_size)
+                assert stats["total"] == size, f"{mode}: synced {stats['total']} of {size}"
+                print(f"{size:>10} {mode:>10} {stats['peak_mb']:>10.2f} {stats['seconds']:>10.2f}")
+        finally:
+            shutil.rmtree(catalog_root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()